@@ -0,0 +1,5 @@
+#!/bin/bash
+DEFAULT_NAME="random_name_$(date +%Y%m%d%H%M%S)"
+RUN_NAME="${3:-$DEFAULT_NAME}"
+
+python3 src/project_runner.py src/ --env-manager=$1 --experiment-id $2 --run-name "$RUN_NAME" "${@:4}"
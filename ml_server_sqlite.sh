@@ -0,0 +1,10 @@
+#!/bin/bash
+
+# Tracking server on the SQLite store created by src/migrate_store.py from the
+# file store of ml_server.sh (artifacts stay in mlruns, where runs point to)
+mlflow server \
+  --host 0.0.0.0 \
+  --port 8080 \
+  --backend-store-uri sqlite:////home/ubuntu/MLflow_Course/mlflow.db \
+  --default-artifact-root file:///home/ubuntu/MLflow_Course/mlruns \
+  --serve-artifacts
@@ -4,8 +4,8 @@ import mlflow
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import pandas as pd
 import numpy as np
+from data_cache import load_dataset
 
 # Set tracking experiment
 mlflow.set_tracking_uri("http://127.0.0.1:8080")
@@ -16,10 +16,7 @@ run_name = "fourth_run"
 artifact_path = "rf_apples"
 
 # Import Database
-data = pd.read_csv("data/fake_data.csv")
-X = data.drop(columns=["date", "demand"])
-X = X.astype('float')
-y = data["demand"]
+X, y = load_dataset("data/fake_data.csv")
 X_train, X_val, y_train, y_val = train_test_split(
     X, y, test_size=0.2, random_state=42
 )
@@ -3,6 +3,7 @@ from sklearn import svm, datasets
 from sklearn.model_selection import GridSearchCV
 from mlflow import MlflowClient
 import mlflow 
+from perf import StageTimer
 
 mlflow.set_tracking_uri("http://127.0.0.1:8080")
 apple_experiment = mlflow.set_experiment("Iris_Models")
@@ -12,4 +13,10 @@ iris = datasets.load_iris()
 parameters = {"kernel": ("linear", "rbf"), "C": [1, 10]} 
 svc = svm.SVC()
 clf = GridSearchCV(svc, parameters)
-clf.fit(iris.data, iris.target)  # type: ignore
\ No newline at end of file
+
+# Fit time (autolog included), logged as perf.* metrics on the autolog run
+perf = StageTimer()
+with perf.stage("fit"):
+    clf.fit(iris.data, iris.target)  # type: ignore
+perf.log()
+print(perf.summary())
\ No newline at end of file
@@ -2,15 +2,12 @@ import mlflow
 from mlflow.tracking import MlflowClient
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split, RandomizedSearchCV
-import pandas as pd
 from scipy.stats import randint
+from data_cache import load_dataset
 
 def load_and_prep_data(data_path: str):
     """Load and prepare data for training."""
-    data = pd.read_csv(data_path)
-    X = data.drop(columns=["date", "demand"])
-    X = X.astype('float')
-    y = data["demand"]
+    X, y = load_dataset(data_path)
     return train_test_split(X, y, test_size=0.2, random_state=42)
 
 def main():
@@ -60,6 +57,7 @@ def main():
         n_iter=N_TRIALS,
         cv=5,
         scoring='r2',
+        n_jobs=-1,
         random_state=42
     )
 
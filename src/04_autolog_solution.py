@@ -2,15 +2,14 @@ import mlflow
 from mlflow.tracking import MlflowClient
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split, RandomizedSearchCV
-import pandas as pd
 from scipy.stats import randint
+from data_cache import load_dataset
+from run_search import resolve_search_runs
+from perf import StageTimer
 
 def load_and_prep_data(data_path: str):
     """Load and prepare data for training."""
-    data = pd.read_csv(data_path)
-    X = data.drop(columns=["date", "demand"])
-    X = X.astype('float')
-    y = data["demand"]
+    X, y = load_dataset(data_path)
     return train_test_split(X, y, test_size=0.2, random_state=42)
 
 def main():
@@ -42,8 +41,12 @@ def main():
         log_models=True
     )
 
+    # Per-stage wall time, CPU time and peak RSS, logged as perf.* metrics on the parent run
+    perf = StageTimer()
+
     # Load data
-    X_train, X_val, y_train, y_val = load_and_prep_data("data/fake_data.csv")
+    with perf.stage("load"):
+        X_train, X_val, y_train, y_val = load_and_prep_data("data/fake_data.csv")
 
     # Define parameter search space
     param_distributions = {
@@ -60,49 +63,28 @@ def main():
         n_iter=N_TRIALS,
         cv=5,
         scoring='r2',
+        n_jobs=-1,
         random_state=42
     )
 
     # Fit the model - autolog will automatically create the runs
-    search.fit(X_train, y_train)
+    # (the fit stage includes autolog's logging of the parent and child runs)
+    with perf.stage("fit"):
+        search.fit(X_train, y_train)
 
     # Get best run info
     best_params = search.best_params_
     best_score = search.best_score_
 
-    # Find the best run from MLflow
-    runs = client.search_runs(
-        experiment_ids=[client.get_experiment_by_name(EXPERIMENT_NAME).experiment_id],  # type:ignore
-        filter_string="",
-        max_results=50
+    # Resolve the parent run (the autolog run of search.fit) and its best child
+    # run on the tracking server, whatever the number of runs in the experiment
+    experiment_id = client.get_experiment_by_name(EXPERIMENT_NAME).experiment_id  # type: ignore
+    last_run = mlflow.last_active_run()
+    parent_run, best_run = resolve_search_runs(
+        client, experiment_id, parent_run_id=last_run.info.run_id if last_run else None
     )
-
-    # Identify the parent and its best run parameters
-    parent_run = None
-    for run in runs:
-        if 'best_n_estimators' in run.data.params:  # Parent run has the best_ parameters
-            parent_run = run
-            break
-
-    if parent_run:
-        # Extract best parameters from parent run
-        best_params_from_parent = {
-            'n_estimators': parent_run.data.params['best_n_estimators'],
-            'max_depth': parent_run.data.params['best_max_depth'],
-            'min_samples_split': parent_run.data.params['best_min_samples_split'],
-            'min_samples_leaf': parent_run.data.params['best_min_samples_leaf']
-        }
-
-        # Find the child run with these parameters
-        best_run = None
-        for run in runs:
-            if ('n_estimators' in run.data.params and
-                run.data.params['n_estimators'] == best_params_from_parent['n_estimators'] and
-                run.data.params['max_depth'] == best_params_from_parent['max_depth'] and
-                run.data.params['min_samples_split'] == best_params_from_parent['min_samples_split'] and
-                run.data.params['min_samples_leaf'] == best_params_from_parent['min_samples_leaf']):
-                best_run = run
-                break
+    if parent_run is None:
+        raise Exception(f"No search parent run found in experiment '{EXPERIMENT_NAME}'")
 
     best_run_name = best_run.data.tags.get('mlflow.runName', 'Not found') if best_run else 'Not found'  # type: ignore
 
@@ -124,9 +106,12 @@ Best Model Parameters:
     with mlflow.start_run(run_id=parent_run.info.run_id):  # type: ignore
 
         # Log summary as an artifact
-        with open("summary_solution.txt", "w") as f:
-            f.write(summary)
-        mlflow.log_artifact("summary_solution.txt")
+        with perf.stage("log_summary"):
+            with open("summary_solution.txt", "w") as f:
+                f.write(summary)
+            mlflow.log_artifact("summary_solution.txt")
+        perf.log(parent_run.info.run_id, trace=True)  # type: ignore
+    print(perf.summary())
 
 if __name__ == "__main__":
     main()
@@ -4,10 +4,13 @@ import mlflow
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import pandas as pd
 import numpy as np
 import argparse
 import os
+from data_cache import load_dataset
+import data_stream
+from async_logging import BatchedRunLogger
+from perf import StageTimer
 
 def main():
     # Get project root directory (one level up from script location)
@@ -18,6 +21,19 @@ def main():
     parser.add_argument('--data_path', type=str, 
                        default=os.path.join(PROJECT_ROOT, "data", "fake_data.csv"),
                        help='path to the data file')
+    parser.add_argument('--mode', type=str, default="memory", choices=["memory", "stream"],
+                       help='memory: load the whole file, stream: out-of-core chunked training')
+    parser.add_argument('--stream_model', type=str, default="forest", choices=["forest", "sgd"],
+                       help='stream mode estimator: subsampled forest or incremental SGD')
+    parser.add_argument('--chunksize', type=int, default=100_000,
+                       help='rows read per chunk in stream mode')
+    parser.add_argument('--max_train_rows', type=int, default=1_000_000,
+                       help='training rows sampled for the forest in stream mode')
+    parser.add_argument('--epochs', type=int, default=5,
+                       help='passes over the training rows for the SGD model')
+    parser.add_argument('--perf_trace', nargs='?', const='true', default='false', choices=['true', 'false'],
+                       help='also log the stage timings as a Chrome trace artifact (perf/trace.json), '
+                            '"--perf_trace" alone means true')
     args = parser.parse_args()
 
     # Define tracking_uri (localhost)
@@ -28,14 +44,20 @@ def main():
     run_name = "third_run_repro_first_run"
     artifact_path = "rf_apples"
 
+    if args.mode == "stream":
+        train_streaming(args, run_name, artifact_path)
+        return
+
+    # Per-stage wall time, CPU time and peak RSS, logged as perf.* metrics
+    perf = StageTimer()
+
     # Import Database
-    data = pd.read_csv(args.data_path)
-    X = data.drop(columns=["date", "demand"])
-    X = X.astype('float')
-    y = data["demand"]
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+    with perf.stage("load"):
+        X, y = load_dataset(args.data_path)
+    with perf.stage("split"):
+        X_train, X_val, y_train, y_val = train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
 
     # Train model
     params = {
@@ -45,23 +67,83 @@ def main():
     }
 
     rf = RandomForestRegressor(**params)  # type: ignore
-    rf.fit(X_train, y_train)
+    with perf.stage("fit"):
+        rf.fit(X_train, y_train)
 
     # Evaluate model
-    y_pred = rf.predict(X_val)
-    mae = mean_absolute_error(y_val, y_pred)
-    mse = mean_squared_error(y_val, y_pred)
-    rmse = np.sqrt(mse)
-    r2 = r2_score(y_val, y_pred)
-    metrics = {"mae": mae, "mse": mse, "rmse": rmse, "r2": r2}
+    with perf.stage("predict"):
+        y_pred = rf.predict(X_val)
+    with perf.stage("metrics"):
+        mae = mean_absolute_error(y_val, y_pred)
+        mse = mean_squared_error(y_val, y_pred)
+        rmse = np.sqrt(mse)
+        r2 = r2_score(y_val, y_pred)
+        metrics = {"mae": mae, "mse": mse, "rmse": rmse, "r2": r2}
 
     # Store information in tracking server
-    with mlflow.start_run(run_name=run_name) as run:
-        mlflow.log_params(params)
-        mlflow.log_metrics(metrics)
-        mlflow.sklearn.log_model(
-            sk_model=rf, input_example=X_val, artifact_path=artifact_path
-        )
+    with mlflow.start_run(run_name=run_name) as run, \
+            BatchedRunLogger(run.info.run_id) as run_logger:
+        with perf.stage("log"):
+            run_logger.log_params(params)
+            run_logger.log_metrics(metrics)
+            run_logger.log_model(rf, artifact_path, input_example=X_val)
+            run_logger.flush()
+        perf.log(run.info.run_id, trace=args.perf_trace == 'true')
+    print(perf.summary())
+
+def train_streaming(args, run_name, artifact_path):
+    """
+    Train without holding the dataset in memory.
+
+    Rows are read in chunks of args.chunksize and split train/validation by a
+    row hash. The forest is fitted on a bounded deterministic sample of the
+    training rows; the SGD model is updated chunk by chunk and logs its
+    validation metrics after every epoch. Chunks are read while fitting, so
+    the fit stage includes reading the data.
+    """
+    perf = StageTimer()
+    with perf.stage("load"):
+        input_example = data_stream.first_validation_rows(args.data_path, args.chunksize)
+
+    with mlflow.start_run(run_name=run_name) as run, \
+            BatchedRunLogger(run.info.run_id) as run_logger:
+        run_logger.log_params({
+            "mode": args.mode,
+            "stream_model": args.stream_model,
+            "chunksize": args.chunksize,
+        })
+
+        if args.stream_model == "sgd":
+            params = {"epochs": args.epochs, "random_state": 42}
+
+            def log_epoch(epoch, epoch_metrics):
+                run_logger.log_metrics(epoch_metrics, step=epoch)
+
+            with perf.stage("fit"):
+                model, metrics = data_stream.train_sgd(
+                    args.data_path, args.chunksize, epochs=args.epochs,
+                    random_state=42, on_epoch=log_epoch
+                )
+        else:
+            params = {
+                "n_estimators": 10,
+                "max_depth": 10,
+                "random_state": 42,
+                "max_train_rows": args.max_train_rows,
+            }
+            forest_params = {k: v for k, v in params.items() if k != "max_train_rows"}
+            with perf.stage("fit"):
+                model, metrics = data_stream.train_subsampled_forest(
+                    args.data_path, args.chunksize, forest_params, args.max_train_rows
+                )
+            run_logger.log_metrics(metrics)
+
+        with perf.stage("log"):
+            run_logger.log_params(params)
+            run_logger.log_model(model, artifact_path, input_example=input_example)
+            run_logger.flush()
+        perf.log(run.info.run_id, trace=args.perf_trace == 'true')
+    print(perf.summary())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
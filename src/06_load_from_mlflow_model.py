@@ -1,21 +1,25 @@
 import mlflow
-from sklearn.model_selection import train_test_split
-import pandas as pd
+import sys
+from data_cache import load_dataset
+from model_cache import cached_model_path
 
 # 1. Chargement des données
 # Remplacer avec le chemin vers votre jeu de données
 print("Chargement des données...")
-data = pd.read_csv("data/fake_data.csv")  # type: ignore
-X = data.drop(columns=["date", "demand"])
-X = X.astype('float')
+X, _ = load_dataset("data/fake_data.csv")
 
 # 2. Définir le chemin vers le modèle MLflow
 # Remplacer avec le chemin vers votre dossier "rf_apples" créé précédemment
+# (ou passer en argument une URI runs:/RUN_ID/rf_apples ou models:/NOM/VERSION)
 model_path = '/home/ubuntu/MLflow_Course/mlruns/637792679469892621/9f1a36320fb34910841e16fa7cef294d/artifacts/rf_apples'  # Par exemple : '/home/ubuntu/MLflow/mlruns/EXPERIMENT_ID/RUN_ID/artifacts/rf_apples'
+if len(sys.argv) > 1:
+    model_path = sys.argv[1]
 
 # 3. Charger le modèle
+# Les URI runs:/ et models:/ passent par le cache local : pas de téléchargement
+# si le modèle a déjà été récupéré
 print("Chargement du modèle...")
-model = mlflow.sklearn.load_model(model_path)
+model = mlflow.sklearn.load_model(cached_model_path(model_path))
 
 # 4. Faire des prédictions sur l'ensemble du jeu de données
 print("Calcul des prédictions...")
@@ -1,32 +1,18 @@
-import requests
-import pandas as pd
-import json
+import sys
+from api_client import ScoringClient
+from data_cache import load_dataset
 
 # Préparer les données
-data = pd.read_csv("data/fake_data.csv")
-X = data.drop(columns=["date", "demand"])
-X = X.astype('float')
+X, _ = load_dataset("data/fake_data.csv")
 
-# Convertir les données en format JSON
-json_data = {
-    "dataframe_split": {
-        "columns": X.columns.tolist(),
-        "data": X.head(2).values.tolist()  # On teste avec 2 lignes
-    }
-}
+# Format du payload : json (par défaut), arrow ou raw (serveur inprocess uniquement)
+payload_format = sys.argv[1] if len(sys.argv) > 1 else "json"
 
-# Envoyer la requête à l'API
-response = requests.post(
-    url="http://localhost:5002/invocations",
-    json=json_data,
-    headers={"Content-Type": "application/json"}
-)
-
-# Afficher les prédictions
-if response.status_code == 200:
-    predictions = response.json()
-    print("\nPrédictions reçues :")
-    print(predictions)
-else:
-    print(f"Erreur : {response.status_code}")
-    print(response.text)
\ No newline at end of file
+# Envoyer la requête à l'API (on teste avec 2 lignes)
+with ScoringClient(url="http://localhost:5002/invocations", format=payload_format) as client:
+    try:
+        predictions = client.predict(X.head(2))
+        print("\nPrédictions reçues :")
+        print(predictions.tolist())
+    except Exception as e:
+        print(f"Erreur : {e}")
@@ -1,9 +1,14 @@
-import mlflow
 import argparse
+import itertools
+import os
 import sys
-import pandas as pd
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import cast
 
+# mlflow and pandas are imported inside the functions using them, so that
+# --help and argument errors do not pay for their import time
+
 def display_artifacts(client, run_id):
     """
     Display all artifacts in a run.
@@ -57,6 +62,9 @@ def get_model_uri(tracking_uri, experiment_name, run_id=None):
     """
     Get model URI either from a specific run_id or the latest successful run in an experiment.
     """
+    import mlflow
+    import pandas as pd
+
     mlflow.set_tracking_uri(tracking_uri)
     print(f"Using tracking URI: {tracking_uri}")
 
@@ -101,6 +109,8 @@ def register_model(model_uri, model_name, tags=None):
         model_name: Name to register the model under
         tags: Dictionary of tags to set
     """
+    import mlflow
+
     print(f"\nRegistering model from: {model_uri}")
     print(f"Model name: {model_name}")
 
@@ -124,10 +134,204 @@ def register_model(model_uri, model_name, tags=None):
         print(f"Error: {str(e)}")
         raise
 
+def compact_and_register(model_uri, model_name, source_version, data_path,
+                         merge=False, merge_tolerance=0.0, max_r2_drop=0.001):
+    """
+    Register a compacted copy of a registered forest as a derived version.
+
+    The compacted model (flat arrays, float32 thresholds and values,
+    optionally merged leaves, see compaction.py) is logged next to the
+    original in the same run and registered with a compacted_from tag, only
+    if its r2 on data_path is at most max_r2_drop below the original.
+
+    Args:
+        model_uri: runs:/ URI of the original sklearn forest
+        model_name: Registered model name
+        source_version: Registered version of the original
+        data_path: Dataset used to compare predictions
+        merge: Merge sibling leaves with close values
+        merge_tolerance: Maximum value difference of merged leaves
+        max_r2_drop: Accuracy tolerance gate
+    """
+    import mlflow
+
+    from compaction import compact_forest, compaction_report, save_compacted_model
+    from data_cache import load_dataset
+
+    print(f"\nCompacting {model_uri}")
+    # Original download and compacted copy, removed once the copy is logged
+    with tempfile.TemporaryDirectory(prefix="compact-") as tmp_dir:
+        original_path = mlflow.artifacts.download_artifacts(model_uri, dst_path=os.path.join(tmp_dir, "original"))
+        sk_model = mlflow.sklearn.load_model(original_path)
+        forest = compact_forest(sk_model, merge=merge, merge_tolerance=merge_tolerance)
+
+        X, y = load_dataset(data_path)
+        compacted_path = save_compacted_model(forest, os.path.join(tmp_dir, "compacted"), input_example=X.head(5))
+        report = compaction_report(original_path, compacted_path, y, sk_model.predict(X), forest.predict(X))
+
+        print(f"Size:      {report['original_bytes'] / 1024:.0f} KB -> {report['compacted_bytes'] / 1024:.0f} KB "
+              f"({report['compacted_bytes'] / report['original_bytes']:.1%})")
+        print(f"Load time: {report['original_load_s'] * 1000:.0f} ms -> {report['compacted_load_s'] * 1000:.0f} ms")
+        print(f"r2:        {report['original_r2']:.6f} -> {report['compacted_r2']:.6f} "
+              f"(delta {report['r2_delta']:+.2e}, max prediction delta {report['max_abs_prediction_delta']:.2e})")
+
+        if -report["r2_delta"] > max_r2_drop:
+            raise Exception(f"Compacted model rejected: r2 drop {-report['r2_delta']:.2e} exceeds {max_r2_drop:.2e}")
+
+        run_id, artifact_path = model_uri[len("runs:/"):].split("/", 1)
+        compacted_artifact = f"{artifact_path.rstrip('/')}_compact"
+        mlflow.tracking.MlflowClient().log_artifacts(run_id, compacted_path, compacted_artifact)
+
+    tags = {
+        "compacted_from": str(source_version),
+        "compaction": "float32,merged_leaves" if merge else "float32",
+        "compaction_r2_delta": f"{report['r2_delta']:.3e}",
+        "compaction_size_ratio": f"{report['compacted_bytes'] / report['original_bytes']:.3f}",
+    }
+    model_details = mlflow.register_model(f"runs:/{run_id}/{compacted_artifact}", model_name, tags=tags)
+    print(f"Compacted model registered with version: {model_details.version}")
+    return model_details, report
+
+def select_runs(client, experiment_id, filter_string="", min_r2=None, top_n=None):
+    """
+    Finished runs of an experiment matching a filter, best r2 first.
+
+    Args:
+        client: MLflow client
+        experiment_id: Experiment to search
+        filter_string: Additional MLflow search filter (optional)
+        min_r2: Minimum r2 metric (optional)
+        top_n: Keep only the N best runs by r2 (optional)
+    Returns:
+        list: Matching runs
+    """
+    from run_search import PAGE_SIZE, iter_runs
+
+    clauses = ["attributes.status = 'FINISHED'"]
+    if filter_string:
+        clauses.append(filter_string)
+    if min_r2 is not None:
+        clauses.append(f"metrics.r2 >= {min_r2}")
+    runs = iter_runs(
+        client, [experiment_id],
+        filter_string=" and ".join(clauses),
+        order_by=["metrics.r2 DESC"],
+        page_size=min(top_n, PAGE_SIZE) if top_n else PAGE_SIZE,
+    )
+    return list(itertools.islice(runs, top_n))
+
+def registered_run_ids(client, model_name):
+    """Run IDs already registered as a version of a model."""
+    run_ids = set()
+    page_token = None
+    while True:
+        page = client.search_model_versions(f"name='{model_name}'", page_token=page_token)
+        run_ids.update(v.run_id for v in page)
+        page_token = page.token
+        if not page_token:
+            return run_ids
+
+def register_run(client, model_name, run, artifact_path, tags):
+    """
+    Register the model of one run with its version tags in a single call.
+
+    Returns:
+        ModelVersion: Created version
+    """
+    version_tags = dict(tags)
+    version_tags["run_name"] = run.info.run_name or ""
+    if "r2" in run.data.metrics:
+        version_tags["r2"] = str(run.data.metrics["r2"])
+    return client.create_model_version(
+        name=model_name,
+        source=f"{run.info.artifact_uri}/{artifact_path}",
+        run_id=run.info.run_id,
+        tags=version_tags,
+    )
+
+def bulk_register(tracking_uri, experiment_name, model_name, filter_string="", min_r2=None, top_n=None,
+                  tags=None, workers=8, artifact_path=None, skip_registered=True, dry_run=False):
+    """
+    Register the models of every matching run without prompts.
+
+    Runs are selected server-side, model paths come from the runs' log-model
+    history tag, and versions are created concurrently by a bounded pool of
+    threads, each with its tags set at creation.
+
+    Returns:
+        list: One summary row per selected run
+    """
+    import mlflow
+    from mlflow.exceptions import MlflowException
+    from run_search import model_artifact_path
+
+    mlflow.set_tracking_uri(tracking_uri)
+    print(f"Using tracking URI: {tracking_uri}")
+    client = mlflow.tracking.MlflowClient()
+
+    experiment = client.get_experiment_by_name(experiment_name)
+    if experiment is None:
+        raise Exception(f"Experiment '{experiment_name}' not found")
+
+    runs = select_runs(client, experiment.experiment_id, filter_string, min_r2, top_n)
+    print(f"{len(runs)} matching runs in experiment '{experiment_name}'")
+
+    try:
+        client.create_registered_model(model_name)
+    except MlflowException as e:
+        if e.error_code != "RESOURCE_ALREADY_EXISTS":
+            raise
+    already_registered = registered_run_ids(client, model_name) if skip_registered else set()
+
+    rows, to_register = [], []
+    for run in runs:
+        row = {
+            "run_id": run.info.run_id,
+            "run_name": run.info.run_name,
+            "r2": run.data.metrics.get("r2"),
+            "artifact_path": artifact_path or model_artifact_path(run),
+            "version": None,
+            "status": "pending",
+        }
+        rows.append(row)
+        if row["artifact_path"] is None:
+            row["status"] = "no model"
+        elif run.info.run_id in already_registered:
+            row["status"] = "already registered"
+        elif dry_run:
+            row["status"] = "dry run"
+        else:
+            to_register.append((row, run))
+
+    def register(item):
+        row, run = item
+        try:
+            row["version"] = register_run(client, model_name, run, row["artifact_path"], tags or {}).version
+            row["status"] = "registered"
+        except Exception as e:
+            row["status"] = f"error: {e}"
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(register, to_register))
+    return rows
+
+def print_bulk_summary(rows):
+    """Print the bulk registration summary table."""
+    print(f"\n{'run_id':<34} {'run_name':<36} {'r2':>8} {'artifact':<16} {'version':>7}  status")
+    for row in rows:
+        r2 = f"{row['r2']:.4f}" if row["r2"] is not None else "-"
+        print(f"{row['run_id']:<34} {(row['run_name'] or '')[:36]:<36} {r2:>8} "
+              f"{(row['artifact_path'] or '-')[:16]:<16} {str(row['version'] or '-'):>7}  {row['status']}")
+    registered = sum(1 for row in rows if row["status"] == "registered")
+    failed = sum(1 for row in rows if row["status"].startswith("error"))
+    print(f"\n{registered} registered, {failed} failed, {len(rows) - registered - failed} skipped")
+
 def manage_tags(model_name, version=None):
     """
     Interactively manage tags for a registered model or specific version
     """
+    import mlflow
+
     client = mlflow.tracking.MlflowClient()
 
     while True:
@@ -184,6 +388,21 @@ def main():
     parser.add_argument('--model_name', type=str, required=True, help='Name to register the model under')
     parser.add_argument('--run_id', type=str, help='Specific run ID to load (optional)')
     parser.add_argument('--tags', type=str, help='Initial tags in format "key1=value1,key2=value2" (optional)')
+    parser.add_argument('--compact', action='store_true', help='Also register a compacted version of the forest')
+    parser.add_argument('--merge_leaves', action='store_true', help='Merge sibling leaves with close values (--compact)')
+    parser.add_argument('--merge_tolerance', type=float, default=0.0,
+                        help='Maximum value difference of merged leaves, 0 keeps predictions unchanged (--compact)')
+    parser.add_argument('--max_r2_drop', type=float, default=0.001,
+                        help='Reject the compacted version above this r2 drop (--compact)')
+    parser.add_argument('--data', type=str, default="data/fake_data.csv", help='Dataset used to check compaction')
+    parser.add_argument('--bulk', action='store_true', help='Register every matching run without prompts')
+    parser.add_argument('--filter', type=str, default="", help='MLflow run filter, e.g. "params.max_depth = \'10\'" (--bulk)')
+    parser.add_argument('--min_r2', type=float, help='Minimum r2 of the registered runs (--bulk)')
+    parser.add_argument('--top_n', type=int, help='Only register the N best runs by r2 (--bulk)')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent registrations (--bulk)')
+    parser.add_argument('--artifact_path', type=str, help='Model artifact path, default: from the run history (--bulk)')
+    parser.add_argument('--allow_duplicates', action='store_true', help='Register runs already registered (--bulk)')
+    parser.add_argument('--dry_run', action='store_true', help='Only list the runs that would be registered (--bulk)')
     args = parser.parse_args()
 
     try:
@@ -194,12 +413,29 @@ def main():
                 key, value = tag_pair.split('=')
                 initial_tags[key.strip()] = value.strip()
 
+        # Non-interactive batch mode: version tags instead of registered model tags
+        if args.bulk:
+            rows = bulk_register(args.tracking_uri, args.experiment_name, args.model_name,
+                                 filter_string=args.filter, min_r2=args.min_r2, top_n=args.top_n,
+                                 tags=initial_tags, workers=args.workers, artifact_path=args.artifact_path,
+                                 skip_registered=not args.allow_duplicates, dry_run=args.dry_run)
+            print_bulk_summary(rows)
+            if any(row["status"].startswith("error") for row in rows):
+                sys.exit(1)
+            return
+
         # Get model URI
         model_uri, run_id = get_model_uri(args.tracking_uri, args.experiment_name, args.run_id)
 
         # Register model with initial tags
         model_details = register_model(model_uri, args.model_name, initial_tags)
 
+        # Derived compacted version
+        if args.compact:
+            compact_and_register(model_uri, args.model_name, model_details.version, args.data,
+                                 merge=args.merge_leaves, merge_tolerance=args.merge_tolerance,
+                                 max_r2_drop=args.max_r2_drop)
+
         # Interactive tag management
         print("\nWould you like to manage tags for this model? (yes/no)")
         if input().lower().startswith('y'):
@@ -1,34 +1,34 @@
-import mlflow
 import argparse
 import subprocess
 import sys
 
-def list_model_versions(model_name):
+# mlflow, pandas and the serving modules are imported inside the functions
+# using them, so that --help and argument errors do not pay for their import time
+
+def list_model_versions(index):
     """
     List all versions of a registered model.
 
     Args:
-        model_name: Name of the registered model
+        index: ModelIndex of the registered model (local, incrementally refreshed)
     Returns:
-        list: List of model versions
+        list: Version records, newest first
     """
-    client = mlflow.tracking.MlflowClient()
-
     try:
-        versions = client.search_model_versions(f"name='{model_name}'")
+        versions = index.versions()
         if not versions:
-            raise Exception(f"No versions found for model '{model_name}'")
+            raise Exception(f"No versions found for model '{index.model_name}'")
 
         print("\nAvailable model versions:")
         for idx, version in enumerate(versions, 1):
-            status = version.current_stage
-            tags = version.tags if version.tags else {}
-            print(f"{idx}. Version: {version.version}, Stage: {status}")
+            status = version["current_stage"]
+            tags = version["tags"]
+            print(f"{idx}. Version: {version['version']}, Stage: {status}")
             if tags:
                 print("   Tags:")
                 for key, value in tags.items():
                     print(f"   - {key}: {value}")
-            print(f"   Run ID: {version.run_id}")
+            print(f"   Run ID: {version['run_id']}")
 
         return versions
 
@@ -41,12 +41,12 @@ def select_model_version(versions):
     Let user select which model version to use.
 
     Args:
-        versions: List of model versions
+        versions: List of version records
     Returns:
-        ModelVersion: Selected version
+        dict: Selected version record
     """
     if len(versions) == 1:
-        print(f"\nOnly one version available. Using version {versions[0].version}")
+        print(f"\nOnly one version available. Using version {versions[0]['version']}")
         return versions[0]
 
     while True:
@@ -90,36 +90,116 @@ def serve_model(model_uri, port):
         print(f"Unexpected error: {str(e)}")
         raise
 
+def parse_list(value):
+    """Split a comma-separated argument, empty or None gives []."""
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def serve_versions(args):
+    """
+    Serve several registered versions from one in-process server.
+
+    Primary versions share the traffic according to --weights (equal split by
+    default), shadow versions only receive mirrored requests.
+    """
+    import model_server
+    from model_cache import cached_model_path
+    from model_index import ModelIndex
+
+    primaries = parse_list(args.versions)
+    shadows = parse_list(args.shadow)
+    if not primaries:
+        raise Exception("--versions must list at least one version receiving traffic")
+    weights = [float(w) for w in parse_list(args.weights)] or [1.0] * len(primaries)
+    if len(weights) != len(primaries):
+        raise Exception(f"--weights has {len(weights)} values for {len(primaries)} versions")
+    if any(w < 0 for w in weights) or not any(w > 0 for w in weights):
+        raise Exception(f"--weights must be non-negative with at least one positive value, got {args.weights}")
+
+    # Specs ("3", "latest", "@champion", "tag:k=v") resolved to version numbers
+    index = ModelIndex(args.model_name)
+    resolved = {spec: index.resolve(spec)["version"] for spec in primaries + shadows}
+    primaries = [resolved[spec] for spec in primaries]
+    shadows = [resolved[spec] for spec in shadows]
+    if len(set(primaries + shadows)) != len(primaries) + len(shadows):
+        raise Exception(f"Version specs resolve to duplicate versions: {resolved}")
+
+    model_uris = {}
+    for version in primaries + shadows:
+        model_uri = f"models:/{args.model_name}/{version}"
+        model_uris[version] = model_uri if args.no_cache else cached_model_path(model_uri)
+
+    model_server.serve(model_uris, port=args.port, max_batch_size=args.max_batch_size,
+                       max_wait_ms=args.max_wait_ms, weights=dict(zip(primaries, weights)),
+                       shadows=shadows, engine=args.engine)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Serve model from MLflow Model Registry')
     parser.add_argument('--tracking_uri', type=str, required=True, help='MLflow tracking URI')
     parser.add_argument('--model_name', type=str, required=True, help='Name of the registered model')
     parser.add_argument('--port', type=int, default=5001, help='Port to serve model on (default: 5001)')
-    parser.add_argument('--version', type=int, help='Specific version to serve (optional)')
+    parser.add_argument('--version', type=str,
+                        help='Version to serve: N, "latest", "@alias" or "tag:key=value" (optional)')
+    parser.add_argument('--no_cache', action='store_true', help='Bypass the local model cache')
+    parser.add_argument('--server', type=str, default="mlflow", choices=["mlflow", "inprocess"],
+                        help='mlflow: `mlflow models serve` subprocess, inprocess: micro-batching server')
+    parser.add_argument('--max_batch_size', type=int, default=256, help='Max rows per predict call (inprocess)')
+    parser.add_argument('--max_wait_ms', type=float, default=5.0, help='Max wait to fill a batch in ms (inprocess)')
+    parser.add_argument('--engine', type=str, default="pyfunc", choices=["pyfunc", "flat"],
+                        help='pyfunc: MLflow model, flat: flat-array forest engine (inprocess)')
+    parser.add_argument('--versions', type=str,
+                        help='Comma-separated version specs served together, e.g. "3,@canary" (inprocess)')
+    parser.add_argument('--weights', type=str,
+                        help='Comma-separated traffic weights matching --versions, e.g. "0.9,0.1" (inprocess)')
+    parser.add_argument('--shadow', type=str,
+                        help='Comma-separated versions receiving mirrored traffic only (inprocess)')
     args = parser.parse_args()
 
+    if (args.versions or args.shadow) and args.server != "inprocess":
+        parser.error("--versions and --shadow require --server inprocess")
+
+    import mlflow
+
+    import model_server
+    from model_cache import cached_model_path
+    from model_index import ModelIndex
+
     try:
         # Set tracking URI
         mlflow.set_tracking_uri(args.tracking_uri)
         print(f"Using tracking URI: {args.tracking_uri}")
 
-        # List and select model version
-        versions = list_model_versions(args.model_name)
+        # Several versions in one process: canary weights and shadow traffic
+        if args.versions or args.shadow:
+            serve_versions(args)
+            return
+
+        # Local version index, only changes since the last start are fetched
+        index = ModelIndex(args.model_name)
 
         if args.version:
-            # Find specified version
-            version = next((v for v in versions if v.version == str(args.version)), None)
-            if version is None:
-                raise Exception(f"Version {args.version} not found for model '{args.model_name}'")
+            # Resolve the specified version without listing the registry
+            version = index.resolve(args.version)
+            print(f"Resolved '{args.version}' to version {version['version']}")
         else:
             # Interactive selection
-            version = select_model_version(versions)
+            version = select_model_version(list_model_versions(index))
 
         # Construct model URI
-        model_uri = f"models:/{args.model_name}/{version.version}"
+        model_uri = f"models:/{args.model_name}/{version['version']}"
+
+        # Serve the local cached copy (downloaded only the first time)
+        if not args.no_cache:
+            model_uri = cached_model_path(model_uri)
 
         # Serve model
-        serve_model(model_uri, args.port)
+        if args.server == "inprocess":
+            model_server.serve({version["version"]: model_uri}, port=args.port,
+                               max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                               engine=args.engine)
+        else:
+            serve_model(model_uri, args.port)
 
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -0,0 +1,70 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import requests
+
+from payload import CONTENT_TYPES, JSON, decode_predictions, encode_frame
+
+
+class ScoringClient:
+    """
+    Client of a model /invocations endpoint over a keep-alive session.
+
+    Requests are sent as dataframe_split JSON (accepted by `mlflow models
+    serve`), or as Arrow IPC / raw float64 (in-process server only), and
+    responses are asked in the same format.
+    """
+
+    def __init__(self, url: str = "http://localhost:5002/invocations", format: str = "json",
+                 timeout: float = 30.0, session: Optional[requests.Session] = None):
+        """
+        Args:
+            url: /invocations URL
+            format: Payload format: json, arrow or raw
+            timeout: Request timeout in seconds
+        """
+        if format not in CONTENT_TYPES:
+            raise Exception(f"Unknown payload format '{format}', use one of {sorted(CONTENT_TYPES)}")
+        self.url = url
+        self.content_type = CONTENT_TYPES[format]
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.last_version = None
+
+    def headers(self, version: Optional[str] = None) -> dict:
+        headers = {"Content-Type": self.content_type, "Accept": self.content_type}
+        if version is not None:
+            headers["X-Model-Version"] = str(version)
+        return headers
+
+    def encode(self, frame: pd.DataFrame) -> bytes:
+        """Request body of a feature frame in the client format."""
+        return encode_frame(frame, self.content_type)
+
+    def post(self, body: bytes, version: Optional[str] = None) -> requests.Response:
+        """Send an already encoded body."""
+        return self.session.post(self.url, data=body, headers=self.headers(version), timeout=self.timeout)
+
+    def predict(self, frame: pd.DataFrame, version: Optional[str] = None) -> np.ndarray:
+        """
+        Predictions of a feature frame.
+
+        Args:
+            frame: Feature frame (model input columns)
+            version: Force a model version on a multi-version server (optional)
+        """
+        response = self.post(self.encode(frame), version=version)
+        if response.status_code != 200:
+            raise Exception(f"Scoring failed ({response.status_code}): {response.text}")
+        self.last_version = response.headers.get("X-Model-Version")
+        return decode_predictions(response.content, response.headers.get("Content-Type", JSON))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
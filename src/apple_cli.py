@@ -0,0 +1,112 @@
+import argparse
+import importlib
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# Subcommand -> (module with a main() function, description). Modules are
+# imported only when their subcommand runs, and they import mlflow/pandas
+# only in the code paths that use them.
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "register": ("08_register_model", "Register models (interactive or --bulk) and manage tags"),
+    "serve": ("09_serve_registry_model", "Serve a registered model version"),
+    "env": ("get_mlflow_env", "Download the environment files of runs"),
+}
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def run_command(command: str, argv: List[str]):
+    """Import the module of a subcommand and run its main() with argv."""
+    module_name, _ = COMMANDS[command]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    module = importlib.import_module(module_name)
+    sys.argv = [f"apple_cli.py {command}"] + argv
+    module.main()
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """
+    Entries of `python -X importtime` output.
+
+    Returns:
+        list: {"name", "self_us", "cumulative_us", "depth"} per imported module,
+              depth 0 for modules imported directly by the program
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append({
+                "name": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                # Nested imports are indented by two spaces per level, after one separator space
+                "depth": (len(match.group(3)) - 1) // 2,
+            })
+    return entries
+
+
+def import_breakdown(entries: List[dict]) -> List[Tuple[str, int]]:
+    """Cumulative import time of the top-level imports grouped by root package, slowest first."""
+    totals: Dict[str, int] = {}
+    for entry in entries:
+        if entry["depth"] == 0:
+            root = entry["name"].split(".")[0]
+            totals[root] = totals.get(root, 0) + entry["cumulative_us"]
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def profile_startup(argv: List[str], top: int = 15) -> dict:
+    """
+    Run the CLI with argv in a child interpreter under -X importtime and print
+    where its startup time goes.
+
+    Returns:
+        dict: wall_ms, import_ms and the (package, microseconds) breakdown
+    """
+    cmd = [sys.executable, "-X", "importtime", os.path.abspath(__file__)] + argv
+    start = time.perf_counter()
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    entries = parse_importtime(result.stderr)
+    breakdown = import_breakdown(entries)
+    import_ms = sum(us for _, us in breakdown) / 1000
+
+    print(f"Startup profile of: apple_cli.py {' '.join(argv)} (exit code {result.returncode})")
+    print(f"Wall time {wall_ms:.0f} ms, imports {import_ms:.0f} ms ({len(entries)} modules)\n")
+    print(f"{'package':<32} {'ms':>8} {'share':>6}")
+    for package, us in breakdown[:top]:
+        print(f"{package:<32} {us / 1000:>8.1f} {us / 1000 / max(import_ms, 1e-9):>6.1%}")
+    if len(breakdown) > top:
+        rest = sum(us for _, us in breakdown[top:])
+        print(f"{f'({len(breakdown) - top} others)':<32} {rest / 1000:>8.1f} {rest / 1000 / max(import_ms, 1e-9):>6.1%}")
+    return {"wall_ms": wall_ms, "import_ms": import_ms, "breakdown": breakdown}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="apple_cli.py",
+        description="Model registry, serving and environment tools",
+        epilog="Run `apple_cli.py <command> --help` for the options of a command.",
+    )
+    parser.add_argument('--profile-startup', dest='profile_startup', action='store_true',
+                        help='Report the import-time breakdown of the command instead of running it '
+                             '(the command defaults to --help)')
+    parser.add_argument('command', choices=sorted(COMMANDS),
+                        help="; ".join(f"{name}: {description}" for name, (_, description) in COMMANDS.items()))
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='Arguments of the command')
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup([args.command] + (args.args or ["--help"]))
+        return
+    run_command(args.command, args.args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+import mlflow
+from mlflow import MlflowClient
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.models import Model
+from mlflow.utils.validation import (
+    MAX_ENTITIES_PER_BATCH,
+    MAX_METRICS_PER_BATCH,
+    MAX_PARAMS_TAGS_PER_BATCH,
+)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BatchedRunLogger:
+    """
+    Buffer params, metrics and tags of a run and send them with log_batch from
+    a background thread; artifact and model uploads go through a bounded queue
+    served by a second thread.
+
+    Logging calls only append to a buffer, so the training loop never waits on
+    the tracking server. Everything is flushed on close() (or on leaving the
+    with block), and the first background error is re-raised there.
+
+    Example:
+        with mlflow.start_run(run_name=run_name) as run, \\
+                BatchedRunLogger(run.info.run_id) as run_logger:
+            run_logger.log_params(params)
+            run_logger.log_metrics(metrics, step=epoch)
+            run_logger.log_model(rf, "rf_apples", input_example=X_val)
+    """
+
+    def __init__(self, run_id: str, client: Optional[MlflowClient] = None,
+                 flush_interval: float = 1.0, max_queued_artifacts: int = 8):
+        """
+        Args:
+            run_id: Run to log into
+            client: MLflow client (default: client for the current tracking URI)
+            flush_interval: Seconds between two background flushes
+            max_queued_artifacts: Bound of the upload queue, log_artifact and
+                                  log_model block when it is full
+        """
+        self.run_id = run_id
+        self.client = client or MlflowClient()
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._params = []
+        self._metrics = []
+        self._tags = []
+        self._closed = False
+        self._error = None
+
+        self._uploads = queue.Queue(maxsize=max_queued_artifacts)
+        self._flusher = threading.Thread(target=self._flush_loop, name="mlflow-batch-flusher", daemon=True)
+        self._uploader = threading.Thread(target=self._upload_loop, name="mlflow-artifact-uploader", daemon=True)
+        self._flusher.start()
+        self._uploader.start()
+
+    # Buffered logging
+
+    def log_param(self, key: str, value):
+        self.log_params({key: value})
+
+    def log_params(self, params: Dict):
+        with self._lock:
+            self._params.extend(Param(key, str(value)) for key, value in params.items())
+
+    def log_metric(self, key: str, value: float, step: int = 0):
+        self.log_metrics({key: value}, step=step)
+
+    def log_metrics(self, metrics: Dict[str, float], step: int = 0):
+        timestamp = int(time.time() * 1000)
+        with self._lock:
+            self._metrics.extend(
+                Metric(key, float(value), timestamp, step) for key, value in metrics.items()
+            )
+
+    def set_tag(self, key: str, value):
+        self.set_tags({key: value})
+
+    def set_tags(self, tags: Dict):
+        with self._lock:
+            self._tags.extend(RunTag(key, str(value)) for key, value in tags.items())
+
+    # Background uploads
+
+    def log_artifact(self, local_path: str, artifact_path: Optional[str] = None):
+        """Upload a file off the main thread."""
+        self._submit(lambda: self.client.log_artifact(self.run_id, local_path, artifact_path))
+
+    def log_model(self, sk_model, artifact_path: str, input_example=None):
+        """
+        Save a scikit-learn model and upload it off the main thread.
+
+        Same artifacts as mlflow.sklearn.log_model (MLmodel, signature inferred
+        from the input example, environment files), recorded on the run.
+        """
+        self._submit(lambda: self._save_and_upload_model(sk_model, artifact_path, input_example))
+
+    def _save_and_upload_model(self, sk_model, artifact_path, input_example):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            local_path = os.path.join(tmp_dir, "model")
+            mlflow_model = Model(artifact_path=artifact_path, run_id=self.run_id)
+            mlflow.sklearn.save_model(
+                sk_model, local_path, mlflow_model=mlflow_model, input_example=input_example
+            )
+            self.client.log_artifacts(self.run_id, local_path, artifact_path)
+            self.client._record_logged_model(self.run_id, mlflow_model)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _submit(self, task):
+        if self._closed:
+            raise Exception("BatchedRunLogger is closed")
+        # Blocks when the queue is full, which bounds the memory held by uploads
+        self._uploads.put(task)
+
+    # Flushing
+
+    def flush(self):
+        """Send everything buffered so far and wait for queued uploads."""
+        self._send_buffered()
+        self._uploads.join()
+        self._raise_error()
+
+    def close(self, raise_errors: bool = True):
+        """
+        Final flush, then stop the background threads.
+
+        Args:
+            raise_errors: Raise a logging error of the final flush; when False
+                          it is only logged (used when the with block failed,
+                          so its exception is the one propagated)
+        """
+        if self._closed:
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error(f"Final flush failed for run {self.run_id}: {e}")
+        finally:
+            self._closed = True
+            with self._wakeup:
+                self._wakeup.notify()
+            self._uploads.put(_STOP)
+            self._flusher.join()
+            self._uploader.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(raise_errors=exc_type is None)
+
+    def _flush_loop(self):
+        while True:
+            with self._wakeup:
+                self._wakeup.wait(self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self._send_buffered()
+            except Exception as e:
+                self._record_error(e)
+
+    def _upload_loop(self):
+        while True:
+            task = self._uploads.get()
+            try:
+                if task is _STOP:
+                    return
+                task()
+            except Exception as e:
+                self._record_error(e)
+            finally:
+                self._uploads.task_done()
+
+    def _send_buffered(self):
+        # Serialized so that flush() also waits for a send already in progress
+        with self._send_lock:
+            self._send_batches()
+
+    def _send_batches(self):
+        with self._lock:
+            params, self._params = self._params, []
+            metrics, self._metrics = self._metrics, []
+            tags, self._tags = self._tags, []
+
+        # log_batch limits: 100 params/tags and 1000 metrics, 1000 entities in total
+        while params or metrics or tags:
+            batch_params = params[:MAX_PARAMS_TAGS_PER_BATCH]
+            batch_tags = tags[:MAX_PARAMS_TAGS_PER_BATCH - len(batch_params)]
+            room = MAX_ENTITIES_PER_BATCH - len(batch_params) - len(batch_tags)
+            batch_metrics = metrics[:min(MAX_METRICS_PER_BATCH, room)]
+
+            self.client.log_batch(self.run_id, metrics=batch_metrics, params=batch_params, tags=batch_tags)
+
+            params = params[len(batch_params):]
+            tags = tags[len(batch_tags):]
+            metrics = metrics[len(batch_metrics):]
+
+    def _record_error(self, error: Exception):
+        logger.error(f"Background logging failed for run {self.run_id}: {error}")
+        with self._lock:
+            if self._error is None:
+                self._error = error
+
+    def _raise_error(self):
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
@@ -0,0 +1,151 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import mlflow
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_cache import DROP_COLUMNS
+from flat_forest import load_flat_forest
+from model_cache import cached_model_path
+
+# Per-process model, loaded once by init_worker
+_WORKER = {}
+
+
+def resolve_local_model(model_uri: str) -> str:
+    """
+    Local directory of a model given as runs:/, models:/ or a local path.
+
+    Remote models are fetched once here through the local model cache, so the
+    workers only read from disk.
+    """
+    return cached_model_path(model_uri)
+
+
+def load_model(model_path: str, engine: str = "pyfunc"):
+    """
+    Load a model for scoring.
+
+    Args:
+        model_path: Local model directory
+        engine: pyfunc (MLflow flavor) or flat (flat-array forest, see flat_forest.py)
+    """
+    if engine == "flat":
+        return load_flat_forest(model_path)
+    return mlflow.pyfunc.load_model(model_path)
+
+
+def init_worker(model_path: str, engine: str = "pyfunc"):
+    """Process pool initializer: load the model once per worker."""
+    _WORKER["model"] = load_model(model_path, engine)
+
+
+def prepare_features(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Feature frame of an input chunk (date/demand dropped when present)."""
+    return chunk.drop(columns=[c for c in DROP_COLUMNS if c in chunk.columns]).astype('float')
+
+
+def score_chunk(features: pd.DataFrame) -> np.ndarray:
+    """Predict one chunk with the worker's model."""
+    return np.asarray(_WORKER["model"].predict(features), dtype=np.float64).ravel()
+
+
+def output_table(chunk: pd.DataFrame, predictions: np.ndarray, first_row: int) -> pa.Table:
+    """Output rows of a chunk: row_id, date when present, prediction."""
+    columns = {"row_id": np.arange(first_row, first_row + len(chunk), dtype=np.int64)}
+    if "date" in chunk.columns:
+        columns["date"] = chunk["date"].astype(str).to_numpy()
+    columns["prediction"] = predictions
+    return pa.table(columns)
+
+
+def batch_score(model_uri: str, input_path: str, output_path: str,
+                chunksize: int = 100_000, workers: Optional[int] = None, engine: str = "pyfunc") -> dict:
+    """
+    Score a CSV file chunk by chunk over a process pool and stream the
+    predictions to a Parquet file.
+
+    At most 2 * workers chunks are in flight, and predictions are written in
+    input order as soon as they are ready, so memory stays bounded whatever
+    the input size.
+
+    Args:
+        model_uri: runs:/, models:/ URI or local model directory
+        input_path: CSV file to score
+        output_path: Parquet file to write
+        chunksize: Rows per chunk
+        workers: Worker processes (default: all cores)
+        engine: pyfunc or flat
+    Returns:
+        dict: rows scored, elapsed seconds and rows per second
+    """
+    workers = workers or os.cpu_count() or 1
+    model_path = resolve_local_model(model_uri)
+    print(f"Scoring with model: {model_path} ({engine} engine)")
+
+    start = time.perf_counter()
+    n_rows = 0
+    writer = None
+    pending = deque()
+
+    def write_next():
+        nonlocal writer, n_rows
+        chunk, first_row, future = pending.popleft()
+        table = output_table(chunk, future.result(), first_row)
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+        writer.write_table(table)
+        n_rows += len(chunk)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(model_path, engine)) as executor:
+            first_row = 0
+            for chunk in pd.read_csv(input_path, chunksize=chunksize):
+                pending.append((chunk, first_row, executor.submit(score_chunk, prepare_features(chunk))))
+                first_row += len(chunk)
+                while len(pending) >= 2 * workers:
+                    write_next()
+            while pending:
+                write_next()
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": n_rows,
+        "elapsed": elapsed,
+        "rows_per_second": n_rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a CSV file with an MLflow model in parallel chunks')
+    parser.add_argument('--model_uri', type=str, required=True, help='runs:/, models:/ URI or local model path')
+    parser.add_argument('--input', type=str, default="data/fake_data.csv", help='CSV file to score')
+    parser.add_argument('--output', type=str, default="predictions.parquet", help='Parquet output file')
+    parser.add_argument('--tracking_uri', type=str, default="http://127.0.0.1:8080", help='MLflow tracking URI')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='Rows per chunk')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--engine', type=str, default="pyfunc", choices=["pyfunc", "flat"],
+                        help='pyfunc: MLflow model, flat: flat-array forest engine')
+    args = parser.parse_args()
+
+    mlflow.set_tracking_uri(args.tracking_uri)
+    stats = batch_score(args.model_uri, args.input, args.output, args.chunksize, args.workers, args.engine)
+
+    print(f"\nScored {stats['rows']} rows in {stats['elapsed']:.2f}s "
+          f"({stats['rows_per_second']:.0f} rows/s)")
+    print(f"Predictions written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
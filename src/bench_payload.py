@@ -0,0 +1,120 @@
+import argparse
+import json
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from api_client import ScoringClient
+from data_cache import load_dataset
+from payload import CONTENT_TYPES, decode_frame, decode_predictions, encode_frame, encode_predictions
+
+
+def best_time(fn: Callable, repeats: int) -> float:
+    """Best wall time of fn over repeats calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_codecs(X, n_rows: int, formats: List[str], repeats: int = 5) -> List[dict]:
+    """
+    Encode/decode cost of a request and its response in every format, without network.
+
+    Decoded frames are checked against the original rows, so a faster
+    format cannot silently change what the model sees.
+    """
+    frame = X.iloc[np.arange(n_rows) % len(X)].reset_index(drop=True)
+    predictions = np.random.default_rng(0).normal(size=n_rows)
+    results = []
+    for name in formats:
+        content_type = CONTENT_TYPES[name]
+        body = encode_frame(frame, content_type)
+        decoded = decode_frame(body, content_type)
+        if not (decoded.columns.tolist() == frame.columns.tolist()
+                and np.array_equal(decoded.to_numpy(dtype=np.float64), frame.to_numpy(dtype=np.float64))):
+            raise Exception(f"{name} payload does not round-trip the features")
+        response, response_type = encode_predictions(predictions, content_type)
+
+        results.append({
+            "format": name,
+            "rows": n_rows,
+            "request_bytes": len(body),
+            "response_bytes": len(response),
+            "client_encode_ms": best_time(lambda: encode_frame(frame, content_type), repeats) * 1000,
+            "server_decode_ms": best_time(lambda: decode_frame(body, content_type), repeats) * 1000,
+            "server_encode_ms": best_time(lambda: encode_predictions(predictions, content_type), repeats) * 1000,
+            "client_decode_ms": best_time(lambda: decode_predictions(response, response_type), repeats) * 1000,
+        })
+        r = results[-1]
+        r["total_ms"] = r["client_encode_ms"] + r["server_decode_ms"] + r["server_encode_ms"] + r["client_decode_ms"]
+    return results
+
+
+def bench_endpoint(url: str, X, n_rows: int, formats: List[str], repeats: int = 5) -> List[dict]:
+    """
+    End-to-end predict latency against a running in-process server.
+
+    Predictions must be identical whatever the format.
+    """
+    frame = X.iloc[np.arange(n_rows) % len(X)].reset_index(drop=True)
+    results = []
+    reference = None
+    for name in formats:
+        with ScoringClient(url, format=name) as client:
+            predictions = client.predict(frame)
+            if reference is None:
+                reference = predictions
+            elif not np.array_equal(predictions, reference):
+                raise Exception(f"{name} predictions differ from {formats[0]} predictions")
+            results.append({
+                "format": name,
+                "rows": n_rows,
+                "predict_ms": best_time(lambda: client.predict(frame), repeats) * 1000,
+            })
+    return results
+
+
+def print_table(results: List[dict], columns: List[str]):
+    print(" ".join(f"{c:>16}" for c in columns))
+    for r in results:
+        print(" ".join(f"{r[c]:>16.2f}" if isinstance(r[c], float) else f"{r[c]:>16}" for c in columns))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmark binary /invocations payloads against JSON')
+    parser.add_argument('--data', type=str, default="data/fake_data.csv", help='Dataset providing the rows')
+    parser.add_argument('--rows', type=str, default="100,10000,50000", help='Comma-separated request sizes')
+    parser.add_argument('--formats', type=str, default="json,arrow,raw", help='Payload formats to compare')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repetitions (best kept)')
+    parser.add_argument('--url', type=str, help='Also time predictions against this in-process server')
+    parser.add_argument('--output', type=str, default="bench_payload.json", help='JSON results file')
+    args = parser.parse_args(argv)
+
+    X, _ = load_dataset(args.data)
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    row_counts = [int(n) for n in args.rows.split(",") if n.strip()]
+
+    report = {"codecs": [], "endpoint": []}
+    for n_rows in row_counts:
+        report["codecs"] += bench_codecs(X, n_rows, formats, args.repeats)
+        if args.url:
+            report["endpoint"] += bench_endpoint(args.url, X, n_rows, formats, args.repeats)
+
+    print("\nSerialization cost per request (encode + decode of request and response):")
+    print_table(report["codecs"], ["format", "rows", "request_bytes", "client_encode_ms",
+                                   "server_decode_ms", "total_ms"])
+    if report["endpoint"]:
+        print(f"\nEnd-to-end predict latency ({args.url}):")
+        print_table(report["endpoint"], ["format", "rows", "predict_ms"])
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
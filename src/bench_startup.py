@@ -0,0 +1,66 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+from apple_cli import COMMANDS, import_breakdown, parse_importtime
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "apple_cli.py")
+
+
+def time_command(cmd: List[str], repeats: int) -> List[float]:
+    """Wall times in ms of repeated runs of a command (after one warm-up run)."""
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def heaviest_imports(cmd: List[str], top: int = 3) -> str:
+    """Slowest top-level imports of a command, e.g. "mlflow 950ms, argparse 10ms"."""
+    result = subprocess.run([cmd[0], "-X", "importtime"] + cmd[1:],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    breakdown = import_breakdown(parse_importtime(result.stderr))
+    return ", ".join(f"{package} {us / 1000:.0f}ms" for package, us in breakdown[:top])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time of the CLI subcommands against a budget')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed runs per command')
+    parser.add_argument('--budget_ms', type=float, default=300.0,
+                        help='Maximum median startup time of --help, exits 1 when a command exceeds it')
+    parser.add_argument('--baseline', action='store_true',
+                        help='Also time an eager `import mlflow, pandas` for comparison')
+    args = parser.parse_args()
+
+    cases = [("apple_cli.py --help", [sys.executable, CLI, "--help"])]
+    cases += [(f"apple_cli.py {name} --help", [sys.executable, CLI, name, "--help"]) for name in COMMANDS]
+    if args.baseline:
+        cases.append(("import mlflow, pandas (baseline)", [sys.executable, "-c", "import mlflow, pandas"]))
+
+    print(f"{'command':<36} {'median ms':>10} {'max ms':>8}  budget  heaviest imports")
+    over_budget = []
+    for label, cmd in cases:
+        times = time_command(cmd, args.repeats)
+        median = statistics.median(times)
+        is_baseline = label.endswith("(baseline)")
+        within = median <= args.budget_ms
+        if not within and not is_baseline:
+            over_budget.append(label)
+        verdict = "-" if is_baseline else ("ok" if within else "OVER")
+        print(f"{label:<36} {median:>10.0f} {max(times):>8.0f}  {verdict:<6}  {heaviest_imports(cmd)}")
+
+    if over_budget:
+        print(f"\n{len(over_budget)} command(s) over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    print(f"\nAll commands within the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import mlflow
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+
+from data_cache import DROP_COLUMNS, load_dataset
+
+# Parameter sets of 02a_experiment.py ... 02d_experiment.py
+PARAM_SETS = {
+    "02a": {"n_estimators": 100, "max_depth": 5, "random_state": 42},
+    "02b": {"n_estimators": 50, "max_depth": 20, "random_state": 42},
+    "02c": {"n_estimators": 200, "max_depth": 30, "random_state": 42},
+    "02d": {"n_estimators": 300, "max_depth": 10, "random_state": 42},
+}
+SUITES = ["data", "fit", "logging", "model", "register", "serve"]
+EXPERIMENT_NAME = "Apple_Models_Bench"
+
+
+def measure(fn: Callable[[], object], repeats: int, warmup: int = 1,
+            setup: Optional[Callable[[], None]] = None) -> dict:
+    """
+    Wall-time statistics of repeated calls of fn, in milliseconds.
+
+    Args:
+        fn: Measured call
+        repeats: Timed calls
+        warmup: Untimed calls before the timed ones
+        setup: Untimed call before every call of fn (e.g. clearing a cache)
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "repeats": repeats,
+    }
+
+
+class BenchmarkSuite:
+    """
+    End-to-end timings of the pipeline steps against a throwaway local tracking store.
+
+    The store (file or SQLite, with a local artifact root) lives in a
+    temporary work directory, so runs do not depend on a tracking server or
+    on the state of previous runs. Every timing is the median of `repeats`
+    calls after a warm-up call.
+    """
+
+    def __init__(self, workdir: str, backend: str = "file", data_path: str = "data/fake_data.csv",
+                 repeats: int = 5, scales: Optional[List[int]] = None):
+        self.workdir = workdir
+        self.backend = backend
+        self.data_path = data_path
+        self.repeats = repeats
+        self.scales = scales or [1, 10, 100]
+        self.results: Dict[str, dict] = {}
+
+        if backend == "file":
+            self.tracking_uri = "file://" + os.path.join(workdir, "mlruns")
+        elif backend == "sqlite":
+            self.tracking_uri = "sqlite:///" + os.path.join(workdir, "mlflow.db")
+        else:
+            raise Exception(f"Unknown backend '{backend}', use file or sqlite")
+        mlflow.set_tracking_uri(self.tracking_uri)
+        self.client = mlflow.tracking.MlflowClient()
+        self.experiment_id = self.client.create_experiment(
+            EXPERIMENT_NAME, artifact_location="file://" + os.path.join(workdir, "artifacts"))
+
+        X, y = load_dataset(data_path, cache_dir=os.path.join(workdir, "data_cache"), mmap=False)
+        self.X_train, self.X_val, self.y_train, self.y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+        self.model = None
+        self.model_uri = None
+
+    def record(self, name: str, stats: dict):
+        self.results[name] = stats
+        print(f"{name:<36} {stats['median_ms']:>10.2f} ms  (min {stats['min_ms']:.2f}, max {stats['max_ms']:.2f})")
+
+    # Suites
+
+    def bench_data(self):
+        """CSV parsing and cached loading of fake_data.csv and tiled scale-ups."""
+        source = pd.read_csv(self.data_path)
+        for scale in self.scales:
+            path = self.data_path
+            if scale > 1:
+                path = os.path.join(self.workdir, f"fake_data_x{scale}.csv")
+                pd.concat([source] * scale, ignore_index=True).to_csv(path, index=False)
+
+            def read_csv():
+                df = pd.read_csv(path)
+                return df.drop(columns=DROP_COLUMNS).astype(float), df["demand"]
+
+            # mmap=False: the arrays are read into memory, as read_csv does (a memmap
+            # would only time opening the files)
+            cache_dir = os.path.join(self.workdir, f"data_cache_x{scale}")
+            self.record(f"data.read_csv_x{scale}", measure(read_csv, self.repeats))
+            self.record(f"data.cache_build_x{scale}", measure(
+                lambda: load_dataset(path, cache_dir=cache_dir, mmap=False), self.repeats,
+                setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True)))
+            self.record(f"data.cached_load_x{scale}", measure(
+                lambda: load_dataset(path, cache_dir=cache_dir, mmap=False), self.repeats))
+
+    def bench_fit(self):
+        """Fit time of the 02a-02d parameter sets."""
+        for name, params in PARAM_SETS.items():
+            def fit():
+                return RandomForestRegressor(**params).fit(self.X_train, self.y_train)
+
+            self.record(f"fit.{name}", measure(fit, self.repeats, warmup=0))
+
+    def bench_logging(self):
+        """Per-call latency of params, metrics and a batch of metrics."""
+        with mlflow.start_run(experiment_id=self.experiment_id, run_name="bench_logging"):
+            counter = iter(range(10 ** 9))
+            calls = self.repeats * 10
+            self.record("logging.log_param", measure(lambda: mlflow.log_param(f"p{next(counter)}", 1), calls))
+            self.record("logging.log_metric", measure(lambda: mlflow.log_metric("m", 1.0), calls))
+            metrics = {f"m{i}": float(i) for i in range(100)}
+            self.record("logging.log_metrics_100", measure(lambda: mlflow.log_metrics(metrics), self.repeats))
+            self.record("logging.start_end_run", measure(self._empty_run, self.repeats))
+
+    def _empty_run(self):
+        with mlflow.start_run(experiment_id=self.experiment_id, run_name="bench_empty", nested=True):
+            pass
+
+    def bench_model(self):
+        """log_model and load_model of the 02a forest (with an input example, as the scripts do)."""
+        self.model = RandomForestRegressor(**PARAM_SETS["02a"]).fit(self.X_train, self.y_train)
+        example = self.X_val.head(5)
+        uris = []
+
+        def log_model():
+            with mlflow.start_run(experiment_id=self.experiment_id, run_name="bench_model") as run:
+                mlflow.sklearn.log_model(sk_model=self.model, input_example=example, artifact_path="rf_apples")
+            uris.append(f"runs:/{run.info.run_id}/rf_apples")
+
+        self.record("model.log_model", measure(log_model, self.repeats))
+        self.model_uri = uris[-1]
+        self.record("model.load_model", measure(lambda: mlflow.pyfunc.load_model(self.model_uri), self.repeats))
+
+    def bench_register(self):
+        """Creation time of a registered model version."""
+        if self.model_uri is None:
+            self.bench_model()
+        self.record("register.register_model", measure(
+            lambda: mlflow.register_model(self.model_uri, "bench_model"), self.repeats))
+
+    def bench_serve(self):
+        """Request latency of the in-process server (model_server.py) for 1 and 100 rows."""
+        import model_server
+        from api_client import ScoringClient
+
+        if self.model_uri is None:
+            self.bench_model()
+        batcher = model_server.MicroBatcher(mlflow.pyfunc.load_model(self.model_uri).predict)
+        app = model_server.ScoringApp(model_server.ModelRouter({"1": batcher}))
+        server = model_server.make_server(app, host="127.0.0.1", port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/invocations"
+            with ScoringClient(url) as client:
+                for rows in (1, 100):
+                    frame = self.X_val.iloc[np.arange(rows) % len(self.X_val)]
+                    self.record(f"serve.predict_{rows}_rows", measure(lambda: client.predict(frame),
+                                                                      self.repeats * 10, warmup=5))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def run(self, suites: List[str]) -> dict:
+        start = time.perf_counter()
+        for suite in suites:
+            getattr(self, f"bench_{suite}")()
+        return {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "backend": self.backend,
+                "repeats": self.repeats,
+                "scales": self.scales,
+                "data": self.data_path,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "mlflow": mlflow.__version__,
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "duration_s": time.perf_counter() - start,
+            },
+            "results": self.results,
+        }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2, min_delta_ms: float = 1.0) -> List[dict]:
+    """
+    Median timings of current against baseline.
+
+    A benchmark regresses when its median is more than `threshold` (relative)
+    and more than `min_delta_ms` (absolute, ignores noise on sub-millisecond
+    timings) above the baseline.
+
+    Returns:
+        list: One row per benchmark present in both results
+    """
+    rows = []
+    for name, stats in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["median_ms"], stats["median_ms"]
+        change = (after - before) / before if before > 0 else 0.0
+        if change > threshold and after - before > min_delta_ms:
+            status = "REGRESSION"
+        elif change < -threshold and before - after > min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"name": name, "baseline_ms": before, "current_ms": after, "change": change, "status": status})
+    return rows
+
+
+def print_comparison(rows: List[dict], baseline: dict, current: dict):
+    for label, result in (("baseline", baseline), ("current", current)):
+        meta = result["meta"]
+        print(f"{label:>8}: {meta['timestamp']} {meta['backend']} backend, python {meta['python']}, "
+              f"mlflow {meta['mlflow']}")
+    for key in ("platform", "backend"):
+        if baseline["meta"][key] != current["meta"][key]:
+            print(f"Warning: results come from different {key}s")
+    print(f"\n{'benchmark':<36} {'baseline ms':>12} {'current ms':>11} {'change':>8}  status")
+    for row in rows:
+        print(f"{row['name']:<36} {row['baseline_ms']:>12.2f} {row['current_ms']:>11.2f} "
+              f"{row['change']:>+8.1%}  {row['status']}")
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end performance benchmarks on a local tracking store')
+    parser.add_argument('--backend', type=str, default="file", choices=["file", "sqlite"], help='Tracking store')
+    parser.add_argument('--suites', type=str, default=",".join(SUITES),
+                        help=f'Comma-separated suites among {",".join(SUITES)}')
+    parser.add_argument('--data', type=str, default="data/fake_data.csv", help='Dataset')
+    parser.add_argument('--scales', type=str, default="1,10,100", help='Dataset scale-up factors of the data suite')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repeats per benchmark')
+    parser.add_argument('--output', type=str, help='Results JSON (default: bench_<backend>_<timestamp>.json)')
+    parser.add_argument('--workdir', type=str, help='Keep the tracking store in this directory (default: temporary)')
+    parser.add_argument('--compare', type=str, help='Baseline results JSON to compare against')
+    parser.add_argument('--current', type=str, help='Compare this results JSON with --compare instead of running')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative slowdown flagged as a regression')
+    parser.add_argument('--min_delta_ms', type=float, default=1.0, help='Ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    if args.current:
+        if not args.compare:
+            parser.error("--current requires --compare")
+        current = load_results(args.current)
+    else:
+        suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+        unknown = set(suites) - set(SUITES)
+        if unknown:
+            parser.error(f"Unknown suites {sorted(unknown)}, available: {SUITES}")
+
+        workdir = args.workdir or tempfile.mkdtemp(prefix="apple-bench-")
+        os.makedirs(workdir, exist_ok=True)
+        try:
+            suite = BenchmarkSuite(workdir, backend=args.backend, data_path=args.data, repeats=args.repeats,
+                                   scales=[int(s) for s in args.scales.split(",")])
+            print(f"Tracking store: {suite.tracking_uri}\n")
+            current = suite.run(suites)
+        finally:
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        output = args.output or f"bench_{args.backend}_{time.strftime('%Y%m%d%H%M%S')}.json"
+        with open(output, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults saved to {output} ({current['meta']['duration_s']:.0f}s)")
+
+    if args.compare:
+        baseline = load_results(args.compare)
+        rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+        print()
+        print_comparison(rows, baseline, current)
+        regressions = [row["name"] for row in rows if row["status"] == "REGRESSION"]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regression above {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+
+from flat_forest import FlatForest
+
+
+def round_down_float32(threshold: np.ndarray) -> np.ndarray:
+    """
+    Largest float32 not above each float64 threshold.
+
+    sklearn compares float32 features with float64 thresholds, and for a
+    float32 x, x <= t holds exactly when x <= round_down_float32(t), so the
+    cast does not change any split decision.
+    """
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def merge_leaves(tree, tolerance: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collapse splits whose two children are leaves with close values, bottom-up.
+
+    Args:
+        tree: sklearn Tree (estimator.tree_)
+        tolerance: Maximum value difference between merged siblings; 0 only
+                   merges identical leaves, which leaves predictions unchanged
+    Returns:
+        tuple: (children_left, children_right, value) with merged splits turned into leaves
+    """
+    left = tree.children_left.copy()
+    right = tree.children_right.copy()
+    value = tree.value[:, 0, 0].copy()
+
+    # Reverse pre-order visits children before their parent
+    order, stack = [], [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if left[node] != -1:
+            stack.extend((left[node], right[node]))
+
+    for node in reversed(order):
+        l, r = left[node], right[node]
+        if l == -1 or left[l] != -1 or left[r] != -1:
+            continue
+        if value[l] == value[r]:
+            value[node] = value[l]
+        elif abs(value[l] - value[r]) > tolerance:
+            continue
+        # Otherwise the parent value is already the weighted mean of both leaves
+        left[node] = right[node] = -1
+    return left, right, value
+
+
+def compact_forest(forest, merge: bool = False, merge_tolerance: float = 0.0) -> FlatForest:
+    """
+    Compact FlatForest of a fitted sklearn forest.
+
+    Keeps only the arrays used for prediction (no impurity, sample counts or
+    estimator objects), with float32 thresholds rounded down (lossless),
+    float32 leaf values, int32 indices and optionally merged leaves. Nodes
+    unreachable after merging are dropped.
+    """
+    if forest.n_outputs_ != 1:
+        raise Exception("Only single-output forests can be compacted")
+    features, thresholds, lefts, rights, values, roots, depths = [], [], [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        if merge:
+            left, right, value = merge_leaves(tree, merge_tolerance)
+        else:
+            left, right, value = tree.children_left, tree.children_right, tree.value[:, 0, 0]
+
+        # Renumber reachable nodes in pre-order
+        order, depth, stack = [], {0: 0}, [0]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            if left[node] != -1:
+                depth[left[node]] = depth[right[node]] = depth[node] + 1
+                stack.extend((right[node], left[node]))
+        order = np.asarray(order)
+        new_index = np.full(tree.node_count, -1, dtype=np.int64)
+        new_index[order] = np.arange(len(order)) + offset
+
+        is_leaf = left[order] == -1
+        roots.append(offset)
+        depths.append(max(depth.values()))
+        features.append(np.where(is_leaf, 0, tree.feature[order]))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+        lefts.append(np.where(is_leaf, new_index[order], new_index[left[order]]))
+        rights.append(np.where(is_leaf, new_index[order], new_index[right[order]]))
+        values.append(value[order])
+        offset += len(order)
+
+    feature_names = getattr(forest, "feature_names_in_", None)
+    return FlatForest(
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=round_down_float32(np.concatenate(thresholds)),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        value=np.concatenate(values).astype(np.float32),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=max(depths),
+        n_features=forest.n_features_in_,
+        feature_names=feature_names.tolist() if feature_names is not None else None,
+    )
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under path."""
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def median_load_time(model_path: str, repeats: int = 3) -> float:
+    """Median pyfunc load time of a local model directory, in seconds."""
+    import mlflow
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        mlflow.pyfunc.load_model(model_path)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def compaction_report(original_path: str, compacted_path: str, y_true, original_pred, compacted_pred) -> Dict:
+    """Size, load time and accuracy of a compacted model against its original."""
+    from sweep import compute_metrics
+
+    original, compacted = compute_metrics(y_true, original_pred), compute_metrics(y_true, compacted_pred)
+    report = {
+        "original_bytes": directory_size(original_path),
+        "compacted_bytes": directory_size(compacted_path),
+        "original_load_s": median_load_time(original_path),
+        "compacted_load_s": median_load_time(compacted_path),
+        "max_abs_prediction_delta": float(np.abs(np.asarray(original_pred) - np.asarray(compacted_pred)).max()),
+    }
+    for name in original:
+        report[f"original_{name}"] = original[name]
+        report[f"compacted_{name}"] = compacted[name]
+    report["r2_delta"] = compacted["r2"] - original["r2"]
+    return report
+
+
+def save_compacted_model(forest: FlatForest, directory: str, input_example=None) -> str:
+    """
+    Save a compacted forest as a local flat pyfunc model under directory.
+
+    The caller owns directory (e.g. a TemporaryDirectory) and removes it once
+    the model is logged. Returns the model directory.
+    """
+    import mlflow
+
+    from flat_forest import FlatForestModel
+
+    os.makedirs(directory, exist_ok=True)
+    forest_path = os.path.join(directory, "flat_forest.npz")
+    forest.save(forest_path)
+    model_path = os.path.join(directory, "model")
+    signature = None
+    if input_example is not None:
+        signature = mlflow.models.infer_signature(input_example, forest.predict(input_example))
+    mlflow.pyfunc.save_model(
+        model_path,
+        python_model=FlatForestModel(),
+        artifacts={"flat_forest": forest_path},
+        code_path=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "flat_forest.py")],
+        input_example=input_example,
+        signature=signature,
+    )
+    return model_path
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns that are never used as features
+DROP_COLUMNS = ["date", "demand"]
+TARGET_COLUMN = "demand"
+
+# Bump when the on-disk layout changes so old entries are ignored
+CACHE_VERSION = 1
+CHUNK_ROWS = 200_000
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def default_cache_dir(data_path: str) -> str:
+    """Cache directory used when none is given (env var, else next to the data file)."""
+    env_dir = os.environ.get("APPLE_DATA_CACHE_DIR")
+    if env_dir:
+        return env_dir
+    return os.path.join(os.path.dirname(os.path.abspath(data_path)), ".data_cache")
+
+
+def file_sha256(path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Return the sha256 of a file.
+
+    The digest is memoized in the cache directory against (size, mtime) so that
+    a multi-GB file is only read once as long as it is left untouched.
+    """
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    index_path = os.path.join(cache_dir, "hashes.json") if cache_dir else None
+    index = {}
+    abs_path = os.path.abspath(path)
+
+    if index_path and os.path.exists(index_path):
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        entry = index.get(abs_path)
+        if entry and entry["stamp"] == stamp:
+            return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    sha = digest.hexdigest()
+
+    if index_path:
+        index[abs_path] = {"stamp": stamp, "sha256": sha}
+        _atomic_write_json(index_path, index)
+    return sha
+
+
+def count_rows(path: str) -> int:
+    """Count data rows of a CSV file (newlines minus the header), without parsing it."""
+    n_lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            n_lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        n_lines += 1
+    return max(n_lines - 1, 0)
+
+
+def build_cache(data_path: str, entry_dir: str) -> None:
+    """
+    Convert a CSV file into X.npy / y.npy / meta.json inside entry_dir.
+
+    The CSV is read in chunks and written straight into preallocated .npy files,
+    so the conversion never needs the whole frame in memory.
+    """
+    n_rows = count_rows(data_path)
+    columns = pd.read_csv(data_path, nrows=0).columns.tolist()
+    features = [c for c in columns if c not in DROP_COLUMNS]
+
+    parent = os.path.dirname(entry_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        X = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, "X.npy"), mode="w+", dtype=np.float64, shape=(n_rows, len(features))
+        )
+        y = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, "y.npy"), mode="w+", dtype=np.float64, shape=(n_rows,)
+        )
+        start = 0
+        for chunk in pd.read_csv(data_path, chunksize=CHUNK_ROWS):
+            stop = start + len(chunk)
+            X[start:stop] = chunk[features].to_numpy(dtype=np.float64)
+            y[start:stop] = chunk[TARGET_COLUMN].to_numpy(dtype=np.float64)
+            start = stop
+        if start != n_rows:
+            raise Exception(f"Row count mismatch while caching {data_path}: expected {n_rows}, read {start}")
+        X.flush()
+        y.flush()
+        del X, y
+
+        meta = {
+            "version": CACHE_VERSION,
+            "source": os.path.abspath(data_path),
+            "n_rows": n_rows,
+            "columns": features,
+            "target": TARGET_COLUMN,
+        }
+        _atomic_write_json(os.path.join(tmp_dir, "meta.json"), meta)
+
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process finished the same entry first, keep theirs
+            if not os.path.exists(os.path.join(entry_dir, "meta.json")):
+                raise
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def load_arrays(data_path: str, cache_dir: Optional[str] = None,
+                mmap: bool = True) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Load feature matrix, target and feature names for a demand CSV file.
+
+    The first call converts the CSV into a cache entry keyed by the file hash;
+    later calls memory-map the cached arrays, so parallel workers share a single
+    copy through the page cache.
+
+    Args:
+        data_path: Path to the CSV file
+        cache_dir: Cache root (default: see default_cache_dir)
+        mmap: Memory-map the arrays (read-only) instead of reading them into memory
+    Returns:
+        tuple: (X, y, feature column names)
+    """
+    cache_dir = cache_dir or default_cache_dir(data_path)
+    sha = file_sha256(data_path, cache_dir)
+    entry_dir = os.path.join(cache_dir, f"v{CACHE_VERSION}-{sha}")
+
+    if not os.path.exists(os.path.join(entry_dir, "meta.json")):
+        build_cache(data_path, entry_dir)
+
+    with open(os.path.join(entry_dir, "meta.json")) as f:
+        meta = json.load(f)
+
+    mmap_mode = "r" if mmap else None
+    X = np.load(os.path.join(entry_dir, "X.npy"), mmap_mode=mmap_mode)
+    y = np.load(os.path.join(entry_dir, "y.npy"), mmap_mode=mmap_mode)
+    return X, y, meta["columns"]
+
+
+def load_dataset(data_path: str, cache_dir: Optional[str] = None,
+                 mmap: bool = True) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Load ready-to-train X (float features) and y (demand) for a demand CSV file.
+
+    Same result as reading the CSV, dropping date/demand and casting to float,
+    but served from the memory-mapped cache (see load_arrays).
+
+    Returns:
+        tuple: (X as DataFrame, y as Series)
+    """
+    X, y, columns = load_arrays(data_path, cache_dir=cache_dir, mmap=mmap)
+    X_df = pd.DataFrame(X, columns=columns, copy=False)
+    y_series = pd.Series(y, name=TARGET_COLUMN, copy=False)
+    return X_df, y_series
+
+
+def _atomic_write_json(path: str, payload) -> None:
+    """Write JSON through a temporary file so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or inspect the dataset cache")
+    parser.add_argument("--data_path", default="data/fake_data.csv", help="Path to the CSV file")
+    parser.add_argument("--cache_dir", default=None, help="Cache directory (optional)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    X, y, columns = load_arrays(args.data_path, cache_dir=args.cache_dir)
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {X.shape[0]} rows x {X.shape[1]} features in {elapsed:.3f}s")
+    print(f"Columns: {columns}")
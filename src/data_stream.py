@@ -0,0 +1,172 @@
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from data_cache import DROP_COLUMNS, TARGET_COLUMN
+
+# hash_pandas_object needs a 16 character key; two keys give two independent hashes
+SPLIT_HASH_KEY = "apple-split-0001"
+SAMPLE_HASH_KEY = "apple-sample-001"
+HASH_BUCKETS = 10_000
+
+
+def iter_chunks(data_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Yield the CSV file as DataFrames of at most chunksize rows."""
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        yield chunk
+
+
+def row_hashes(chunk: pd.DataFrame, hash_key: str) -> np.ndarray:
+    """Content hash of every row, independent of the chunk boundaries and row order."""
+    return pd.util.hash_pandas_object(chunk, index=False, hash_key=hash_key).to_numpy()
+
+
+def validation_mask(chunk: pd.DataFrame, test_size: float = 0.2) -> np.ndarray:
+    """
+    Deterministic hash-based train/validation split.
+
+    A row always lands on the same side of the split whatever the chunk size,
+    so the split is reproducible without ever holding the whole file.
+    """
+    buckets = row_hashes(chunk, SPLIT_HASH_KEY) % HASH_BUCKETS
+    return buckets < int(test_size * HASH_BUCKETS)
+
+
+def prepare_chunk(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Drop date/demand and cast features to float, as the in-memory scripts do."""
+    X = chunk.drop(columns=DROP_COLUMNS).astype('float')
+    y = chunk[TARGET_COLUMN].to_numpy(dtype=np.float64)
+    return X, y
+
+
+def iter_split(data_path: str, chunksize: int, test_size: float = 0.2,
+               subset: str = "train") -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+    """Yield (X, y) for the train or validation rows of each chunk."""
+    for chunk in iter_chunks(data_path, chunksize):
+        mask = validation_mask(chunk, test_size)
+        if subset == "train":
+            mask = ~mask
+        if not mask.any():
+            continue
+        yield prepare_chunk(chunk[mask])
+
+
+class StreamingMetrics:
+    """Accumulate mae/mse/rmse/r2 over prediction chunks in constant memory."""
+
+    def __init__(self):
+        self.n = 0
+        self.sum_abs_err = 0.0
+        self.sum_sq_err = 0.0
+        self.sum_y = 0.0
+        self.sum_y_sq = 0.0
+
+    def update(self, y_true, y_pred):
+        err = np.asarray(y_true, dtype=np.float64) - np.asarray(y_pred, dtype=np.float64)
+        self.n += len(err)
+        self.sum_abs_err += float(np.abs(err).sum())
+        self.sum_sq_err += float(np.square(err).sum())
+        self.sum_y += float(np.sum(y_true))
+        self.sum_y_sq += float(np.square(y_true).sum())
+
+    def result(self) -> Dict[str, float]:
+        if self.n == 0:
+            raise Exception("No validation rows seen, cannot compute metrics")
+        mse = self.sum_sq_err / self.n
+        total_ss = self.sum_y_sq - self.sum_y ** 2 / self.n
+        r2 = 1.0 - self.sum_sq_err / total_ss if total_ss > 0 else 0.0
+        return {"mae": self.sum_abs_err / self.n, "mse": mse, "rmse": float(np.sqrt(mse)), "r2": r2}
+
+
+def evaluate_stream(model, data_path: str, chunksize: int, test_size: float = 0.2) -> Dict[str, float]:
+    """Score a fitted model on the validation rows, chunk by chunk."""
+    metrics = StreamingMetrics()
+    for X_val, y_val in iter_split(data_path, chunksize, test_size, subset="val"):
+        metrics.update(y_val, model.predict(X_val))
+    return metrics.result()
+
+
+def first_validation_rows(data_path: str, chunksize: int, test_size: float = 0.2,
+                          n_rows: int = 5) -> Optional[pd.DataFrame]:
+    """Small validation sample used as the logged model input example."""
+    for X_val, _ in iter_split(data_path, chunksize, test_size, subset="val"):
+        return X_val.head(n_rows)
+    return None
+
+
+def train_sgd(data_path: str, chunksize: int, test_size: float = 0.2, epochs: int = 5,
+              random_state: int = 42,
+              on_epoch: Optional[Callable[[int, Dict[str, float]], None]] = None):
+    """
+    Train a scaled SGDRegressor with partial_fit, one chunk at a time.
+
+    A first pass fits the scaler on the training rows, then each epoch streams
+    the training rows once and is evaluated on the validation rows.
+
+    Args:
+        on_epoch: Optional callback(epoch, metrics) called after every epoch
+    Returns:
+        tuple: (fitted Pipeline, metrics of the last epoch)
+    """
+    scaler = StandardScaler()
+    for X_train, _ in iter_split(data_path, chunksize, test_size, subset="train"):
+        scaler.partial_fit(X_train)
+
+    sgd = SGDRegressor(random_state=random_state)
+    model = Pipeline([("scaler", scaler), ("sgd", sgd)])
+    metrics = {}
+    for epoch in range(epochs):
+        for X_train, y_train in iter_split(data_path, chunksize, test_size, subset="train"):
+            sgd.partial_fit(scaler.transform(X_train), y_train)
+        metrics = evaluate_stream(model, data_path, chunksize, test_size)
+        if on_epoch:
+            on_epoch(epoch, metrics)
+    return model, metrics
+
+
+def sample_training_rows(data_path: str, chunksize: int, max_rows: int,
+                         test_size: float = 0.2) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Deterministic bottom-k sample of at most max_rows training rows.
+
+    Every row gets a priority from a second content hash and the max_rows lowest
+    priorities are kept, so memory stays bounded by max_rows + chunksize.
+    """
+    kept_X, kept_y, kept_priority = None, None, None
+    for chunk in iter_chunks(data_path, chunksize):
+        chunk = chunk[~validation_mask(chunk, test_size)]
+        if chunk.empty:
+            continue
+        X, y = prepare_chunk(chunk)
+        priority = row_hashes(chunk, SAMPLE_HASH_KEY)
+        if kept_X is not None:
+            X = pd.concat([kept_X, X], ignore_index=True)
+            y = np.concatenate([kept_y, y])
+            priority = np.concatenate([kept_priority, priority])
+        if len(priority) > max_rows:
+            keep = np.argpartition(priority, max_rows - 1)[:max_rows]
+            keep.sort()
+            X, y, priority = X.iloc[keep].reset_index(drop=True), y[keep], priority[keep]
+        kept_X, kept_y, kept_priority = X, y, priority
+    if kept_X is None:
+        raise Exception(f"No training rows found in {data_path}")
+    return kept_X, kept_y
+
+
+def train_subsampled_forest(data_path: str, chunksize: int, params: dict, max_rows: int,
+                            test_size: float = 0.2):
+    """
+    Fit a RandomForestRegressor on a bounded sample of the training rows.
+
+    Returns:
+        tuple: (fitted forest, streaming validation metrics)
+    """
+    X_train, y_train = sample_training_rows(data_path, chunksize, max_rows, test_size)
+    rf = RandomForestRegressor(**params)
+    rf.fit(X_train, y_train)
+    return rf, evaluate_stream(rf, data_path, chunksize, test_size)
@@ -0,0 +1,254 @@
+import argparse
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import mlflow
+import numpy as np
+import pandas as pd
+
+# (row, tree) pairs evaluated together, small enough to stay in cache
+CHUNK_ELEMENTS = 1 << 16
+
+
+class FlatForest:
+    """
+    Random forest regressor stored as flat arrays and evaluated with NumPy.
+
+    The nodes of all trees are concatenated in contiguous arrays (feature,
+    threshold, left, right, value) and every (row, tree) pair advances one
+    level per step, so a whole forest is evaluated in max_depth vectorized
+    steps. Leaves point to themselves, which lets pairs that reached a leaf
+    early keep stepping without branching. Children are interleaved
+    (2 * node + go_right) so a step is a single gather.
+
+    NumPy cannot match sklearn's compiled traversal on large batches; the
+    gain is on the small requests of online serving, where sklearn's per-call
+    overhead dominates (single row, micro-batches of a few hundred rows).
+
+    Predictions are identical to RandomForestRegressor.predict: features are
+    cast to float32 and compared with the float64 thresholds exactly as
+    sklearn does, and tree values are summed tree by tree in estimator order
+    before dividing by the number of trees.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int, n_features: int,
+                 feature_names: Optional[List[str]] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        # Evaluation layout: int32 indices, children interleaved
+        self._feature = feature.astype(np.int32)
+        self._roots = roots.astype(np.int32)
+        self._children = np.empty(2 * len(feature), dtype=np.int32)
+        self._children[0::2] = left
+        self._children[1::2] = right
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, forest) -> "FlatForest":
+        """Convert a fitted single-output RandomForestRegressor (or ExtraTreesRegressor)."""
+        if forest.n_outputs_ != 1:
+            raise Exception("Only single-output forests can be flattened")
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            offset += tree.node_count
+
+        feature_names = getattr(forest, "feature_names_in_", None)
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.int64),
+            right=np.concatenate(rights).astype(np.int64),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max(e.tree_.max_depth for e in forest.estimators_),
+            n_features=forest.n_features_in_,
+            feature_names=feature_names.tolist() if feature_names is not None else None,
+        )
+
+    def _features(self, X) -> np.ndarray:
+        """Float32 feature matrix, DataFrame columns reordered by name."""
+        if isinstance(X, pd.DataFrame) and self.feature_names is not None:
+            missing = [c for c in self.feature_names if c not in X.columns]
+            if missing:
+                raise ValueError(f"Model is missing inputs {missing}")
+            X = X[self.feature_names]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+        return X
+
+    def predict(self, X) -> np.ndarray:
+        """Predictions for a DataFrame (columns matched by name) or a 2D array."""
+        X = self._features(X)
+        predictions = np.empty(len(X), dtype=np.float64)
+        chunk_rows = max(1, CHUNK_ELEMENTS // self.n_trees)
+        for start in range(0, len(X), chunk_rows):
+            predictions[start:start + chunk_rows] = self._predict_chunk(X[start:start + chunk_rows])
+        return predictions
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        flat_X = X.ravel()
+        row_offsets = (np.arange(len(X), dtype=np.int32) * self.n_features)[:, None]
+        nodes = np.repeat(self._roots[None, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            # sklearn goes left when x <= threshold (float32 x promoted to float64)
+            go_right = flat_X[row_offsets + self._feature[nodes]] > self.threshold[nodes]
+            nodes = self._children[(nodes << 1) | go_right]
+
+        leaf_values = self.value[nodes]
+        total = np.zeros(len(X), dtype=np.float64)
+        for t in range(self.n_trees):
+            total += leaf_values[:, t]
+        return total / self.n_trees
+
+    def save(self, path: str):
+        """Save the arrays to a .npz file."""
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots, max_depth=self.max_depth, n_features=self.n_features,
+            feature_names=np.asarray(self.feature_names or [], dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "FlatForest":
+        with np.load(path) as data:
+            feature_names = data["feature_names"].tolist()
+            return cls(
+                feature=data["feature"], threshold=data["threshold"], left=data["left"],
+                right=data["right"], value=data["value"], roots=data["roots"],
+                max_depth=int(data["max_depth"]), n_features=int(data["n_features"]),
+                feature_names=feature_names or None,
+            )
+
+
+class FlatForestModel(mlflow.pyfunc.PythonModel):
+    """pyfunc wrapper of a FlatForest saved as the 'flat_forest' artifact."""
+
+    def load_context(self, context):
+        self.forest = FlatForest.load(context.artifacts["flat_forest"])
+
+    def predict(self, context, model_input):
+        return self.forest.predict(model_input)
+
+
+def log_flat_forest(forest: FlatForest, artifact_path: str, input_example=None, signature=None):
+    """
+    Log a FlatForest as a pyfunc model in the active run.
+
+    This module is shipped with the model (code_path), so loading it does
+    not need the repository on the path.
+    """
+    if signature is None and input_example is not None:
+        signature = mlflow.models.infer_signature(input_example, forest.predict(input_example))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "flat_forest.npz")
+        forest.save(path)
+        return mlflow.pyfunc.log_model(
+            artifact_path=artifact_path,
+            python_model=FlatForestModel(),
+            artifacts={"flat_forest": path},
+            code_path=[os.path.abspath(__file__)],
+            input_example=input_example,
+            signature=signature,
+        )
+
+
+def load_flat_forest(model_path: str) -> FlatForest:
+    """
+    FlatForest of a local model directory.
+
+    Flat pyfunc models are loaded directly, sklearn forests are converted.
+    """
+    flat_path = os.path.join(model_path, "artifacts", "flat_forest.npz")
+    if os.path.exists(flat_path):
+        return FlatForest.load(flat_path)
+    return FlatForest.from_sklearn(mlflow.sklearn.load_model(model_path))
+
+
+def benchmark(predict_fn, X: pd.DataFrame, repeats: int = 200, batch_rows: int = 10_000) -> dict:
+    """Median single-row latency and batch throughput of a predict function."""
+    latencies = []
+    for i in range(repeats):
+        row = X.iloc[[i % len(X)]]
+        start = time.perf_counter()
+        predict_fn(row)
+        latencies.append(time.perf_counter() - start)
+    batch = X.iloc[np.arange(batch_rows) % len(X)]
+    start = time.perf_counter()
+    predict_fn(batch)
+    elapsed = time.perf_counter() - start
+    return {
+        "single_row_ms": float(np.median(latencies) * 1000),
+        "rows_per_second": batch_rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    from data_cache import load_dataset
+    from model_cache import cached_model_path
+
+    parser = argparse.ArgumentParser(description='Export a logged random forest to the flat-array engine')
+    parser.add_argument('--model_uri', type=str, required=True, help='runs:/, models:/ URI or local sklearn model')
+    parser.add_argument('--tracking_uri', type=str, default="http://127.0.0.1:8080", help='MLflow tracking URI')
+    parser.add_argument('--data', type=str, default="data/fake_data.csv", help='Rows used to check and benchmark')
+    parser.add_argument('--artifact_path', type=str, default="rf_apples_flat", help='Artifact path of the flat model')
+    parser.add_argument('--no_log', action='store_true', help='Only check and benchmark, do not log')
+    args = parser.parse_args()
+
+    mlflow.set_tracking_uri(args.tracking_uri)
+    sk_model = mlflow.sklearn.load_model(cached_model_path(args.model_uri))
+    forest = FlatForest.from_sklearn(sk_model)
+    print(f"Flattened {forest.n_trees} trees, {forest.n_nodes} nodes, max depth {forest.max_depth}")
+
+    X, _ = load_dataset(args.data)
+    expected = sk_model.predict(X)
+    actual = forest.predict(X)
+    if not np.array_equal(expected, actual):
+        raise Exception(f"Flat forest predictions differ from sklearn "
+                        f"(max abs diff {np.abs(expected - actual).max():.3g})")
+    print(f"Predictions identical to sklearn on {len(X)} rows")
+
+    for name, predict_fn in (("sklearn", sk_model.predict), ("flat", forest.predict)):
+        stats = benchmark(predict_fn, X)
+        print(f"{name:>8}: single row {stats['single_row_ms']:.3f} ms, {stats['rows_per_second']:.0f} rows/s")
+
+    if not args.no_log:
+        if not args.model_uri.startswith("runs:/"):
+            raise Exception("Logging needs a runs:/ source URI, use --no_log for other sources")
+        run_id = args.model_uri[len("runs:/"):].split("/")[0]
+        with mlflow.start_run(run_id=run_id):
+            log_flat_forest(forest, args.artifact_path, input_example=X.head(5))
+        print(f"Flat model logged to runs:/{run_id}/{args.artifact_path}")
+
+
+if __name__ == "__main__":
+    main()
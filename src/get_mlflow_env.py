@@ -1,86 +1,187 @@
-import mlflow
+import argparse
 import os
+import json
+import hashlib
 import logging
-import shutil
-from typing import cast
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Optional
+
+# mlflow is imported in get_run_env_files, so that --help and argument
+# errors do not pay for its import time
 
 logging.basicConfig(level=logging.INFO)
 
-def get_run_env_file(experiment_name="Apple_Models", 
-                     run_name="first_run", 
-                     output_dir="./src", 
-                     port=8080):
+ENV_FILES = ["python_env.yaml", "conda.yaml", "requirements.txt"]
+MANIFEST_NAME = ".env_manifest.json"
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(output_path):
+    """Previously downloaded files: {local path: {"source", "size", "sha256"}}."""
+    try:
+        with open(output_path / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(output_path, manifest):
+    with open(output_path / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def find_runs(client, experiment_id, run_names=None, run_ids=None, workers=8):
     """
-    Copy python_env.yaml, conda.yaml and requirements.txt directly from MLflow artifacts
-    """
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-
-    mlflow.set_tracking_uri(f"http://127.0.0.1:{port}")
-
-    experiment = mlflow.get_experiment_by_name(experiment_name)
-    if not experiment:
-        raise Exception(f"Experiment {experiment_name} not found")
+    Resolve runs by ID or name (one server-side search per name, run concurrently).
 
-    logging.info(f"Found experiment: {experiment_name}")
+    Returns:
+        list: Runs, in the order given
+    """
+    runs = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        runs += list(executor.map(client.get_run, run_ids or []))
+
+        def by_name(run_name):
+            found = client.search_runs(
+                experiment_ids=[experiment_id],
+                filter_string=f"tags.mlflow.runName = '{run_name}'",
+                order_by=["attributes.start_time DESC"],
+                max_results=1,
+            )
+            if not found:
+                raise Exception(f"Run {run_name} not found in experiment {experiment_id}")
+            return found[0]
+
+        runs += list(executor.map(by_name, run_names or []))
+    return runs
+
+def fetch_file(client, run_id, artifact_path, size, destination, manifest):
+    """
+    Download one artifact file through the artifact repository API, unless
+    the local copy is known to hold the same content.
 
-    runs = mlflow.search_runs(
-        experiment_ids=[experiment.experiment_id],
-        filter_string=f"tags.mlflow.runName = '{run_name}'"
-    )
+    Run artifacts are immutable, so a local file recorded in the manifest for
+    the same source, with the same size and sha256, is up to date.
 
-    if len(runs) == 0:
-        raise Exception(f"Run {run_name} not found in experiment {experiment_name}")
+    Returns:
+        str: "skipped" or "downloaded"
+    """
+    source = f"runs:/{run_id}/{artifact_path}"
+    entry = manifest.get(str(destination))
+    if (entry and entry["source"] == source and entry["size"] == size
+            and destination.exists() and file_sha256(destination) == entry["sha256"]):
+        return "skipped"
+
+    with tempfile.TemporaryDirectory(dir=destination.parent) as tmp_dir:
+        local_path = client.download_artifacts(run_id, artifact_path, tmp_dir)
+        os.replace(local_path, destination)
+    manifest[str(destination)] = {"source": source, "size": size, "sha256": file_sha256(destination)}
+    return "downloaded"
+
+def get_run_env_files(run_names=None,
+                      run_ids=None,
+                      experiment_name="Apple_Models",
+                      output_dir="./src",
+                      tracking_uri="http://127.0.0.1:8080",
+                      workers=8):
+    """
+    Download python_env.yaml, conda.yaml and requirements.txt of the models
+    of several runs, concurrently and through the artifact API (works with
+    local, proxied mlflow-artifacts:/ or remote artifact stores).
 
-    run_id = runs.iloc[0].run_id  # type: ignore
-    logging.info(f"Found run: {run_name} (ID: {run_id})")
+    The model directory of each run is read from its log-model history tag.
+    With a single run the files go to output_dir, otherwise to
+    output_dir/<run name>.
 
-    # Get artifact URI
-    artifact_uri = str(mlflow.get_run(run_id).info.artifact_uri)
-    if artifact_uri.startswith("file://"):
-        artifact_uri = artifact_uri[7:]
+    Returns:
+        dict: Count of downloaded and skipped files
+    """
+    import mlflow
 
-    # Get the rf_apples directory path
-    rf_apples_path = os.path.join(artifact_uri, "rf_apples")
+    from run_search import model_artifact_path
 
-    # Copy python_env.yaml
-    python_env_src = os.path.join(rf_apples_path, "python_env.yaml")
-    if os.path.exists(python_env_src):
-        shutil.copy2(python_env_src, output_path / "python_env.yaml")
-        logging.info(f"Copied python_env.yaml to {output_dir}")
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
 
-    # Copy conda.yaml
-    conda_src = os.path.join(rf_apples_path, "conda.yaml")
-    if os.path.exists(conda_src):
-        shutil.copy2(conda_src, output_path / "conda.yaml")
-        logging.info(f"Copied conda.yaml to {output_dir}")
+    mlflow.set_tracking_uri(tracking_uri)
+    client = mlflow.tracking.MlflowClient()
 
-    # Copy requirements.txt
-    requirements_src = os.path.join(rf_apples_path, "requirements.txt")
-    if not os.path.exists(requirements_src):
-        raise Exception("requirements.txt not found in artifacts")
-    shutil.copy2(requirements_src, output_path / "requirements.txt")
-    logging.info(f"Copied requirements.txt to {output_dir}")
+    experiment = client.get_experiment_by_name(experiment_name)
+    if not experiment:
+        raise Exception(f"Experiment {experiment_name} not found")
+    logging.info(f"Found experiment: {experiment_name}")
 
-    # Check if at least one environment file was found
-    if not os.path.exists(python_env_src) and not os.path.exists(conda_src):
-        raise Exception("Neither python_env.yaml nor conda.yaml found in artifacts")
+    runs = find_runs(client, experiment.experiment_id, run_names, run_ids, workers)
+    if not runs:
+        raise Exception("No run given")
+
+    manifest = load_manifest(output_path)
+    tasks = []
+    for run in runs:
+        model_dir = model_artifact_path(run)
+        if model_dir is None:
+            raise Exception(f"Run {run.info.run_name} ({run.info.run_id}) has no logged model")
+        run_output = output_path if len(runs) == 1 else output_path / (run.info.run_name or run.info.run_id)
+        run_output.mkdir(parents=True, exist_ok=True)
+
+        available = {Path(a.path).name: a.file_size for a in client.list_artifacts(run.info.run_id, model_dir)}
+        if "requirements.txt" not in available:
+            raise Exception(f"requirements.txt not found in artifacts of run {run.info.run_name}")
+        if "python_env.yaml" not in available and "conda.yaml" not in available:
+            raise Exception(f"Neither python_env.yaml nor conda.yaml found in artifacts of run {run.info.run_name}")
+        logging.info(f"Found run: {run.info.run_name} (ID: {run.info.run_id}, model: {model_dir})")
+
+        for name in ENV_FILES:
+            if name in available:
+                tasks.append((run.info.run_id, f"{model_dir}/{name}", available[name], run_output / name))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda task: fetch_file(client, *task, manifest), tasks))
+    save_manifest(output_path, manifest)
+
+    for (_, artifact_path, _, destination), result in zip(tasks, results):
+        logging.info(f"{result.capitalize()} {artifact_path} -> {destination}")
+    return {"downloaded": results.count("downloaded"), "skipped": results.count("skipped")}
+
+def get_run_env_file(experiment_name="Apple_Models",
+                     run_name="first_run",
+                     output_dir="./src",
+                     port=8080):
+    """
+    Download python_env.yaml, conda.yaml and requirements.txt of one run
+    """
+    return get_run_env_files(run_names=[run_name], experiment_name=experiment_name,
+                             output_dir=output_dir, tracking_uri=f"http://127.0.0.1:{port}")
 
-if __name__ == "__main__":
-    import argparse
+def parse_list(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
 
+def main():
     parser = argparse.ArgumentParser(description="Retrieve MLflow run environment files")
     parser.add_argument("--experiment", default="Apple_Models", help="Name of the MLflow experiment")
-    parser.add_argument("--run", default="first_run", help="Name of the run")
+    parser.add_argument("--run", default="first_run", help="Name of the run, or comma-separated names")
+    parser.add_argument("--run_ids", help="Comma-separated run IDs (instead of --run)")
     parser.add_argument("--output", default="./src", help="Output directory for the files")
     parser.add_argument("--port", type=int, default=8080, help="MLflow server port")
+    parser.add_argument("--tracking_uri", help="MLflow tracking URI (default: local server on --port)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent downloads")
 
     args = parser.parse_args()
 
-    get_run_env_file(
+    stats = get_run_env_files(
+        run_names=[] if args.run_ids else parse_list(args.run),
+        run_ids=parse_list(args.run_ids),
         experiment_name=args.experiment,
-        run_name=args.run,
         output_dir=args.output,
-        port=args.port
+        tracking_uri=args.tracking_uri or f"http://127.0.0.1:{args.port}",
+        workers=args.workers
     )
+    logging.info(f"{stats['downloaded']} files downloaded, {stats['skipped']} already up to date")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import io
+import os
+import sys
+import time
+from typing import Optional, Tuple
+
+import mlflow
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from data_cache import DROP_COLUMNS, TARGET_COLUMN
+from model_cache import cached_model_path
+from model_index import ModelIndex
+from sweep import compute_metrics
+
+DATE_COLUMN = "date"
+
+# Registered version tags describing the data a model has ingested
+WATERMARK_TAG = "data_watermark"
+OFFSET_TAG = "data_offset"
+ROWS_TAG = "data_rows"
+PARENT_TAG = "incremental_parent_version"
+
+
+def read_new_rows(data_path: str, watermark: Optional[str] = None,
+                  offset: Optional[int] = None) -> Tuple[pd.DataFrame, Optional[np.ndarray]]:
+    """
+    Rows of an appended daily CSV dated after the watermark.
+
+    With the byte offset at which the previous increment stopped, only the
+    bytes appended since are read. The offset is trusted only if it falls
+    right after a line end; otherwise (file rewritten or truncated) the
+    whole file is read and filtered by date. A partially written last line
+    is left for the next increment.
+
+    Returns:
+        tuple: (new rows in file order, byte offset of the end of each row,
+                None if it cannot be derived)
+    """
+    with open(data_path, "rb") as f:
+        header = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        start = len(header)
+        if offset and start < offset <= size:
+            f.seek(offset - 1)
+            if f.read(1) == b"\n":
+                start = offset
+        f.seek(start)
+        data = f.read()
+    data = data[:data.rfind(b"\n") + 1]
+
+    frame = pd.read_csv(io.BytesIO(header + data), parse_dates=[DATE_COLUMN])
+    line_ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n")) + 1 + start
+    if len(line_ends) != len(frame):
+        line_ends = None  # Blank lines: offsets unknown, the next increment filters by date
+    if watermark is not None:
+        newer = (frame[DATE_COLUMN] > pd.Timestamp(watermark)).to_numpy()
+        frame = frame[newer].reset_index(drop=True)
+        if line_ends is not None:
+            line_ends = line_ends[newer]
+    return frame, line_ends
+
+
+def split_features(frame: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """X and y as load_dataset builds them (date and demand dropped, float features)."""
+    return frame.drop(columns=DROP_COLUMNS).astype(float), frame[TARGET_COLUMN].astype(float)
+
+
+def set_tree_weights(forest: RandomForestRegressor, weights: np.ndarray):
+    """
+    Weight the trees of a forest in its regular (unweighted) prediction.
+
+    Leaf values of tree i are scaled by n * w_i / sum(w), so the mean of the
+    trees is their weighted mean, and the model stays a plain
+    RandomForestRegressor (pyfunc, flat engine and compaction unchanged).
+    The applied scales are kept on the forest to rescale from them later.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    scales = weights * len(weights) / weights.sum()
+    applied = getattr(forest, "tree_scales_", np.ones(len(weights)))
+    for estimator, scale, previous in zip(forest.estimators_, scales, applied):
+        if scale != previous:
+            estimator.tree_.value[:] *= scale / previous
+    forest.tree_weights_ = weights
+    forest.tree_scales_ = scales
+
+
+def add_trees(forest: RandomForestRegressor, X, y, new_trees: int, decay: float = 1.0,
+              max_trees: Optional[int] = None) -> RandomForestRegressor:
+    """
+    Append trees fitted on new rows to a fitted forest (warm_start).
+
+    Args:
+        forest: Fitted forest, updated in place
+        new_trees: Trees fitted on X, y
+        decay: Weight multiplier of the existing trees at each increment
+               (1 keeps all trees equal, 0.9 makes a tree 10 increments old
+               weigh about a third of a new one)
+        max_trees: Drop the oldest trees above this count
+    """
+    n_old = len(forest.estimators_)
+    weights = getattr(forest, "tree_weights_", np.ones(n_old))
+    # New trees only see X, y; their leaf values are scaled with the others below
+    forest.set_params(warm_start=True, n_estimators=n_old + new_trees)
+    forest.fit(X, y)
+    forest.set_params(warm_start=False)
+
+    forest.tree_scales_ = np.concatenate([getattr(forest, "tree_scales_", np.ones(n_old)), np.ones(new_trees)])
+    weights = np.concatenate([weights * decay, np.ones(new_trees)])
+    if max_trees and len(forest.estimators_) > max_trees:
+        drop = len(forest.estimators_) - max_trees
+        forest.estimators_ = forest.estimators_[drop:]
+        forest.tree_scales_ = forest.tree_scales_[drop:]
+        weights = weights[drop:]
+        forest.set_params(n_estimators=len(forest.estimators_))
+    set_tree_weights(forest, weights)
+    return forest
+
+
+def log_and_register(model_name: str, forest, params: dict, metrics: dict, tags: dict, version_tags: dict,
+                     input_example, artifact_path: str, run_name: str) -> str:
+    """Log the forest in a new run and register it as a new version. Returns the version."""
+    with mlflow.start_run(run_name=run_name, tags=tags) as run:
+        mlflow.log_params(params)
+        mlflow.log_metrics(metrics)
+        mlflow.sklearn.log_model(sk_model=forest, input_example=input_example, artifact_path=artifact_path)
+    model_details = mlflow.register_model(f"runs:/{run.info.run_id}/{artifact_path}", model_name, tags=version_tags)
+    return model_details.version
+
+
+def train_initial(args) -> Optional[str]:
+    """Full training on the whole file, registered with its watermark."""
+    frame, line_ends = read_new_rows(args.data)
+    X, y = split_features(frame)
+    params = {"n_estimators": args.new_trees, "max_depth": args.max_depth, "random_state": 42}
+    forest = RandomForestRegressor(**params).fit(X, y)
+    watermark = str(frame[DATE_COLUMN].max())
+    version_tags = {WATERMARK_TAG: watermark, ROWS_TAG: str(len(frame))}
+    if line_ends is not None:
+        version_tags[OFFSET_TAG] = str(int(line_ends[-1]))
+    print(f"Initial training on {len(frame)} rows up to {watermark}")
+    if args.dry_run:
+        return None
+    return log_and_register(args.model_name, forest, params, {"train_rows": len(frame)},
+                            {"training_mode": "initial"}, version_tags, X.head(5), args.artifact_path,
+                            "incremental_initial")
+
+
+def train_increment(args) -> Optional[str]:
+    """
+    Add trees fitted on the rows appended since the parent version's watermark.
+
+    The most recent holdout_fraction of the new rows is held out: parent and
+    updated models are both scored on it (out of sample for both), and it is
+    not ingested, so the next increment trains on it.
+    """
+    index = ModelIndex(args.model_name)
+    parent = index.resolve(args.version)
+    tags = parent["tags"]
+    if WATERMARK_TAG not in tags:
+        raise Exception(f"Version {parent['version']} of '{args.model_name}' has no {WATERMARK_TAG} tag, "
+                        f"register a first version with --init")
+
+    start = time.perf_counter()
+    offset = int(tags[OFFSET_TAG]) if OFFSET_TAG in tags else None
+    frame, line_ends = read_new_rows(args.data, tags[WATERMARK_TAG], offset)
+    read_s = time.perf_counter() - start
+    print(f"Version {parent['version']}: watermark {tags[WATERMARK_TAG]}, "
+          f"{len(frame)} new rows read in {read_s:.3f}s ({'offset' if offset else 'full scan'})")
+    if len(frame) < args.min_new_rows:
+        print(f"Fewer than {args.min_new_rows} new rows, nothing to do")
+        return None
+
+    n_holdout = int(len(frame) * args.holdout_fraction)
+    n_train = len(frame) - n_holdout
+    X, y = split_features(frame)
+    X_train, y_train = X.iloc[:n_train], y.iloc[:n_train]
+
+    model_uri = f"models:/{args.model_name}/{parent['version']}"
+    forest = mlflow.sklearn.load_model(cached_model_path(model_uri))
+    if not isinstance(forest, RandomForestRegressor):
+        raise Exception(f"{model_uri} is a {type(forest).__name__}, incremental training needs a random forest")
+
+    metrics = {"new_rows": len(frame), "train_rows": n_train, "read_seconds": read_s}
+    if n_holdout:
+        metrics.update({f"parent_{k}": v for k, v in
+                        compute_metrics(y.iloc[n_train:], forest.predict(X.iloc[n_train:])).items()})
+
+    start = time.perf_counter()
+    n_parent_trees = len(forest.estimators_)
+    add_trees(forest, X_train, y_train, args.new_trees, decay=args.decay, max_trees=args.max_trees)
+    metrics["fit_seconds"] = time.perf_counter() - start
+    if n_holdout:
+        metrics.update(compute_metrics(y.iloc[n_train:], forest.predict(X.iloc[n_train:])))
+
+    watermark = str(frame[DATE_COLUMN].iloc[n_train - 1])
+    version_tags = {
+        WATERMARK_TAG: watermark,
+        ROWS_TAG: str(int(tags.get(ROWS_TAG, 0)) + n_train),
+        PARENT_TAG: str(parent["version"]),
+    }
+    if line_ends is not None:
+        version_tags[OFFSET_TAG] = str(int(line_ends[n_train - 1]))
+    params = {
+        "parent_version": parent["version"],
+        "new_trees": args.new_trees,
+        "decay": args.decay,
+        "max_trees": args.max_trees,
+        "parent_trees": n_parent_trees,
+        "n_estimators": len(forest.estimators_),
+        "window_start": str(frame[DATE_COLUMN].iloc[0]),
+        "window_end": watermark,
+    }
+
+    print(f"Added {args.new_trees} trees on {n_train} rows up to {watermark} "
+          f"({n_parent_trees} -> {len(forest.estimators_)} trees, {metrics['fit_seconds']:.2f}s)")
+    if n_holdout:
+        print(f"Holdout ({n_holdout} most recent rows): r2 {metrics['parent_r2']:.4f} -> {metrics['r2']:.4f}")
+    if args.dry_run:
+        return None
+
+    # Child of the run that produced the parent version
+    run_tags = {"training_mode": "incremental", "mlflow.parentRunId": parent["run_id"]}
+    return log_and_register(args.model_name, forest, params, metrics, run_tags, version_tags, X.head(5),
+                            args.artifact_path, f"incremental_{watermark[:10]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update a registered forest with the rows appended since its watermark')
+    parser.add_argument('--tracking_uri', type=str, default="http://127.0.0.1:8080", help='MLflow tracking URI')
+    parser.add_argument('--experiment_name', type=str, default="Apple_Models", help='Experiment of the runs')
+    parser.add_argument('--model_name', type=str, required=True, help='Registered model name')
+    parser.add_argument('--version', type=str, default="latest",
+                        help='Parent version: N, "latest", "@alias" or "tag:key=value"')
+    parser.add_argument('--data', type=str, default="data/fake_data.csv", help='Appended daily CSV')
+    parser.add_argument('--new_trees', type=int, default=10, help='Trees fitted per increment (or initial trees)')
+    parser.add_argument('--decay', type=float, default=1.0, help='Weight multiplier of existing trees per increment')
+    parser.add_argument('--max_trees', type=int, help='Drop the oldest trees above this count')
+    parser.add_argument('--min_new_rows', type=int, default=30, help='Skip the increment below this many new rows')
+    parser.add_argument('--holdout_fraction', type=float, default=0.2,
+                        help='Most recent new rows scored but not ingested (0: ingest everything)')
+    parser.add_argument('--max_depth', type=int, default=10, help='Max depth of the initial forest (--init)')
+    parser.add_argument('--artifact_path', type=str, default="rf_apples", help='Model artifact path')
+    parser.add_argument('--init', action='store_true', help='Train and register a first version on the whole file')
+    parser.add_argument('--dry_run', action='store_true', help='Train and report, do not log or register')
+    args = parser.parse_args()
+
+    if not 0 < args.decay <= 1:
+        parser.error("--decay must be in (0, 1]")
+    if not 0 <= args.holdout_fraction < 1:
+        parser.error("--holdout_fraction must be in [0, 1)")
+
+    mlflow.set_tracking_uri(args.tracking_uri)
+    mlflow.set_experiment(args.experiment_name)
+    try:
+        version = train_initial(args) if args.init else train_increment(args)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    if version is not None:
+        print(f"Registered version {version} of '{args.model_name}'")
+
+
+if __name__ == "__main__":
+    main()
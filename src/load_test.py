@@ -0,0 +1,242 @@
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+import requests
+
+from api_client import ScoringClient
+from data_cache import load_dataset
+from payload import CONTENT_TYPES, JSON, encode_frame
+
+
+def build_payloads(X, batch_sizes: List[int], n_payloads: int, seed: int = 42,
+                   content_type: str = JSON) -> List[tuple]:
+    """
+    Pre-serialized /invocations bodies replaying the dataset rows in order.
+
+    Bodies are built before the test starts so that encoding on the client
+    does not count in the measured latency.
+
+    Returns:
+        list: (batch size, body bytes) tuples
+    """
+    rng = random.Random(seed)
+    payloads = []
+    row = 0
+    for _ in range(n_payloads):
+        size = rng.choice(batch_sizes)
+        rows = X.iloc[np.arange(row, row + size) % len(X)]
+        row = (row + size) % len(X)
+        payloads.append((size, encode_frame(rows, content_type)))
+    return payloads
+
+
+class LoadTest:
+    """
+    Replay payloads against a scoring endpoint from worker threads.
+
+    Each worker keeps its own keep-alive ScoringClient. Without a target
+    rate, workers send back to back (closed loop, fixed concurrency). With a
+    rate, request k is scheduled at start + k / rate and its latency is
+    measured from that scheduled time, so a slow server is not hidden by
+    the client waiting on it (coordinated omission).
+    """
+
+    def __init__(self, url: str, payloads: List[tuple], format: str = "json", concurrency: int = 8,
+                 rate: Optional[float] = None, duration: float = 30.0,
+                 n_requests: Optional[int] = None, timeout: float = 10.0):
+        """
+        Args:
+            url: /invocations URL
+            payloads: (batch size, body) tuples, cycled
+            format: Payload format of the bodies: json, arrow or raw
+            concurrency: Worker threads (maximum requests in flight)
+            rate: Target requests per second (default: as fast as possible)
+            duration: Test duration in seconds
+            n_requests: Stop after this many requests instead (optional)
+            timeout: Per-request timeout in seconds
+        """
+        self.url = url
+        self.payloads = payloads
+        self.format = format
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.n_requests = n_requests
+        self.timeout = timeout
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.results = []
+
+    def run(self) -> List[tuple]:
+        """
+        Run the test.
+
+        Returns:
+            list: (batch size, latency seconds, status code or error name, model version) per request
+        """
+        self.start = time.perf_counter()
+        self.deadline = self.start + self.duration
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - self.start
+        return self.results
+
+    def _next(self) -> Optional[tuple]:
+        """Index and scheduled send time of the next request, None when the test is over."""
+        k = next(self._counter)
+        if self.n_requests is not None and k >= self.n_requests:
+            return None
+        scheduled = self.start + k / self.rate if self.rate else time.perf_counter()
+        if scheduled >= self.deadline:
+            return None
+        return k, scheduled
+
+    def _worker(self):
+        client = ScoringClient(self.url, format=self.format, timeout=self.timeout)
+        results = []
+        while True:
+            item = self._next()
+            if item is None:
+                break
+            k, scheduled = item
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            size, body = self.payloads[k % len(self.payloads)]
+            version = None
+            try:
+                response = client.post(body)
+                status = response.status_code
+                version = response.headers.get("X-Model-Version")
+            except requests.RequestException as e:
+                status = type(e).__name__
+            results.append((size, time.perf_counter() - scheduled, status, version))
+        client.close()
+        with self._lock:
+            self.results.extend(results)
+
+
+def latency_summary(latencies) -> dict:
+    """Mean, p50/p95/p99 and max of latencies given in seconds, reported in ms."""
+    if len(latencies) == 0:
+        return {}
+    latencies = np.asarray(latencies) * 1000.0
+    return {
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def build_report(results: List[tuple], elapsed: float, config: dict) -> dict:
+    """Machine-readable report: throughput, error rate and latency percentiles, overall and per batch size."""
+    n_requests = len(results)
+    ok = [r for r in results if r[2] == 200]
+    report = {
+        "config": config,
+        "elapsed_s": elapsed,
+        "requests": n_requests,
+        "errors": n_requests - len(ok),
+        "error_rate": (n_requests - len(ok)) / n_requests if n_requests else 0.0,
+        "throughput_rps": len(ok) / elapsed if elapsed > 0 else 0.0,
+        "rows_per_s": sum(r[0] for r in ok) / elapsed if elapsed > 0 else 0.0,
+        "latency": latency_summary([r[1] for r in ok]),
+        "status_codes": {str(k): v for k, v in Counter(r[2] for r in results).items()},
+        "by_batch_size": {},
+    }
+    for size in sorted({r[0] for r in results}):
+        size_results = [r for r in results if r[0] == size]
+        size_ok = [r[1] for r in size_results if r[2] == 200]
+        report["by_batch_size"][str(size)] = dict(
+            requests=len(size_results), errors=len(size_results) - len(size_ok), **latency_summary(size_ok)
+        )
+    versions = Counter(r[3] for r in ok if r[3] is not None)
+    if versions:
+        report["model_versions"] = dict(versions)
+    return report
+
+
+def print_report(report: dict):
+    latency = report["latency"]
+    print(f"\n{report['requests']} requests in {report['elapsed_s']:.1f}s, "
+          f"{report['throughput_rps']:.1f} req/s, {report['rows_per_s']:.0f} rows/s, "
+          f"error rate {report['error_rate']:.2%}")
+    if latency:
+        print(f"Latency (ms): p50 {latency['p50_ms']:.1f}  p95 {latency['p95_ms']:.1f}  "
+              f"p99 {latency['p99_ms']:.1f}  max {latency['max_ms']:.1f}")
+    print(f"{'batch':>6} {'requests':>9} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for size, stats in report["by_batch_size"].items():
+        print(f"{size:>6} {stats['requests']:>9} {stats['errors']:>7} "
+              f"{stats.get('p50_ms', float('nan')):>8.1f} {stats.get('p99_ms', float('nan')):>8.1f}")
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a model scoring endpoint with dataset rows')
+    parser.add_argument('--url', type=str, default="http://localhost:5002/invocations", help='Scoring endpoint')
+    parser.add_argument('--data', type=str, default="data/fake_data.csv", help='Dataset replayed as requests')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent connections')
+    parser.add_argument('--rate', type=float, help='Target requests per second (default: closed loop)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Test duration in seconds')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests (optional)')
+    parser.add_argument('--format', type=str, default="json", choices=["json", "arrow", "raw"],
+                        help='Payload format (arrow/raw need the inprocess server)')
+    parser.add_argument('--batch_sizes', type=str, default="1,2,8,32", help='Rows per request, picked at random')
+    parser.add_argument('--warmup', type=int, default=10, help='Requests sent before measuring')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the batch size sequence')
+    parser.add_argument('--output', type=str, default="load_test_report.json", help='JSON report file')
+    parser.add_argument('--max_p99_ms', type=float, help='Exit with status 1 above this p99 latency')
+    parser.add_argument('--max_error_rate', type=float, help='Exit with status 1 above this error rate')
+    args = parser.parse_args()
+
+    X, _ = load_dataset(args.data)
+    n_payloads = min(args.requests or 1000, 1000)
+    payloads = build_payloads(X, parse_int_list(args.batch_sizes), n_payloads, seed=args.seed,
+                              content_type=CONTENT_TYPES[args.format])
+
+    if args.warmup:
+        LoadTest(args.url, payloads, format=args.format, concurrency=1, n_requests=args.warmup,
+                 timeout=args.timeout).run()
+
+    mode = f"{args.rate} req/s" if args.rate else "closed loop"
+    print(f"Load testing {args.url}: {mode}, concurrency {args.concurrency}, "
+          f"batch sizes {args.batch_sizes}, {args.format} payloads")
+    test = LoadTest(args.url, payloads, format=args.format, concurrency=args.concurrency, rate=args.rate,
+                    duration=args.duration, n_requests=args.requests, timeout=args.timeout)
+    results = test.run()
+
+    report = build_report(results, test.elapsed, config=vars(args))
+    print_report(report)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    failed = []
+    if args.max_p99_ms is not None and report["latency"].get("p99_ms", float("inf")) > args.max_p99_ms:
+        failed.append(f"p99 {report['latency'].get('p99_ms', float('nan')):.1f} ms > {args.max_p99_ms} ms")
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failed.append(f"error rate {report['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if failed:
+        print(f"FAILED: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+import argparse
+import math
+import os
+import random
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import mlflow
+import sqlalchemy
+from mlflow.entities import ViewType
+from mlflow.entities.model_registry.model_version_stages import STAGE_DELETED_INTERNAL
+from mlflow.store.db import utils as db_utils
+from mlflow.store.model_registry.file_store import FileStore as RegistryFileStore
+from mlflow.store.tracking.file_store import FileStore
+from mlflow.store.tracking.sqlalchemy_store import SqlAlchemyStore
+from mlflow.utils.file_utils import read_yaml
+
+from run_search import PAGE_SIZE, iter_runs
+
+# Runs read (concurrently) and inserted per transaction
+BATCH_SIZE = 500
+
+# Largest finite value stored by SqlAlchemyStore in place of +/-inf
+_SQL_FLOAT_MAX = 1.7976931348623157e308
+
+TABLES = {
+    "experiments": db_utils.SqlExperiment.__table__,
+    "experiment_tags": db_utils.SqlExperimentTag.__table__,
+    "runs": db_utils.SqlRun.__table__,
+    "tags": db_utils.SqlTag.__table__,
+    "params": db_utils.SqlParam.__table__,
+    "metrics": db_utils.SqlMetric.__table__,
+    "latest_metrics": db_utils.SqlLatestMetric.__table__,
+    "datasets": db_utils.SqlDataset.__table__,
+    "inputs": db_utils.SqlInput.__table__,
+    "input_tags": db_utils.SqlInputTag.__table__,
+    "registered_models": db_utils.SqlRegisteredModel.__table__,
+    "registered_model_tags": db_utils.SqlRegisteredModelTag.__table__,
+    "registered_model_aliases": db_utils.SqlRegisteredModelAlias.__table__,
+    "model_versions": db_utils.SqlModelVersion.__table__,
+    "model_version_tags": db_utils.SqlModelVersionTag.__table__,
+}
+
+
+def sql_metric_value(value: float) -> Tuple[float, bool]:
+    """(value, is_nan) as SqlAlchemyStore stores a metric value."""
+    if math.isnan(value):
+        return 0.0, True
+    if math.isinf(value):
+        return (_SQL_FLOAT_MAX if value > 0 else -_SQL_FLOAT_MAX), False
+    return value, False
+
+
+def read_run(store: FileStore, run_info):
+    """
+    A run of the file store with the full history of each of its metrics.
+
+    Built from its listed RunInfo, as search_runs does: get_run(run_id) first
+    scans the experiment directories to find the run, which makes reading
+    every run of an experiment quadratic.
+
+    Returns:
+        tuple: (run, {metric key: history}, deletion time or None)
+    """
+    run = store._get_run_from_info(run_info)
+    run_dir = store._get_run_dir(run_info.experiment_id, run_info.run_id)
+    # Metric files read directly: get_metric_history parses meta.yaml again for every key
+    history = {}
+    for key in run.data.metrics:
+        with open(os.path.join(run_dir, FileStore.METRICS_FOLDER_NAME, key)) as f:
+            history[key] = [FileStore._get_metric_from_line(key, line) for line in f if line.strip()]
+    deleted_time = None
+    if run.info.lifecycle_stage == "deleted":
+        # Only kept in meta.yaml (used by `mlflow gc`), not on RunInfo
+        deleted_time = read_yaml(run_dir, FileStore.META_DATA_FILE_NAME).get("deleted_time")
+    return run, history, deleted_time
+
+
+def run_rows(run, history, deleted_time: Optional[int], datasets: Dict[tuple, str]) -> Dict[str, List[dict]]:
+    """
+    Rows of one run for every run table.
+
+    Args:
+        run: Run of the file store
+        history: Metric history per key
+        deleted_time: Deletion time of a deleted run
+        datasets: Dataset uuid per (experiment_id, name, digest), filled with new datasets
+    """
+    info = run.info
+    run_id = info.run_id
+    rows = {name: [] for name in ("runs", "tags", "params", "metrics", "latest_metrics",
+                                  "datasets", "inputs", "input_tags")}
+    rows["runs"].append({
+        "run_uuid": run_id,
+        "name": info.run_name,
+        "source_type": "UNKNOWN",
+        "source_name": "",
+        "entry_point_name": "",
+        "user_id": info.user_id,
+        "status": info.status,
+        "start_time": info.start_time,
+        "end_time": info.end_time,
+        "deleted_time": deleted_time,
+        "source_version": "",
+        "lifecycle_stage": info.lifecycle_stage,
+        "artifact_uri": info.artifact_uri,
+        "experiment_id": int(info.experiment_id),
+    })
+    rows["tags"] = [{"key": k, "value": v, "run_uuid": run_id} for k, v in run.data.tags.items()]
+    rows["params"] = [{"key": k, "value": v, "run_uuid": run_id} for k, v in run.data.params.items()]
+
+    for key, metrics in history.items():
+        seen, latest = set(), None
+        for metric in metrics:
+            value, is_nan = sql_metric_value(metric.value)
+            row = {"key": key, "value": value, "timestamp": metric.timestamp, "step": metric.step or 0,
+                   "is_nan": is_nan, "run_uuid": run_id}
+            identity = (metric.timestamp, row["step"], value, is_nan)
+            if identity in seen:
+                continue  # Same primary key in the SQL schema
+            seen.add(identity)
+            rows["metrics"].append(row)
+            order = (row["step"], row["timestamp"], -math.inf if is_nan else value)
+            if latest is None or order >= latest[0]:
+                latest = (order, row)
+        if latest is not None:
+            rows["latest_metrics"].append(dict(latest[1]))
+
+    for dataset_input in (run.inputs.dataset_inputs if run.inputs else []):
+        dataset = dataset_input.dataset
+        dataset_key = (int(info.experiment_id), dataset.name, dataset.digest)
+        if dataset_key not in datasets:
+            datasets[dataset_key] = uuid.uuid4().hex
+            rows["datasets"].append({
+                "dataset_uuid": datasets[dataset_key],
+                "experiment_id": dataset_key[0],
+                "name": dataset.name,
+                "digest": dataset.digest,
+                "dataset_source_type": dataset.source_type,
+                "dataset_source": dataset.source,
+                "dataset_schema": dataset.schema,
+                "dataset_profile": dataset.profile,
+            })
+        input_uuid = uuid.uuid4().hex
+        rows["inputs"].append({"input_uuid": input_uuid, "source_type": "DATASET",
+                               "source_id": datasets[dataset_key], "destination_type": "RUN",
+                               "destination_id": run_id})
+        rows["input_tags"] += [{"input_uuid": input_uuid, "name": tag.key, "value": tag.value}
+                               for tag in dataset_input.tags]
+    return rows
+
+
+def _files(directory: str) -> List[str]:
+    """Files under a directory, recursively (keys containing "/" are nested files), [] if missing."""
+    return [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+
+
+def _metric_rows(path: str) -> int:
+    """Distinct (timestamp, step, value) lines of a metric file, the primary key of the SQL table."""
+    rows = set()
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if parts:
+                rows.add((int(parts[0]), int(parts[2]) if len(parts) > 2 else 0, repr(float(parts[1]))))
+    return len(rows)
+
+
+def count_source(source: FileStore) -> Dict[str, int]:
+    """
+    Rows every table should hold, counted from the file store directories.
+
+    Independent of read_run/run_rows, so verify() catches what they drop:
+    runs are the listed run directories, params and tags their files,
+    metrics the distinct lines of the metric files.
+    """
+    counts = {name: 0 for name in TABLES}
+    experiments = source.search_experiments(view_type=ViewType.ALL, max_results=50000)
+    counts["experiments"] = len(experiments)
+    for experiment in experiments:
+        experiment_dir = source._get_experiment_path(experiment.experiment_id, view_type=ViewType.ALL)
+        counts["experiment_tags"] += len(_files(os.path.join(experiment_dir, FileStore.EXPERIMENT_TAGS_FOLDER_NAME)))
+        # One meta.yaml per dataset and per run input
+        counts["datasets"] += len(_files(os.path.join(experiment_dir, FileStore.DATASETS_FOLDER_NAME)))
+        for run_info in source._list_run_infos(experiment.experiment_id, ViewType.ALL):
+            counts["runs"] += 1
+            run_dir = source._get_run_dir(run_info.experiment_id, run_info.run_id)
+            counts["tags"] += len(_files(os.path.join(run_dir, FileStore.TAGS_FOLDER_NAME)))
+            counts["params"] += len(_files(os.path.join(run_dir, FileStore.PARAMS_FOLDER_NAME)))
+            metric_rows = [_metric_rows(path) for path in _files(os.path.join(run_dir, FileStore.METRICS_FOLDER_NAME))]
+            counts["metrics"] += sum(metric_rows)
+            counts["latest_metrics"] += sum(1 for rows in metric_rows if rows)
+            for input_meta in _files(os.path.join(run_dir, FileStore.INPUTS_FOLDER_NAME)):
+                counts["inputs"] += 1
+                counts["input_tags"] += len(read_yaml(os.path.dirname(input_meta),
+                                                      FileStore.META_DATA_FILE_NAME).get("tags") or {})
+
+    models_dir = os.path.join(source.root_directory, RegistryFileStore.MODELS_FOLDER_NAME)
+    for model in (os.listdir(models_dir) if os.path.isdir(models_dir) else []):
+        model_dir = os.path.join(models_dir, model)
+        counts["registered_models"] += 1
+        counts["registered_model_tags"] += len(_files(os.path.join(model_dir, RegistryFileStore.TAGS_FOLDER_NAME)))
+        counts["registered_model_aliases"] += len(
+            _files(os.path.join(model_dir, RegistryFileStore.REGISTERED_MODELS_ALIASES_FOLDER_NAME)))
+        for version in os.listdir(model_dir):
+            version_dir = os.path.join(model_dir, version)
+            if not version.startswith("version-"):
+                continue
+            # Deleted versions stay on disk with an internal stage
+            if read_yaml(version_dir, FileStore.META_DATA_FILE_NAME).get("current_stage") == STAGE_DELETED_INTERNAL:
+                continue
+            counts["model_versions"] += 1
+            counts["model_version_tags"] += len(_files(os.path.join(version_dir, RegistryFileStore.TAGS_FOLDER_NAME)))
+    return counts
+
+
+class StoreMigration:
+    """
+    Bulk copy of a file tracking store (and its model registry) into a SQL database.
+
+    The schema is created by MLflow itself (SqlAlchemyStore runs the alembic
+    migrations), then rows are inserted with SQLAlchemy Core executemany
+    batches, one transaction per BATCH_SIZE runs, instead of the per-entity
+    calls (and commits) of the tracking API. Runs are read from the file
+    store concurrently, one batch at a time, so memory stays bounded.
+
+    IDs, timestamps, run names and artifact URIs are kept, so artifacts stay
+    where they are and runs:/ and models:/ URIs keep resolving.
+    """
+
+    def __init__(self, file_root: str, db_uri: str, batch_size: int = BATCH_SIZE, workers: int = 8):
+        self.file_root = os.path.abspath(file_root)
+        self.db_uri = db_uri
+        self.batch_size = batch_size
+        self.workers = workers
+        self.source = FileStore(self.file_root)
+        self.counts = {name: 0 for name in TABLES}
+
+    def create_schema(self) -> sqlalchemy.engine.Engine:
+        """Create the MLflow schema, refusing a database that already holds data."""
+        SqlAlchemyStore(self.db_uri, os.path.join(self.file_root, "0"))
+        engine = sqlalchemy.create_engine(self.db_uri)
+        if self.db_uri.startswith("sqlite"):
+            # Bulk load settings: a migration interrupted midway is rerun on a new database anyway
+            @sqlalchemy.event.listens_for(engine, "connect")
+            def set_pragmas(connection, _):
+                connection.execute("PRAGMA synchronous = OFF")
+                connection.execute("PRAGMA journal_mode = MEMORY")
+
+        with engine.begin() as conn:
+            runs = conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(TABLES["runs"])).scalar()
+            models = conn.execute(sqlalchemy.select(sqlalchemy.func.count())
+                                  .select_from(TABLES["registered_models"])).scalar()
+            if runs or models:
+                raise Exception(f"Destination {self.db_uri} already holds {runs} runs and {models} models")
+            # Default experiment created with the schema, replaced by the source one
+            conn.execute(TABLES["experiment_tags"].delete())
+            conn.execute(TABLES["experiments"].delete())
+        return engine
+
+    def insert(self, conn, rows: Dict[str, List[dict]]):
+        for name, table_rows in rows.items():
+            if table_rows:
+                conn.execute(TABLES[name].insert(), table_rows)
+                self.counts[name] += len(table_rows)
+
+    def migrate(self) -> Dict[str, int]:
+        """Copy experiments, runs, then the registry. Returns the rows inserted per table."""
+        engine = self.create_schema()
+        experiments = self.source.search_experiments(view_type=ViewType.ALL, max_results=50000)
+        with engine.begin() as conn:
+            self.insert(conn, {
+                "experiments": [{
+                    "experiment_id": int(e.experiment_id), "name": e.name,
+                    "artifact_location": e.artifact_location, "lifecycle_stage": e.lifecycle_stage,
+                    "creation_time": e.creation_time, "last_update_time": e.last_update_time,
+                } for e in experiments],
+                "experiment_tags": [{"key": k, "value": v, "experiment_id": int(e.experiment_id)}
+                                    for e in experiments for k, v in e.tags.items()],
+            })
+        print(f"{len(experiments)} experiments")
+
+        datasets: Dict[tuple, str] = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for experiment in experiments:
+                start = time.perf_counter()
+                # Run infos only; reading full runs happens batch by batch below
+                run_infos = self.source._list_run_infos(experiment.experiment_id, ViewType.ALL)
+                for i in range(0, len(run_infos), self.batch_size):
+                    batch = list(executor.map(lambda run_info: read_run(self.source, run_info),
+                                              run_infos[i:i + self.batch_size]))
+                    rows: Dict[str, List[dict]] = {}
+                    for run, history, deleted_time in batch:
+                        for name, table_rows in run_rows(run, history, deleted_time, datasets).items():
+                            rows.setdefault(name, []).extend(table_rows)
+                    with engine.begin() as conn:
+                        self.insert(conn, rows)
+                if run_infos:
+                    print(f"  {experiment.name}: {len(run_infos)} runs in {time.perf_counter() - start:.1f}s")
+
+        self.migrate_registry(engine)
+        if self.db_uri.startswith("sqlite"):
+            with engine.begin() as conn:
+                conn.execute(sqlalchemy.text("ANALYZE"))
+        engine.dispose()
+        return dict(self.counts)
+
+    def migrate_registry(self, engine):
+        registry = RegistryFileStore(self.file_root)
+        rows = {name: [] for name in ("registered_models", "registered_model_tags", "registered_model_aliases",
+                                      "model_versions", "model_version_tags")}
+        page_token = None
+        while True:
+            page = registry.search_registered_models(max_results=1000, page_token=page_token)
+            for model in page:
+                rows["registered_models"].append({
+                    "name": model.name, "creation_time": model.creation_timestamp,
+                    "last_updated_time": model.last_updated_timestamp, "description": model.description,
+                })
+                rows["registered_model_tags"] += [{"key": k, "value": v, "name": model.name}
+                                                  for k, v in model.tags.items()]
+                rows["registered_model_aliases"] += [{"alias": alias, "version": int(version), "name": model.name}
+                                                     for alias, version in (model.aliases or {}).items()]
+                for version in self.model_versions(registry, model.name):
+                    rows["model_versions"].append({
+                        "name": model.name, "version": int(version.version),
+                        "creation_time": version.creation_timestamp,
+                        "last_updated_time": version.last_updated_timestamp,
+                        "description": version.description, "user_id": version.user_id,
+                        "current_stage": version.current_stage, "source": version.source,
+                        "run_id": version.run_id, "run_link": version.run_link, "status": version.status,
+                        "status_message": version.status_message, "storage_location": None,
+                    })
+                    rows["model_version_tags"] += [{"key": k, "value": v, "name": model.name,
+                                                    "version": int(version.version)}
+                                                   for k, v in version.tags.items()]
+            page_token = page.token
+            if not page_token:
+                break
+        with engine.begin() as conn:
+            self.insert(conn, rows)
+        print(f"{self.counts['registered_models']} registered models, {self.counts['model_versions']} versions")
+
+    @staticmethod
+    def model_versions(registry, name: str):
+        page_token = None
+        while True:
+            page = registry.search_model_versions(f"name='{name}'", max_results=PAGE_SIZE, page_token=page_token)
+            yield from page
+            page_token = page.token
+            if not page_token:
+                return
+
+
+def verify(migration: StoreMigration, samples: int = 20, seed: int = 42) -> List[str]:
+    """
+    Compare row counts with the source (see count_source), and a sample of runs field by field.
+
+    Returns:
+        list: Mismatch descriptions, empty when the copy is complete
+    """
+    errors = []
+    expected_counts = count_source(migration.source)
+    engine = sqlalchemy.create_engine(migration.db_uri)
+    with engine.connect() as conn:
+        for name, table in TABLES.items():
+            count = conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(table)).scalar()
+            if count != expected_counts[name]:
+                errors.append(f"{name}: {count} rows in the database, {expected_counts[name]} in the source")
+    engine.dispose()
+
+    sql_store = SqlAlchemyStore(migration.db_uri, migration.file_root)
+    run_ids = [info.run_id for e in migration.source.search_experiments(view_type=ViewType.ALL, max_results=50000)
+               for info in migration.source._list_run_infos(e.experiment_id, ViewType.ALL)]
+    for run_id in random.Random(seed).sample(run_ids, min(samples, len(run_ids))):
+        expected, actual = migration.source.get_run(run_id), sql_store.get_run(run_id)
+        for field in ("params", "tags", "metrics"):
+            if getattr(expected.data, field) != getattr(actual.data, field):
+                errors.append(f"run {run_id}: {field} differ")
+        if expected.info.to_proto() != actual.info.to_proto():
+            errors.append(f"run {run_id}: run info differs")
+        for key in expected.data.metrics:
+            if len(migration.source.get_metric_history(run_id, key)) != len(sql_store.get_metric_history(run_id, key)):
+                errors.append(f"run {run_id}: history of {key} differs")
+    return errors
+
+
+def search_queries(client) -> List[Tuple[str, dict]]:
+    """Searches issued by the repo scripts, on the experiment with the most runs."""
+    experiments = client.search_experiments(view_type=ViewType.ALL)
+    sizes = {e.experiment_id: len(client.search_runs([e.experiment_id], max_results=PAGE_SIZE)) for e in experiments}
+    experiment_id = max(sizes, key=sizes.get)
+    sample = client.search_runs([experiment_id], max_results=1)
+    run_name = sample[0].info.run_name if sample else ""
+    return [
+        ("latest finished run (08)", {"experiment_ids": [experiment_id], "max_results": 1,
+                                      "filter_string": "attributes.status = 'FINISHED'",
+                                      "order_by": ["attributes.start_time DESC"]}),
+        ("run by name (get_mlflow_env)", {"experiment_ids": [experiment_id], "max_results": 1,
+                                          "filter_string": f"tags.mlflow.runName = '{run_name}'",
+                                          "order_by": ["attributes.start_time DESC"]}),
+        ("r2 filter, best first (08 --bulk)", {"experiment_ids": [experiment_id],
+                                               "filter_string": "metrics.r2 >= 0.5",
+                                               "order_by": ["metrics.r2 DESC"]}),
+        ("all runs, paged", {"experiment_ids": [experiment_id]}),
+    ]
+
+
+def benchmark_search(tracking_uris: Dict[str, str], repeats: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Median time in seconds of the same searches against several backends.
+
+    Returns:
+        dict: {query label: {backend label: seconds}}
+    """
+    clients = {label: mlflow.tracking.MlflowClient(tracking_uri=uri) for label, uri in tracking_uris.items()}
+    queries = search_queries(next(iter(clients.values())))
+    results: Dict[str, Dict[str, float]] = {}
+    for label, kwargs in queries:
+        results[label] = {}
+        for backend, client in clients.items():
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                if "max_results" in kwargs:
+                    client.search_runs(**kwargs)
+                else:
+                    sum(1 for _ in iter_runs(client, kwargs["experiment_ids"],
+                                             filter_string=kwargs.get("filter_string", ""),
+                                             order_by=kwargs.get("order_by")))
+                times.append(time.perf_counter() - start)
+            results[label][backend] = statistics.median(times)
+    return results
+
+
+def print_benchmark(results: Dict[str, Dict[str, float]]):
+    backends = list(next(iter(results.values())))
+    print(f"\n{'search':<36} " + " ".join(f"{b + ' s':>12}" for b in backends) + "  speedup")
+    for label, times in results.items():
+        speedup = times[backends[0]] / times[backends[-1]] if times[backends[-1]] > 0 else float("inf")
+        print(f"{label:<36} " + " ".join(f"{times[b]:>12.3f}" for b in backends) + f"  {speedup:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate a file tracking store to SQLite')
+    parser.add_argument('--file_store', type=str, required=True, help='mlruns directory of the file store')
+    parser.add_argument('--db_uri', type=str, default="sqlite:///mlflow.db", help='Destination database URI')
+    parser.add_argument('--batch_size', type=int, default=BATCH_SIZE, help='Runs inserted per transaction')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent file store readers')
+    parser.add_argument('--samples', type=int, default=20, help='Runs compared field by field after the copy')
+    parser.add_argument('--benchmark', action='store_true', help='Time the repo searches on both stores')
+    parser.add_argument('--benchmark_only', action='store_true', help='Only run the search benchmark')
+    parser.add_argument('--repeats', type=int, default=3, help='Repeats per search (--benchmark)')
+    args = parser.parse_args()
+
+    file_store = os.path.abspath(args.file_store.replace("file://", "", 1))
+    if not args.benchmark_only:
+        migration = StoreMigration(file_store, args.db_uri, batch_size=args.batch_size, workers=args.workers)
+        start = time.perf_counter()
+        counts = migration.migrate()
+        print(f"\nCopied in {time.perf_counter() - start:.1f}s: "
+              + ", ".join(f"{name} {count}" for name, count in counts.items() if count))
+
+        errors = verify(migration, samples=args.samples)
+        if errors:
+            print("\nVerification failed:")
+            for error in errors:
+                print(f"  {error}")
+            raise SystemExit(1)
+        print(f"Verified: row counts match, {min(args.samples, counts['runs'])} sampled runs identical")
+
+    if args.benchmark or args.benchmark_only:
+        print_benchmark(benchmark_search({"file": f"file://{file_store}", "sqlite": args.db_uri}, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
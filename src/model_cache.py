@@ -0,0 +1,337 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import mlflow
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+# models:/<name>/<version number> is immutable, so it can be served from disk
+# without asking the registry; aliases, stages and "latest" must be resolved
+_PINNED_VERSION = re.compile(r"^models:/(?P<name>[^/@]+)/(?P<version>\d+)/?$")
+_ALIAS = re.compile(r"^models:/(?P<name>[^/@]+)@(?P<alias>[^/]+)/?$")
+_STAGE = re.compile(r"^models:/(?P<name>[^/@]+)/(?P<stage>[^/\d][^/]*)/?$")
+
+
+def default_cache_dir() -> str:
+    """Cache root used when none is given (env var, else ~/.cache/apple_models)."""
+    return os.environ.get(
+        "APPLE_MODEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "apple_models")
+    )
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_manifest(model_dir: str) -> dict:
+    """Size and sha256 of every file of a model directory, plus a content hash of the whole."""
+    files = {}
+    for root, _, names in os.walk(model_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, model_dir)
+            files[rel_path] = {"size": os.path.getsize(path), "sha256": file_sha256(path)}
+    content = hashlib.sha256()
+    for rel_path in sorted(files):
+        content.update(f"{rel_path}\0{files[rel_path]['sha256']}\n".encode())
+    return {
+        "content_hash": content.hexdigest(),
+        "total_size": sum(f["size"] for f in files.values()),
+        "files": files,
+    }
+
+
+def resolve_cache_key(model_uri: str, client=None) -> str:
+    """
+    Immutable cache key of a model URI.
+
+    models:/name/N and runs:/ URIs are their own key (no network call);
+    models:/name@alias, models:/name/latest and models:/name/<stage> are
+    resolved to models:/name/N through the registry first.
+    """
+    if _PINNED_VERSION.match(model_uri) or model_uri.startswith("runs:/"):
+        return model_uri.rstrip("/")
+
+    client = client or mlflow.tracking.MlflowClient()
+    alias = _ALIAS.match(model_uri)
+    if alias:
+        version = client.get_model_version_by_alias(alias["name"], alias["alias"]).version
+        return f"models:/{alias['name']}/{version}"
+
+    stage = _STAGE.match(model_uri)
+    if stage:
+        stages = None if stage["stage"].lower() == "latest" else [stage["stage"]]
+        versions = client.get_latest_versions(stage["name"], stages=stages)
+        if not versions:
+            raise Exception(f"No version found for {model_uri}")
+        version = max(versions, key=lambda v: int(v.version)).version
+        return f"models:/{stage['name']}/{version}"
+
+    return model_uri
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ModelCache:
+    """
+    Content-addressed local cache of MLflow model artifacts.
+
+    Layout under the cache root:
+        objects/<content hash>/model/...   downloaded model directory
+        objects/<content hash>/manifest.json
+        refs/<sha1 of key>.json            key (models:/name/N, runs:/...) -> content hash
+        leases/<content hash>/<pid>        one file per process using the object
+
+    Two keys pointing to identical artifacts share one object. Objects are
+    checked against their manifest on every hit (file sizes by default), and
+    the least recently used ones are evicted when the total size exceeds
+    max_bytes. An object returned by get() is leased by the calling process
+    until release() or the process exits, and is not evicted meanwhile.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 verify: str = "size"):
+        """
+        Args:
+            root: Cache directory (default: see default_cache_dir)
+            max_bytes: Size cap of the cached objects
+            verify: "size" checks file sizes on every hit, "full" also
+                    re-hashes every file (outside the cache lock), "none"
+                    skips the check. Files are always hashed at download.
+        """
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.verify = verify
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "refs"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "leases"), exist_ok=True)
+
+    def get(self, model_uri: str) -> str:
+        """
+        Local directory of a model, downloaded only on a cache miss.
+
+        The object is leased to this process (see release) so other processes
+        do not evict it while it is being loaded or served. Local paths are
+        returned unchanged.
+        """
+        if os.path.isdir(model_uri) or model_uri.startswith("file:"):
+            return model_uri
+
+        key = resolve_cache_key(model_uri)
+        with self._locked():
+            content_hash = self._read_ref(key)
+            if content_hash and not self._check_object(content_hash):
+                content_hash = None
+            if content_hash:
+                self._touch(content_hash)
+                self._take_lease(content_hash)
+        # Re-hashing a large model is slow, do it without blocking other processes
+        if content_hash and self.verify == "full" and not self._check_hashes(content_hash):
+            with self._locked():
+                self._drop_object(content_hash)
+                self._release(content_hash)
+            content_hash = None
+        if content_hash:
+            return self._model_dir(content_hash)
+
+        # Download outside the lock, other processes can keep reading the cache
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            download_dir = os.path.join(tmp_dir, "download")
+            os.makedirs(download_dir)
+            local_path = mlflow.artifacts.download_artifacts(artifact_uri=key, dst_path=download_dir)
+            manifest = build_manifest(local_path)
+            content_hash = manifest["content_hash"]
+
+            with self._locked():
+                object_dir = self._object_dir(content_hash)
+                if not self._check_object(content_hash):
+                    shutil.rmtree(object_dir, ignore_errors=True)
+                    os.makedirs(object_dir)
+                    os.rename(local_path, os.path.join(object_dir, "model"))
+                    with open(os.path.join(object_dir, "manifest.json"), "w") as f:
+                        json.dump(dict(manifest, key=key), f, indent=2)
+                self._write_ref(key, content_hash)
+                self._touch(content_hash)
+                self._take_lease(content_hash)
+                self._evict(keep=content_hash)
+            return self._model_dir(content_hash)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def release(self, model_dir: str):
+        """Release the lease get() took on a model directory, letting eviction remove it."""
+        with self._locked():
+            self._release(os.path.basename(os.path.dirname(os.path.normpath(model_dir))))
+
+    def stats(self) -> dict:
+        """Number of objects and total cached size."""
+        objects = self._objects()
+        return {"objects": len(objects), "total_size": sum(size for _, size, _ in objects)}
+
+    # Internals
+
+    def _object_dir(self, content_hash: str) -> str:
+        return os.path.join(self.root, "objects", content_hash)
+
+    def _model_dir(self, content_hash: str) -> str:
+        return os.path.join(self._object_dir(content_hash), "model")
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.root, "refs", hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def _read_ref(self, key: str) -> Optional[str]:
+        try:
+            with open(self._ref_path(key)) as f:
+                return json.load(f)["content_hash"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_ref(self, key: str, content_hash: str):
+        with open(self._ref_path(key), "w") as f:
+            json.dump({"key": key, "content_hash": content_hash}, f)
+
+    def _touch(self, content_hash: str):
+        """Record an access, the manifest mtime is the LRU clock."""
+        os.utime(os.path.join(self._object_dir(content_hash), "manifest.json"))
+
+    def _take_lease(self, content_hash: str):
+        lease_dir = os.path.join(self.root, "leases", content_hash)
+        os.makedirs(lease_dir, exist_ok=True)
+        open(os.path.join(lease_dir, str(os.getpid())), "w").close()
+
+    def _release(self, content_hash: str):
+        try:
+            os.remove(os.path.join(self.root, "leases", content_hash, str(os.getpid())))
+        except FileNotFoundError:
+            pass
+
+    def _references(self, content_hash: str) -> int:
+        """Live leases of an object; leases of exited processes are removed."""
+        lease_dir = os.path.join(self.root, "leases", content_hash)
+        if not os.path.isdir(lease_dir):
+            return 0
+        count = 0
+        for name in os.listdir(lease_dir):
+            if _pid_alive(int(name)):
+                count += 1
+            else:
+                os.remove(os.path.join(lease_dir, name))
+        return count
+
+    def _check_object(self, content_hash: str) -> bool:
+        """True if the object exists and its file sizes match its manifest; corrupt objects are removed."""
+        manifest_path = os.path.join(self._object_dir(content_hash), "manifest.json")
+        if not os.path.exists(manifest_path):
+            return False
+        if self.verify == "none":
+            return True
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        model_dir = self._model_dir(content_hash)
+        for rel_path, expected in manifest["files"].items():
+            path = os.path.join(model_dir, rel_path)
+            if not (os.path.exists(path) and os.path.getsize(path) == expected["size"]):
+                self._drop_object(content_hash)
+                return False
+        return True
+
+    def _check_hashes(self, content_hash: str) -> bool:
+        """True if every file of the object matches its manifest sha256 (reads the whole model)."""
+        try:
+            with open(os.path.join(self._object_dir(content_hash), "manifest.json")) as f:
+                manifest = json.load(f)
+            model_dir = self._model_dir(content_hash)
+            return all(file_sha256(os.path.join(model_dir, rel_path)) == expected["sha256"]
+                       for rel_path, expected in manifest["files"].items())
+        except (OSError, ValueError, KeyError):
+            return False  # Evicted or rewritten by another process meanwhile
+
+    def _drop_object(self, content_hash: str):
+        print(f"Cached model {content_hash[:12]} failed the integrity check, dropping it")
+        shutil.rmtree(self._object_dir(content_hash), ignore_errors=True)
+
+    def _objects(self):
+        """(content hash, size, last access) of every cached object."""
+        objects = []
+        objects_dir = os.path.join(self.root, "objects")
+        for content_hash in os.listdir(objects_dir):
+            manifest_path = os.path.join(objects_dir, content_hash, "manifest.json")
+            try:
+                with open(manifest_path) as f:
+                    size = json.load(f)["total_size"]
+                objects.append((content_hash, size, os.path.getmtime(manifest_path)))
+            except (OSError, ValueError, KeyError):
+                continue
+        return objects
+
+    def _evict(self, keep: Optional[str] = None):
+        """Remove least recently used objects until the cache fits in max_bytes."""
+        objects = sorted(self._objects(), key=lambda o: o[2])
+        total = sum(size for _, size, _ in objects)
+        for content_hash, size, _ in objects:
+            if total <= self.max_bytes:
+                break
+            if content_hash == keep or self._references(content_hash) > 0:
+                continue
+            shutil.rmtree(self._object_dir(content_hash), ignore_errors=True)
+            shutil.rmtree(os.path.join(self.root, "leases", content_hash), ignore_errors=True)
+            total -= size
+        # Refs to evicted objects are simply misses on the next lookup
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock shared by all processes using this cache root."""
+        with open(os.path.join(self.root, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def cached_model_path(model_uri: str, cache_dir: Optional[str] = None,
+                      max_bytes: int = DEFAULT_MAX_BYTES, verify: str = "size") -> str:
+    """Local directory of a model, served from the cache when possible."""
+    return ModelCache(cache_dir, max_bytes=max_bytes, verify=verify).get(model_uri)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fetch a model into the local model cache")
+    parser.add_argument("--model_uri", required=True, help="models:/ or runs:/ URI")
+    parser.add_argument("--tracking_uri", default="http://127.0.0.1:8080", help="MLflow tracking URI")
+    parser.add_argument("--cache_dir", default=None, help="Cache directory (optional)")
+    parser.add_argument("--max_gb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3, help="Cache size cap in GB")
+    parser.add_argument("--verify", default="size", choices=["full", "size", "none"], help="Integrity check on hits")
+    args = parser.parse_args()
+
+    mlflow.set_tracking_uri(args.tracking_uri)
+    cache = ModelCache(args.cache_dir, max_bytes=int(args.max_gb * 1024 ** 3), verify=args.verify)
+    start = time.perf_counter()
+    path = cache.get(args.model_uri)
+    print(f"{args.model_uri} -> {path} ({time.perf_counter() - start:.2f}s)")
+    print(f"Cache: {cache.stats()}")
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import List, Optional
+
+import mlflow
+
+from model_cache import default_cache_dir
+
+# Versions fetched per search_model_versions request
+PAGE_SIZE = 200
+
+_TAG_SPEC = re.compile(r"^tag:(?P<key>[^=]+)=(?P<value>.*)$")
+
+
+def version_record(version) -> dict:
+    """JSON-serializable summary of a ModelVersion."""
+    return {
+        "version": str(version.version),
+        "run_id": version.run_id,
+        "source": version.source,
+        "status": version.status,
+        "current_stage": version.current_stage,
+        "tags": dict(version.tags or {}),
+        "creation_timestamp": version.creation_timestamp,
+        "last_updated_timestamp": version.last_updated_timestamp,
+    }
+
+
+class ModelIndex:
+    """
+    Local index of the versions of a registered model, refreshed incrementally.
+
+    The index is stored per (tracking URI, model name) with the registered
+    model's last_updated_timestamp. A refresh costs one get_registered_model
+    call when nothing changed; otherwise only versions updated since the last
+    refresh are paged in (newest first). Deleting a version updates the
+    registered model without leaving a newer version behind, which triggers
+    a full rebuild instead.
+
+    Version tags and aliases are not covered by registry timestamps: aliases
+    come from the get_registered_model call of every refresh, and tag lookups
+    are filtered by the tracking server.
+    """
+
+    def __init__(self, model_name: str, client=None, cache_dir: Optional[str] = None):
+        """
+        Args:
+            model_name: Registered model name
+            client: MLflow client (default: current tracking URI)
+            cache_dir: Index directory (default: <model cache>/index)
+        """
+        self.model_name = model_name
+        self.client = client or mlflow.tracking.MlflowClient()
+        cache_dir = cache_dir or os.path.join(default_cache_dir(), "index")
+        os.makedirs(cache_dir, exist_ok=True)
+        key = f"{self.client.tracking_uri}\0{model_name}"
+        self.path = os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+        self.index = self._load()
+        self.aliases = {}
+        self._refreshed = False
+
+    # Refresh
+
+    def refresh(self, full: bool = False) -> dict:
+        """
+        Bring the index up to date with the registry.
+
+        Returns:
+            dict: {"mode": "cached" | "incremental" | "full", "fetched": versions read}
+        """
+        model = self.client.get_registered_model(self.model_name)
+        self.aliases = {alias: str(version) for alias, version in (model.aliases or {}).items()}
+        self._refreshed = True
+
+        cached = self.index
+        if not full and cached and cached["last_updated_timestamp"] == model.last_updated_timestamp:
+            # Stage transitions and version description or tag edits do not
+            # always bump the registered model, compare the last updated version
+            newest = self.client.search_model_versions(
+                f"name='{self.model_name}'", max_results=1, order_by=["last_updated_timestamp DESC"])
+            if not newest or cached["versions"].get(str(newest[0].version)) == version_record(newest[0]):
+                return {"mode": "cached", "fetched": 0}
+
+        if full or not cached:
+            versions = {r["version"]: r for r in map(version_record, self._iter_versions())}
+            mode, fetched = "full", len(versions)
+        else:
+            watermark = max((v["last_updated_timestamp"] for v in cached["versions"].values()), default=0)
+            updates = []
+            for version in self._iter_versions():
+                if version.last_updated_timestamp <= watermark:
+                    break
+                updates.append(version_record(version))
+            if not any(u["last_updated_timestamp"] >= model.last_updated_timestamp for u in updates):
+                # Registered model changed without a newer version: deletion or rename
+                return self.refresh(full=True)
+            versions = dict(cached["versions"])
+            versions.update({u["version"]: u for u in updates})
+            mode, fetched = "incremental", len(updates)
+
+        self.index = {
+            "model_name": self.model_name,
+            "last_updated_timestamp": model.last_updated_timestamp,
+            "versions": versions,
+        }
+        self._save()
+        return {"mode": mode, "fetched": fetched}
+
+    def _iter_versions(self):
+        """Versions of the model, most recently updated first, page by page."""
+        page_token = None
+        while True:
+            page = self.client.search_model_versions(
+                f"name='{self.model_name}'",
+                max_results=PAGE_SIZE,
+                order_by=["last_updated_timestamp DESC"],
+                page_token=page_token,
+            )
+            for version in page:
+                yield version
+            page_token = page.token
+            if not page_token:
+                break
+
+    def _ensure_fresh(self):
+        if not self._refreshed:
+            self.refresh()
+
+    # Lookups
+
+    def versions(self) -> List[dict]:
+        """All indexed versions, newest version number first."""
+        self._ensure_fresh()
+        return sorted(self.index["versions"].values(), key=lambda v: int(v["version"]), reverse=True)
+
+    def resolve(self, spec: str) -> dict:
+        """
+        Resolve a version spec to a version record.
+
+        Args:
+            spec: "latest", a version number, "@alias" or "tag:key=value"
+                  (the highest version carrying the tag)
+        """
+        self._ensure_fresh()
+        spec = str(spec).strip()
+        versions = self.index["versions"]
+
+        if spec == "latest":
+            ready = [v for v in versions.values() if v["status"] == "READY"]
+            if not ready:
+                raise Exception(f"No ready version for model '{self.model_name}'")
+            return max(ready, key=lambda v: int(v["version"]))
+
+        if spec.startswith("@"):
+            alias = spec[1:]
+            if alias not in self.aliases:
+                raise Exception(f"Alias '{alias}' not found for model '{self.model_name}', "
+                                f"available: {sorted(self.aliases)}")
+            spec = self.aliases[alias]
+
+        tag = _TAG_SPEC.match(spec)
+        if tag:
+            matches = self.client.search_model_versions(
+                f"name='{self.model_name}' and tags.`{tag['key']}` = '{tag['value']}'",
+                max_results=1,
+                order_by=["version_number DESC"],
+            )
+            if not matches:
+                raise Exception(f"No version of model '{self.model_name}' has tag {tag['key']}={tag['value']}")
+            return version_record(matches[0])
+
+        if spec not in versions:
+            # Created after the last refresh, or a stale index
+            self.refresh(full=True)
+            if spec not in self.index["versions"]:
+                raise Exception(f"Version {spec} not found for model '{self.model_name}'")
+        return self.index["versions"][spec]
+
+    def model_uri(self, spec: str) -> str:
+        """Pinned models:/name/N URI of a version spec."""
+        return f"models:/{self.model_name}/{self.resolve(spec)['version']}"
+
+    # Storage
+
+    def _load(self) -> Optional[dict]:
+        try:
+            with open(self.path) as f:
+                index = json.load(f)
+            return index if index.get("model_name") == self.model_name else None
+        except (OSError, ValueError):
+            return None
+
+    def _save(self):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Resolve model versions through the local version index")
+    parser.add_argument("--model_name", required=True, help="Registered model name")
+    parser.add_argument("--spec", default="latest", help='"latest", N, "@alias" or "tag:key=value"')
+    parser.add_argument("--tracking_uri", default="http://127.0.0.1:8080", help="MLflow tracking URI")
+    parser.add_argument("--full", action="store_true", help="Rebuild the index from scratch")
+    args = parser.parse_args()
+
+    mlflow.set_tracking_uri(args.tracking_uri)
+    start = time.perf_counter()
+    index = ModelIndex(args.model_name)
+    refresh = index.refresh(full=args.full)
+    record = index.resolve(args.spec)
+    print(f"Index refresh: {refresh['mode']}, {refresh['fetched']} versions fetched "
+          f"({len(index.index['versions'])} indexed, {time.perf_counter() - start:.2f}s)")
+    print(f"{args.spec} -> version {record['version']} (run {record['run_id']}, stage {record['current_stage']})")
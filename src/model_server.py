@@ -0,0 +1,427 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import payload as payload_format
+
+logger = logging.getLogger(__name__)
+
+
+class BadRequest(Exception):
+    """Invalid /invocations payload, answered with HTTP 400."""
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent prediction requests into one vectorized predict call.
+
+    A background thread takes the first waiting request, then keeps
+    collecting requests until max_batch_size rows are gathered or max_wait_ms
+    has elapsed, and predicts them all at once. If a batch fails (e.g. one
+    request does not match the model schema) its requests are retried one by
+    one, so only the faulty request gets the error.
+    """
+
+    def __init__(self, predict_fn: Callable[[pd.DataFrame], np.ndarray],
+                 max_batch_size: int = 256, max_wait_ms: float = 5.0):
+        """
+        Args:
+            predict_fn: Vectorized predict function (e.g. pyfunc model.predict)
+            max_batch_size: Maximum rows per predict call
+            max_wait_ms: Maximum time the first request of a batch waits for others
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._rows = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame: pd.DataFrame) -> Future:
+        """Queue a frame for prediction, the future resolves to its predictions."""
+        future = Future()
+        self._queue.put((frame, future))
+        return future
+
+    def predict(self, frame: pd.DataFrame, timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking predict through the batcher."""
+        return self.submit(frame).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_requests": self._requests / self._batches if self._batches else 0.0,
+                "mean_batch_rows": self._rows / self._batches if self._batches else 0.0,
+            }
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            frames = [frame for frame, _ in batch]
+            try:
+                frame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+                predictions = np.asarray(self.predict_fn(frame))
+                offset = 0
+                for item_frame, future in batch:
+                    future.set_result(predictions[offset:offset + len(item_frame)])
+                    offset += len(item_frame)
+            except Exception:
+                for item_frame, future in batch:
+                    try:
+                        future.set_result(np.asarray(self.predict_fn(item_frame)))
+                    except Exception as e:
+                        future.set_exception(e)
+            with self._lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._rows += sum(len(f) for f in frames)
+
+
+class LatencyStats:
+    """Request count, errors and latency percentiles over the last `window` requests."""
+
+    def __init__(self, window: int = 10_000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+
+    def record(self, seconds: float, error: bool = False):
+        with self._lock:
+            self.count += 1
+            if error:
+                self.errors += 1
+            else:
+                self._latencies.append(seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000.0
+            count, errors = self.count, self.errors
+        result = {"requests": count, "errors": errors}
+        if len(latencies):
+            result.update({
+                "latency_ms_mean": float(latencies.mean()),
+                "latency_ms_p50": float(np.percentile(latencies, 50)),
+                "latency_ms_p95": float(np.percentile(latencies, 95)),
+                "latency_ms_p99": float(np.percentile(latencies, 99)),
+                "latency_ms_max": float(latencies.max()),
+            })
+        return result
+
+
+class DiffStats:
+    """Running statistics of shadow minus primary predictions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.sum_diff = 0.0
+        self.sum_abs_diff = 0.0
+        self.max_abs_diff = 0.0
+        self.dropped = 0
+
+    def record(self, primary: np.ndarray, shadow: np.ndarray):
+        diff = np.asarray(shadow, dtype=np.float64).ravel() - np.asarray(primary, dtype=np.float64).ravel()
+        with self._lock:
+            self.rows += len(diff)
+            self.sum_diff += float(diff.sum())
+            self.sum_abs_diff += float(np.abs(diff).sum())
+            if len(diff):
+                self.max_abs_diff = max(self.max_abs_diff, float(np.abs(diff).max()))
+
+    def record_dropped(self):
+        """Count a mirrored request dropped because too many were in flight."""
+        with self._lock:
+            self.dropped += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            rows = self.rows
+            return {
+                "rows": rows,
+                "mean_diff": self.sum_diff / rows if rows else 0.0,
+                "mean_abs_diff": self.sum_abs_diff / rows if rows else 0.0,
+                "max_abs_diff": self.max_abs_diff,
+                "dropped_requests": self.dropped,
+            }
+
+
+class ModelRouter:
+    """
+    Route requests between several model versions loaded in one process.
+
+    Primary traffic is split by weight (canary rollout); shadow versions get
+    a copy of every request through their own batcher, after the primary
+    answer is computed and without waiting for it, and their predictions are
+    compared with the primary ones.
+    """
+
+    def __init__(self, batchers: Dict[str, MicroBatcher], weights: Optional[Dict[str, float]] = None,
+                 shadows: Optional[List[str]] = None, max_pending_shadow: int = 1000, seed: int = 42):
+        """
+        Args:
+            batchers: Batcher per version label
+            weights: Traffic weight per primary version (default: all on the first)
+            shadows: Versions receiving mirrored traffic only
+            max_pending_shadow: Mirrored requests in flight before new ones are dropped
+        """
+        self.batchers = batchers
+        self.shadows = list(shadows or [])
+        if weights and set(weights) & set(self.shadows):
+            raise Exception("A version cannot be both weighted and shadowed")
+        primaries = [v for v in batchers if v not in self.shadows]
+        if not primaries:
+            raise Exception("At least one version must receive primary traffic")
+        weights = weights or {primaries[0]: 1.0}
+        if any(w < 0 for w in weights.values()):
+            raise Exception(f"Traffic weights must be non-negative, got {weights}")
+        if not any(weights.get(v, 0) > 0 for v in primaries):
+            raise Exception(f"At least one primary version needs a positive weight, got {weights}")
+        self.primaries = [v for v in primaries if weights.get(v, 0) > 0]
+        self.weights = [weights[v] for v in self.primaries]
+        self.max_pending_shadow = max_pending_shadow
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._pending_shadow = threading.BoundedSemaphore(max_pending_shadow)
+        self.latency = {v: LatencyStats() for v in batchers}
+        self.diffs = {v: DiffStats() for v in self.shadows}
+
+    def route(self) -> str:
+        with self._rng_lock:
+            return self._rng.choices(self.primaries, weights=self.weights)[0]
+
+    def predict(self, frame: pd.DataFrame, version: Optional[str] = None):
+        """
+        Predict with a primary version (routed, or forced with version).
+
+        Returns:
+            tuple: (version label, predictions)
+        """
+        version = version or self.route()
+        if version not in self.primaries:
+            raise BadRequest(f"Unknown or non-primary model version '{version}', available: {self.primaries}")
+
+        start = time.perf_counter()
+        try:
+            predictions = self.batchers[version].predict(frame)
+        except Exception:
+            self.latency[version].record(time.perf_counter() - start, error=True)
+            raise
+        self.latency[version].record(time.perf_counter() - start)
+
+        for shadow in self.shadows:
+            if shadow != version:
+                self._mirror(shadow, frame, predictions)
+        return version, predictions
+
+    def _mirror(self, shadow: str, frame: pd.DataFrame, primary: np.ndarray):
+        if not self._pending_shadow.acquire(blocking=False):
+            self.diffs[shadow].record_dropped()
+            return
+        start = time.perf_counter()
+        future = self.batchers[shadow].submit(frame)
+
+        def done(f):
+            try:
+                error = f.exception() is not None
+                self.latency[shadow].record(time.perf_counter() - start, error=error)
+                if not error:
+                    self.diffs[shadow].record(primary, f.result())
+            finally:
+                self._pending_shadow.release()
+
+        future.add_done_callback(done)
+
+    def stats(self) -> dict:
+        return {
+            "versions": {
+                version: dict(
+                    self.latency[version].summary(),
+                    role="shadow" if version in self.shadows else "primary",
+                    weight=self.weights[self.primaries.index(version)] if version in self.primaries else 0.0,
+                    batching=batcher.stats(),
+                )
+                for version, batcher in self.batchers.items()
+            },
+            "shadow_diff": {version: stats.summary() for version, stats in self.diffs.items()},
+        }
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler with the MLflow scoring server routes:
+    POST /invocations, GET /ping, GET /health, GET /stats.
+
+    /invocations takes dataframe_split JSON, an Arrow IPC stream or a raw
+    float64 payload according to Content-Type (see payload.py), and answers
+    in the format asked by Accept (JSON by default).
+
+    An X-Model-Version request header forces the version; the version that
+    answered is returned in the X-Model-Version response header.
+    """
+
+    server_version = "AppleModelServer/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, with Nagle enabled small responses
+    # wait for the client's delayed ACK (~40 ms) on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path in ("/ping", "/health"):
+            self._send_json(200, {})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.app.stats())
+        else:
+            self._send_json(404, {"error_code": "NOT_FOUND", "message": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/invocations":
+            self._send_json(404, {"error_code": "NOT_FOUND", "message": f"Unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", payload_format.JSON)
+        try:
+            status, body, headers = self.server.app.invocations(
+                body, content_type, version=self.headers.get("X-Model-Version"),
+                accept=self.headers.get("Accept", payload_format.JSON),
+            )
+        except BadRequest as e:
+            self._send_json(400, {"error_code": "BAD_REQUEST", "message": str(e)})
+            return
+        except Exception as e:
+            self._send_json(400, {"error_code": "BAD_REQUEST", "message": f"Failed to predict: {e}"})
+            return
+        self._send(status, body, headers)
+
+    def _send_json(self, status: int, payload: dict):
+        self._send(status, json.dumps(payload).encode(), {"Content-Type": payload_format.JSON})
+
+    def _send(self, status: int, body: bytes, headers: dict):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class ScoringApp:
+    """Request handling of the in-process server, independent of the HTTP layer."""
+
+    def __init__(self, router: ModelRouter):
+        self.router = router
+
+    def invocations(self, body: bytes, content_type: str, version: Optional[str] = None,
+                    accept: str = payload_format.JSON):
+        """
+        Predict a request body.
+
+        Whatever the payload format, the decoded frame goes through the same
+        pyfunc predict, hence the same model signature checks.
+
+        Returns:
+            tuple: (HTTP status, response body, response headers)
+        """
+        try:
+            frame = payload_format.decode_frame(body, content_type)
+        except payload_format.PayloadError as e:
+            raise BadRequest(str(e))
+        version, predictions = self.router.predict(frame, version=version)
+        response, response_type = payload_format.encode_predictions(predictions, accept)
+        return 200, response, {"Content-Type": response_type, "X-Model-Version": version}
+
+    def stats(self) -> dict:
+        return self.router.stats()
+
+
+def make_server(app: ScoringApp, host: str = "0.0.0.0", port: int = 5001) -> ThreadingHTTPServer:
+    """Threaded HTTP server (one thread per connection) bound to app."""
+    server = ThreadingHTTPServer((host, port), ScoringHandler)
+    server.daemon_threads = True
+    server.app = app
+    return server
+
+
+def load_predict_fn(model_uri: str, engine: str = "pyfunc") -> Callable[[pd.DataFrame], np.ndarray]:
+    """Predict function of a model, through pyfunc or the flat-array forest engine."""
+    import mlflow
+
+    if engine == "flat":
+        from flat_forest import load_flat_forest
+
+        model_path = model_uri if os.path.isdir(model_uri) else mlflow.artifacts.download_artifacts(model_uri)
+        return load_flat_forest(model_path).predict
+    return mlflow.pyfunc.load_model(model_uri).predict
+
+
+def serve(model_uris: Dict[str, str], host: str = "0.0.0.0", port: int = 5001,
+          max_batch_size: int = 256, max_wait_ms: float = 5.0,
+          weights: Optional[Dict[str, float]] = None, shadows: Optional[List[str]] = None,
+          engine: str = "pyfunc"):
+    """
+    Load one or several models once and serve them in-process with micro-batching.
+
+    Accepts the same /invocations requests as `mlflow models serve`.
+
+    Args:
+        model_uris: Model URI per version label
+        weights: Primary traffic weight per version label (default: first version only)
+        shadows: Version labels receiving mirrored traffic only
+        engine: pyfunc (MLflow flavor) or flat (flat-array forest, see flat_forest.py)
+    """
+    batchers = {}
+    for version, model_uri in model_uris.items():
+        batchers[version] = MicroBatcher(load_predict_fn(model_uri, engine), max_batch_size=max_batch_size,
+                                         max_wait_ms=max_wait_ms)
+        print(f"Loaded version {version} from {model_uri} ({engine} engine)")
+
+    router = ModelRouter(batchers, weights=weights, shadows=shadows)
+    server = make_server(ScoringApp(router), host, port)
+    print(f"Serving on http://{host}:{port} (max batch {max_batch_size} rows, max wait {max_wait_ms} ms)")
+    print(f"Primary weights: {dict(zip(router.primaries, router.weights))}, shadows: {router.shadows}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Serving stats: {json.dumps(router.stats(), indent=2)}")
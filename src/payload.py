@@ -0,0 +1,123 @@
+import json
+import struct
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+RAW = "application/x-apple-float64"
+CONTENT_TYPES = {"json": JSON, "arrow": ARROW, "raw": RAW}
+
+# Raw format: magic, little-endian uint32 header length, JSON header, then
+# one little-endian float64 array per column (column-major), 8-byte aligned
+RAW_MAGIC = b"AFV1"
+RAW_DTYPE = np.dtype("<f8")
+
+
+class PayloadError(ValueError):
+    """Malformed or unsupported request/response body."""
+
+
+def media_type(content_type: str) -> str:
+    """Content-Type without parameters (e.g. '; charset=utf-8'), lower-cased."""
+    return (content_type or JSON).split(";")[0].strip().lower()
+
+
+def encode_frame(frame: pd.DataFrame, content_type: str = JSON) -> bytes:
+    """Request body of a feature frame in the given format."""
+    content_type = media_type(content_type)
+    if content_type == JSON:
+        payload = {"dataframe_split": {"columns": frame.columns.tolist(), "data": frame.values.tolist()}}
+        return json.dumps(payload).encode()
+    if content_type == ARROW:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if content_type == RAW:
+        return encode_raw(frame.columns.tolist(), frame.to_numpy(dtype=RAW_DTYPE).T)
+    raise PayloadError(f"Unsupported Content-Type '{content_type}', use one of {sorted(CONTENT_TYPES.values())}")
+
+
+def decode_frame(body: bytes, content_type: str = JSON) -> pd.DataFrame:
+    """Feature frame of a request body; JSON bodies must hold a dataframe_split."""
+    content_type = media_type(content_type)
+    if content_type == JSON:
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise PayloadError(f"Invalid JSON: {e}")
+        if not isinstance(payload, dict) or "dataframe_split" not in payload:
+            raise PayloadError("The request body must contain a 'dataframe_split' field")
+        split = payload["dataframe_split"]
+        try:
+            return pd.DataFrame(split["data"], columns=split.get("columns"), index=split.get("index"))
+        except (KeyError, TypeError, ValueError) as e:
+            raise PayloadError(f"Invalid dataframe_split payload: {e}")
+    if content_type == ARROW:
+        import pyarrow as pa
+
+        try:
+            return pa.ipc.open_stream(body).read_all().to_pandas()
+        except (pa.ArrowInvalid, OSError) as e:
+            raise PayloadError(f"Invalid Arrow IPC stream: {e}")
+    if content_type == RAW:
+        columns, arrays = decode_raw(body)
+        # A (n_columns, n_rows) C-contiguous array is what pandas stores for a
+        # single float64 block: the frame is a read-only view of the body
+        return pd.DataFrame(arrays.T, columns=columns, copy=False)
+    raise PayloadError(f"Unsupported Content-Type '{content_type}', use one of {sorted(CONTENT_TYPES.values())}")
+
+
+def encode_raw(columns: List[str], arrays: np.ndarray) -> bytes:
+    """Raw body of column arrays of shape (n_columns, n_rows)."""
+    arrays = np.ascontiguousarray(arrays, dtype=RAW_DTYPE)
+    header = json.dumps({"columns": columns, "rows": int(arrays.shape[1])}).encode()
+    header += b" " * (-(len(RAW_MAGIC) + 4 + len(header)) % 8)
+    return RAW_MAGIC + struct.pack("<I", len(header)) + header + arrays.tobytes()
+
+
+def decode_raw(body: bytes) -> Tuple[List[str], np.ndarray]:
+    """Column names and (n_columns, n_rows) arrays of a raw body, without copying the data."""
+    if body[:4] != RAW_MAGIC or len(body) < 8:
+        raise PayloadError("Invalid raw payload: bad magic")
+    (header_length,) = struct.unpack("<I", body[4:8])
+    try:
+        header = json.loads(body[8:8 + header_length])
+        columns, rows = list(header["columns"]), int(header["rows"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise PayloadError(f"Invalid raw payload header: {e}")
+    data = memoryview(body)[8 + header_length:]
+    if len(data) != len(columns) * rows * RAW_DTYPE.itemsize:
+        raise PayloadError(f"Invalid raw payload: {len(data)} data bytes for "
+                           f"{len(columns)} columns x {rows} rows of float64")
+    return columns, np.frombuffer(data, dtype=RAW_DTYPE).reshape(len(columns), rows)
+
+
+def encode_predictions(predictions: np.ndarray, accept: str = JSON) -> Tuple[bytes, str]:
+    """
+    Response body of predictions in the format asked by the Accept header.
+
+    Returns:
+        tuple: (body, Content-Type)
+    """
+    accept = media_type(accept)
+    predictions = np.asarray(predictions)
+    if accept == ARROW:
+        return encode_frame(pd.DataFrame({"predictions": predictions.ravel()}), ARROW), ARROW
+    if accept == RAW:
+        return encode_raw(["predictions"], predictions.reshape(1, -1)), RAW
+    return json.dumps({"predictions": predictions.tolist()}).encode(), JSON
+
+
+def decode_predictions(body: bytes, content_type: str = JSON) -> np.ndarray:
+    """Predictions of a response body."""
+    content_type = media_type(content_type)
+    if content_type == JSON:
+        return np.asarray(json.loads(body)["predictions"])
+    return decode_frame(body, content_type)["predictions"].to_numpy()
@@ -0,0 +1,421 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import yaml
+
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+METADATA_NAME = ".apple_env.json"
+
+
+def default_cache_dir() -> str:
+    """Environment cache root (env var, else ~/.cache/apple_envs)."""
+    return os.environ.get(
+        "APPLE_ENV_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "apple_envs")
+    )
+
+
+def read_requirements(path: str) -> List[str]:
+    """Requirement lines of a file, nested -r files inlined, comments dropped."""
+    lines = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line.startswith("-r "):
+                lines += read_requirements(os.path.join(os.path.dirname(path), line[3:].strip()))
+            elif line:
+                lines.append(line)
+    return lines
+
+
+def expand_dependencies(dependencies: List[str], base_dir: str) -> List[str]:
+    """Dependency list with '-r file' entries replaced by the file contents."""
+    expanded = []
+    for dependency in dependencies:
+        if isinstance(dependency, str) and dependency.startswith("-r "):
+            expanded += read_requirements(os.path.join(base_dir, dependency[3:].strip()))
+        else:
+            expanded.append(dependency)
+    return expanded
+
+
+def resolve_env_spec(project_dir: str, env_manager: str) -> dict:
+    """
+    Fully resolved environment spec of an MLflow project.
+
+    Requirement files referenced by the env file are inlined, so editing
+    requirements.txt changes the spec (and its hash) even if conda.yaml or
+    python_env.yaml did not change.
+    """
+    with open(os.path.join(project_dir, "MLproject")) as f:
+        project = yaml.safe_load(f)
+    spec = {"manager": env_manager, "platform": f"{sys.platform}-{platform.machine()}"}
+
+    if env_manager == "local":
+        spec["python"] = platform.python_version()
+        return spec
+
+    if env_manager == "virtualenv":
+        if "python_env" in project:
+            env_path = os.path.join(project_dir, project["python_env"])
+            with open(env_path) as f:
+                env = yaml.safe_load(f)
+        elif "conda_env" in project:
+            # Same fallback as mlflow: python version and pip packages of conda.yaml
+            env_path = os.path.join(project_dir, project["conda_env"])
+            with open(env_path) as f:
+                conda_env = yaml.safe_load(f)
+            python = next(d.split("=", 1)[1] for d in conda_env["dependencies"]
+                          if isinstance(d, str) and d.startswith("python="))
+            pip = next((d["pip"] for d in conda_env["dependencies"] if isinstance(d, dict)), [])
+            env = {"python": python, "build_dependencies": ["pip"], "dependencies": pip}
+        else:
+            raise Exception("The project declares neither python_env nor conda_env")
+        base_dir = os.path.dirname(env_path)
+        spec["python"] = str(env["python"])
+        spec["build_dependencies"] = expand_dependencies(env.get("build_dependencies") or [], base_dir)
+        spec["dependencies"] = expand_dependencies(env.get("dependencies") or [], base_dir)
+        return spec
+
+    if env_manager == "conda":
+        if "conda_env" not in project:
+            raise Exception("The project has no conda_env, use --env-manager virtualenv")
+        env_path = os.path.join(project_dir, project["conda_env"])
+        with open(env_path) as f:
+            conda_env = yaml.safe_load(f)
+        base_dir = os.path.dirname(env_path)
+        dependencies = []
+        for dependency in conda_env.get("dependencies", []):
+            if isinstance(dependency, dict) and "pip" in dependency:
+                dependency = {"pip": expand_dependencies(dependency["pip"], base_dir)}
+            dependencies.append(dependency)
+        spec["channels"] = conda_env.get("channels", [])
+        spec["dependencies"] = dependencies
+        return spec
+
+    raise Exception(f"Unsupported env manager '{env_manager}', use local, virtualenv or conda")
+
+
+def spec_hash(spec: dict) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:24]
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def find_python(version: str) -> str:
+    """Interpreter for a python_env version: pythonX.Y on PATH, pyenv, or the current one."""
+    major_minor = ".".join(version.split(".")[:2])
+    if ".".join(platform.python_version().split(".")[:2]) == major_minor:
+        return sys.executable
+    pyenv_root = os.environ.get("PYENV_ROOT", os.path.join(os.path.expanduser("~"), ".pyenv"))
+    candidates = [os.path.join(pyenv_root, "versions", version, "bin", "python"), shutil.which(f"python{major_minor}")]
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    raise Exception(f"Python {version} not found, install it first (e.g. `pyenv install {version}`)")
+
+
+class EnvCache:
+    """
+    Local cache of built project environments, keyed by the hash of their resolved spec.
+
+    Layout under the cache root:
+        envs/<hash>/                  environment prefix (venv or conda prefix)
+        envs/<hash>/.apple_env.json   spec, size, creation and last use times
+        leases/<hash>/<pid>           one file per process currently using the env
+        locks/<hash>.lock             serializes builds of the same env
+
+    Leases are the reference count: environments in use are never evicted,
+    and leases of dead processes are ignored. When the total size exceeds
+    max_bytes, unreferenced environments are evicted least recently used
+    first.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        for name in ("envs", "leases", "locks"):
+            os.makedirs(os.path.join(self.root, name), exist_ok=True)
+
+    def env_dir(self, key: str) -> str:
+        return os.path.join(self.root, "envs", key)
+
+    def acquire(self, spec: dict, project_dir: str) -> dict:
+        """
+        Prefix of the environment of spec, built on a cache miss, with a lease held by this process.
+
+        Returns:
+            dict: key, prefix, hit (bool) and build_s
+        """
+        key = spec_hash(spec)
+        prefix = self.env_dir(key)
+        start = time.perf_counter()
+        with self._locked(os.path.join(self.root, "locks", f"{key}.lock")):
+            hit = os.path.exists(os.path.join(prefix, METADATA_NAME))
+            if not hit:
+                self._build(spec, prefix, project_dir)
+            self._take_lease(key)
+            self._touch(prefix)
+        build_s = 0.0 if hit else time.perf_counter() - start
+        if not hit:
+            self.evict(keep=key)
+        return {"key": key, "prefix": prefix, "hit": hit, "build_s": build_s}
+
+    def release(self, key: str):
+        try:
+            os.remove(os.path.join(self.root, "leases", key, str(os.getpid())))
+        except FileNotFoundError:
+            pass
+
+    def references(self, key: str) -> int:
+        """Live leases of an environment; stale leases are removed."""
+        lease_dir = os.path.join(self.root, "leases", key)
+        if not os.path.isdir(lease_dir):
+            return 0
+        count = 0
+        for name in os.listdir(lease_dir):
+            if pid_alive(int(name)):
+                count += 1
+            else:
+                os.remove(os.path.join(lease_dir, name))
+        return count
+
+    def entries(self) -> List[dict]:
+        """Metadata of every cached environment, with its live reference count."""
+        entries = []
+        for key in os.listdir(os.path.join(self.root, "envs")):
+            try:
+                with open(os.path.join(self.env_dir(key), METADATA_NAME)) as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            metadata["refs"] = self.references(key)
+            metadata["last_used"] = os.path.getmtime(os.path.join(self.env_dir(key), METADATA_NAME))
+            entries.append(metadata)
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Remove unreferenced environments, least recently used first, until the cache fits."""
+        with self._locked(os.path.join(self.root, "locks", "evict.lock")):
+            entries = sorted(self.entries(), key=lambda e: e["last_used"])
+            total = sum(e["size"] for e in entries)
+            evicted = []
+            for entry in entries:
+                if total <= self.max_bytes:
+                    break
+                if entry["key"] == keep or entry["refs"] > 0:
+                    continue
+                # acquire() checks for a hit and takes its lease under the env lock,
+                # re-check the references under it before deleting
+                with self._locked(os.path.join(self.root, "locks", f"{entry['key']}.lock")):
+                    prefix = self.env_dir(entry["key"])
+                    metadata_path = os.path.join(prefix, METADATA_NAME)
+                    if self.references(entry["key"]) > 0 or not os.path.exists(metadata_path):
+                        continue
+                    # Without its metadata a partially removed env is a miss, not a hit
+                    os.remove(metadata_path)
+                    shutil.rmtree(prefix, ignore_errors=True)
+                total -= entry["size"]
+                evicted.append(entry["key"])
+            return evicted
+
+    # Internals
+
+    def _build(self, spec: dict, prefix: str, project_dir: str):
+        """
+        Build an environment directly in its prefix (called under the env lock).
+
+        Venvs and conda prefixes cannot be moved (scripts and activation files
+        hold absolute paths), so the metadata file, written last, is what marks
+        the build as complete; a prefix without it is an interrupted build.
+        """
+        shutil.rmtree(prefix, ignore_errors=True)
+        print(f"Building {spec['manager']} environment {os.path.basename(prefix)} (cache miss)")
+        try:
+            if spec["manager"] == "virtualenv":
+                subprocess.run([find_python(spec["python"]), "-m", "venv", prefix], check=True)
+                pip = [os.path.join(prefix, "bin", "python"), "-m", "pip", "install", "--quiet"]
+                if spec["build_dependencies"]:
+                    subprocess.run(pip + spec["build_dependencies"], check=True)
+                with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+                    f.write("\n".join(spec["dependencies"]) + "\n")
+                try:
+                    subprocess.run(pip + ["-r", f.name], check=True, cwd=project_dir)
+                finally:
+                    os.remove(f.name)
+            elif spec["manager"] == "conda":
+                conda = shutil.which("mamba") or shutil.which("conda")
+                if conda is None:
+                    raise Exception("conda not found on PATH")
+                with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+                    yaml.safe_dump({"channels": spec["channels"], "dependencies": spec["dependencies"]}, f)
+                try:
+                    subprocess.run([conda, "env", "create", "--prefix", prefix, "--file", f.name, "--quiet"],
+                                   check=True)
+                finally:
+                    os.remove(f.name)
+            else:
+                os.makedirs(prefix)
+
+            metadata = {"key": os.path.basename(prefix), "spec": spec, "created": time.time(),
+                        "size": directory_size(prefix)}
+            with open(os.path.join(prefix, METADATA_NAME + ".tmp"), "w") as f:
+                json.dump(metadata, f, indent=2)
+            os.replace(os.path.join(prefix, METADATA_NAME + ".tmp"), os.path.join(prefix, METADATA_NAME))
+        except BaseException:
+            shutil.rmtree(prefix, ignore_errors=True)
+            raise
+
+    def _take_lease(self, key: str):
+        lease_dir = os.path.join(self.root, "leases", key)
+        os.makedirs(lease_dir, exist_ok=True)
+        open(os.path.join(lease_dir, str(os.getpid())), "w").close()
+
+    def _touch(self, prefix: str):
+        os.utime(os.path.join(prefix, METADATA_NAME))
+
+    @contextmanager
+    def _locked(self, path: str):
+        with open(path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def env_variables(spec: dict, prefix: str) -> Dict[str, str]:
+    """Process environment activating a cached environment for the entry point command."""
+    env = dict(os.environ)
+    if spec["manager"] in ("virtualenv", "conda"):
+        env["PATH"] = os.path.join(prefix, "bin") + os.pathsep + env.get("PATH", "")
+        env.pop("PYTHONHOME", None)
+        if spec["manager"] == "virtualenv":
+            env["VIRTUAL_ENV"] = prefix
+        else:
+            env["CONDA_PREFIX"] = prefix
+    return env
+
+
+def run_project(project_dir: str, env_manager: str, experiment_id: Optional[str] = None,
+                run_name: Optional[str] = None, entry_point: str = "main",
+                parameters: Optional[Dict[str, str]] = None, cache: Optional[EnvCache] = None) -> dict:
+    """
+    Run an MLflow project entry point in a cached environment.
+
+    The environment is resolved (spec hash, cache lookup, build on a miss)
+    first, then `mlflow run --env-manager local` runs the entry point with the
+    cached environment activated, in a run created beforehand so that the
+    timings can be logged to it (env_resolve_s, run_s metrics and
+    env_cache_* tags).
+
+    Returns:
+        dict: run_id, env key, cache hit, env_resolve_s and run_s
+    """
+    import mlflow
+
+    cache = cache or EnvCache()
+    start = time.perf_counter()
+    spec = resolve_env_spec(project_dir, env_manager)
+    env = cache.acquire(spec, project_dir)
+    env_resolve_s = time.perf_counter() - start
+    print(f"Environment {env['key']} ({env_manager}): "
+          f"{'cache hit' if env['hit'] else 'built'} in {env_resolve_s:.2f}s")
+
+    client = mlflow.tracking.MlflowClient()
+    run = client.create_run(experiment_id or "0", run_name=run_name)
+    run_id = run.info.run_id
+    cmd = [sys.executable, "-m", "mlflow", "run", project_dir, "--env-manager", "local",
+           "--entry-point", entry_point, "--run-id", run_id, "--experiment-id", run.info.experiment_id]
+    for key, value in (parameters or {}).items():
+        cmd += ["-P", f"{key}={value}"]
+
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, env=env_variables(spec, env["prefix"]))
+    finally:
+        cache.release(env["key"])
+    run_s = time.perf_counter() - start
+
+    client.log_batch(
+        run_id,
+        metrics=[mlflow.entities.Metric(k, v, int(time.time() * 1000), 0)
+                 for k, v in (("env_resolve_s", env_resolve_s), ("run_s", run_s))],
+        tags=[mlflow.entities.RunTag("env_cache_key", env["key"]),
+              mlflow.entities.RunTag("env_cache_hit", str(env["hit"]).lower())],
+    )
+    if result.returncode != 0:
+        raise Exception(f"Entry point '{entry_point}' failed with exit code {result.returncode}")
+    return {"run_id": run_id, "key": env["key"], "hit": env["hit"],
+            "env_resolve_s": env_resolve_s, "run_s": run_s}
+
+
+def parse_parameters(values: List[str]) -> Dict[str, str]:
+    parameters = {}
+    for value in values or []:
+        key, _, param = value.partition("=")
+        parameters[key] = param
+    return parameters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run an MLflow project in a hash-keyed cached environment')
+    parser.add_argument('project_dir', nargs='?', default="src/", help='Project directory (with an MLproject file)')
+    parser.add_argument('--env-manager', dest='env_manager', default="virtualenv",
+                        choices=["local", "virtualenv", "conda"], help='Environment manager')
+    parser.add_argument('--experiment-id', dest='experiment_id', help='Experiment ID of the run')
+    parser.add_argument('--run-name', dest='run_name', help='Run name')
+    parser.add_argument('--entry-point', dest='entry_point', default="main", help='Entry point to run')
+    parser.add_argument('-P', dest='params', action='append', help='Entry point parameter key=value (repeatable)')
+    parser.add_argument('--tracking_uri', type=str, default=None, help='MLflow tracking URI (default: MLFLOW_TRACKING_URI)')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Environment cache directory')
+    parser.add_argument('--max_gb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3, help='Cache size cap in GB')
+    parser.add_argument('--list', action='store_true', help='List cached environments and exit')
+    args = parser.parse_args()
+
+    cache = EnvCache(args.cache_dir, max_bytes=int(args.max_gb * 1024 ** 3))
+    if args.list:
+        print(f"{'key':<26} {'manager':<11} {'size MB':>9} {'refs':>5}  last used")
+        for entry in sorted(cache.entries(), key=lambda e: e["last_used"], reverse=True):
+            print(f"{entry['key']:<26} {entry['spec']['manager']:<11} {entry['size'] / 1024 ** 2:>9.1f} "
+                  f"{entry['refs']:>5}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used']))}")
+        return
+
+    if args.tracking_uri:
+        os.environ["MLFLOW_TRACKING_URI"] = args.tracking_uri
+    stats = run_project(args.project_dir, args.env_manager, args.experiment_id, args.run_name,
+                        args.entry_point, parse_parameters(args.params), cache)
+    print(f"\nRun {stats['run_id']}: environment {stats['env_resolve_s']:.2f}s "
+          f"({'hit' if stats['hit'] else 'miss'}), run {stats['run_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
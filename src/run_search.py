@@ -0,0 +1,120 @@
+import json
+from typing import Iterator, List, Optional, Tuple
+
+from mlflow.entities import Run, ViewType
+
+# Page size used for search_runs (the server caps max_results at 50000)
+PAGE_SIZE = 1000
+
+
+def iter_runs(client, experiment_ids: List[str], filter_string: str = "",
+              order_by: Optional[List[str]] = None, page_size: int = PAGE_SIZE,
+              run_view_type: int = ViewType.ACTIVE_ONLY) -> Iterator[Run]:
+    """
+    Yield every run matching a server-side search, following page tokens.
+
+    Args:
+        client: MLflow client
+        experiment_ids: Experiments to search
+        filter_string: MLflow search filter, evaluated by the tracking server
+        order_by: MLflow order_by clauses
+        page_size: Runs fetched per request
+    """
+    page_token = None
+    while True:
+        page = client.search_runs(
+            experiment_ids=experiment_ids,
+            filter_string=filter_string,
+            run_view_type=run_view_type,
+            max_results=page_size,
+            order_by=order_by,
+            page_token=page_token,
+        )
+        for run in page:
+            yield run
+        page_token = page.token
+        if not page_token:
+            break
+
+
+def find_first_run(client, experiment_ids: List[str], filter_string: str = "",
+                   order_by: Optional[List[str]] = None) -> Optional[Run]:
+    """Return the first run of a server-side filtered and ordered search, if any."""
+    runs = client.search_runs(
+        experiment_ids=experiment_ids,
+        filter_string=filter_string,
+        max_results=1,
+        order_by=order_by,
+    )
+    return runs[0] if runs else None
+
+
+def find_latest_search_parent(client, experiment_id: str) -> Optional[Run]:
+    """
+    Latest parent run created by sklearn autolog for a hyperparameter search.
+
+    Only the parent run of a search carries the best_cv_score metric, and a
+    metric filter only matches runs that logged it.
+    """
+    return find_first_run(
+        client, [experiment_id],
+        filter_string="metrics.best_cv_score > -1e308",
+        order_by=["attributes.start_time DESC"],
+    )
+
+
+def find_best_child_run(client, experiment_id: str, parent_run_id: str,
+                        order_by: str = "metrics.rank_test_score ASC") -> Optional[Run]:
+    """
+    Best child run of a search parent, ranked by the tracking server.
+
+    sklearn autolog logs rank_test_score on every child of a search, rank 1
+    being the best_params_ candidate.
+    """
+    return find_first_run(
+        client, [experiment_id],
+        filter_string=f"tags.mlflow.parentRunId = '{parent_run_id}'",
+        order_by=[order_by],
+    )
+
+
+def resolve_search_runs(client, experiment_id: str,
+                        parent_run_id: Optional[str] = None) -> Tuple[Optional[Run], Optional[Run]]:
+    """
+    Resolve the parent run of a hyperparameter search and its best child.
+
+    Args:
+        client: MLflow client
+        experiment_id: Experiment holding the runs
+        parent_run_id: Parent run ID when known (e.g. mlflow.last_active_run()),
+                       otherwise the latest search parent of the experiment
+    Returns:
+        tuple: (parent run, best child run), either may be None
+    """
+    if parent_run_id:
+        parent_run = client.get_run(parent_run_id)
+    else:
+        parent_run = find_latest_search_parent(client, experiment_id)
+    if parent_run is None:
+        return None, None
+
+    best_run = find_best_child_run(client, experiment_id, parent_run.info.run_id)
+    return parent_run, best_run
+
+
+def model_artifact_path(run: Run, flavor: str = "sklearn") -> Optional[str]:
+    """
+    Artifact path of the model logged in a run, read from the
+    mlflow.log-model.history tag (no artifact listing).
+
+    Args:
+        run: MLflow run
+        flavor: Preferred model flavor when several models were logged
+    Returns:
+        str: Artifact path, or None when the run has no logged model
+    """
+    history = json.loads(run.data.tags.get("mlflow.log-model.history", "[]"))
+    if not history:
+        return None
+    preferred = [m for m in history if flavor in m.get("flavors", {})]
+    return (preferred or history)[-1]["artifact_path"]
@@ -0,0 +1,354 @@
+import argparse
+import copy
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import mlflow
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from async_logging import BatchedRunLogger
+from data_cache import load_dataset
+
+# The configurations of experiment.py and 02a_experiment.py ... 02d_experiment.py
+DEFAULT_GRID = [
+    {"run_name": "first_run", "n_estimators": 10, "max_depth": 10},
+    {"run_name": "second_run", "n_estimators": 100, "max_depth": 5},
+    {"run_name": "third_run", "n_estimators": 50, "max_depth": 20},
+    {"run_name": "fourth_run", "n_estimators": 200, "max_depth": 30},
+    {"run_name": "fifth_run", "n_estimators": 300, "max_depth": 10},
+]
+
+# Per-process state filled by init_worker (the data is loaded once per worker)
+_WORKER = {}
+
+
+def compute_metrics(y_true, y_pred) -> Dict[str, float]:
+    """Regression metrics logged by every training script."""
+    mse = mean_squared_error(y_true, y_pred)
+    return {
+        "mae": mean_absolute_error(y_true, y_pred),
+        "mse": mse,
+        "rmse": float(np.sqrt(mse)),
+        "r2": r2_score(y_true, y_pred),
+    }
+
+
+def expand_grid(grid) -> List[dict]:
+    """
+    Turn a grid into a list of configurations.
+
+    Args:
+        grid: Either a list of configurations, or a dict of lists whose
+              cartesian product is taken
+    Returns:
+        list: Configurations, each with a run_name
+    """
+    if isinstance(grid, dict):
+        keys = sorted(grid)
+        configs = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    else:
+        configs = [dict(config) for config in grid]
+
+    for config in configs:
+        if "run_name" not in config:
+            config["run_name"] = "sweep_" + "_".join(
+                f"{k}={v}" for k, v in sorted(config.items())
+            )
+    return configs
+
+
+def load_split(data_path: str):
+    """Load the dataset from the cache and apply the usual 80/20 split."""
+    X, y = load_dataset(data_path)
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+def init_worker(data_path: str, tracking_uri: str, experiment_id: str, log_model: bool):
+    """Process pool initializer: set up tracking and load the data once."""
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment_id=experiment_id)
+    _WORKER["split"] = load_split(data_path)
+    _WORKER["log_model"] = log_model
+
+
+def fit_and_log(config: dict, artifact_path: str = "rf_apples") -> dict:
+    """
+    Fit one configuration, evaluate it and log it as its own MLflow run.
+
+    Returns:
+        dict: run_name, run_id, params, metrics and timings of the fit
+    """
+    start = time.perf_counter()
+    X_train, X_val, y_train, y_val = _WORKER["split"]
+
+    run_name = config["run_name"]
+    params = {k: v for k, v in config.items() if k != "run_name"}
+    params.setdefault("random_state", 42)
+
+    # One core per fit, the parallelism comes from the process pool
+    rf = RandomForestRegressor(n_jobs=1, **params)
+    rf.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+
+    metrics = compute_metrics(y_val, rf.predict(X_val))
+
+    with mlflow.start_run(run_name=run_name) as run, \
+            BatchedRunLogger(run.info.run_id) as run_logger:
+        run_logger.log_params(params)
+        run_logger.log_metrics(metrics)
+        if _WORKER["log_model"]:
+            run_logger.log_model(rf, artifact_path, input_example=X_val.head(5))
+
+    return {
+        "run_name": run_name,
+        "run_id": run.info.run_id,
+        "params": params,
+        "metrics": metrics,
+        "fit_time": fit_time,
+        "total_time": time.perf_counter() - start,
+    }
+
+
+def group_for_warm_start(configs: List[dict]) -> List[List[dict]]:
+    """
+    Group configurations that only differ by n_estimators.
+
+    Returns:
+        list: Groups, each sorted by increasing n_estimators
+    """
+    groups = {}
+    for config in configs:
+        key = tuple(sorted(
+            (k, repr(v)) for k, v in config.items() if k not in ("run_name", "n_estimators")
+        ))
+        groups.setdefault(key, []).append(config)
+    return [sorted(group, key=lambda c: c.get("n_estimators", 100)) for group in groups.values()]
+
+
+def grow_forest(group: List[dict], X_train, y_train):
+    """
+    Grow one forest through the tree counts of a group with warm_start.
+
+    Each step only fits the trees missing from the previous size, and the
+    forest at every size is the one an independent fit with the same
+    random_state would give.
+
+    Yields:
+        tuple: (config, params, forest snapshot, seconds spent on this step)
+    """
+    shared = {k: v for k, v in group[0].items() if k not in ("run_name", "n_estimators")}
+    shared.setdefault("random_state", 42)
+    rf = RandomForestRegressor(warm_start=True, n_jobs=1, **shared)
+
+    for config in group:
+        start = time.perf_counter()
+        n_estimators = config.get("n_estimators", 100)
+        rf.set_params(n_estimators=n_estimators)
+        rf.fit(X_train, y_train)
+        # The next fit appends to estimators_ in place, so give the caller its own list
+        snapshot = copy.copy(rf)
+        snapshot.estimators_ = list(rf.estimators_)
+        snapshot.set_params(warm_start=False)
+        params = dict(shared, n_estimators=n_estimators)
+        yield config, params, snapshot, time.perf_counter() - start
+
+
+def grow_and_log(group: List[dict], artifact_path: str = "rf_apples") -> List[dict]:
+    """Warm-start counterpart of fit_and_log: one run per tree count of the group."""
+    X_train, X_val, y_train, y_val = _WORKER["split"]
+    results = []
+    for config, params, rf, fit_time in grow_forest(group, X_train, y_train):
+        start = time.perf_counter()
+        metrics = compute_metrics(y_val, rf.predict(X_val))
+
+        with mlflow.start_run(run_name=config["run_name"]) as run, \
+                BatchedRunLogger(run.info.run_id) as run_logger:
+            run_logger.log_params(params)
+            run_logger.set_tag("warm_start", "true")
+            run_logger.log_metrics(metrics)
+            if _WORKER["log_model"]:
+                run_logger.log_model(rf, artifact_path, input_example=X_val.head(5))
+
+        results.append({
+            "run_name": config["run_name"],
+            "run_id": run.info.run_id,
+            "params": params,
+            "metrics": metrics,
+            "fit_time": fit_time,
+            "total_time": fit_time + time.perf_counter() - start,
+        })
+    return results
+
+
+def verify_warm_start(configs: List[dict], data_path: str) -> List[dict]:
+    """
+    Check that warm-started forests predict exactly like independently
+    trained forests with the same parameters and seed.
+
+    Returns:
+        list: run_name, max absolute prediction difference and match flag
+    """
+    X_train, X_val, y_train, y_val = load_split(data_path)
+    report = []
+    for group in group_for_warm_start(configs):
+        for config, params, grown, _ in grow_forest(group, X_train, y_train):
+            independent = RandomForestRegressor(n_jobs=1, **params).fit(X_train, y_train)
+            diff = np.abs(grown.predict(X_val) - independent.predict(X_val)).max()
+            report.append({"run_name": config["run_name"], "max_abs_diff": float(diff),
+                           "match": bool(diff == 0.0)})
+    return report
+
+
+def fit_group(group: List[dict]) -> List[dict]:
+    """Fit the configurations of a job independently (no warm start)."""
+    return [fit_and_log(config) for config in group]
+
+
+def run_sweep(configs: List[dict], data_path: str, tracking_uri: str,
+              experiment_name: str = "Apple_Models", workers: Optional[int] = None,
+              log_model: bool = True, sequential: bool = False, warm_start: bool = False) -> dict:
+    """
+    Run every configuration, in a process pool unless sequential is set.
+
+    With warm_start, configurations that only differ by n_estimators share a
+    single forest grown tree count by tree count (see grow_forest); the
+    groups are spread over the pool.
+
+    Returns:
+        dict: results per configuration, sweep wall time and the sum of the
+              job times (measured inside the pool, so inflated by CPU and
+              memory contention: not a sequential baseline)
+    """
+    if warm_start:
+        jobs, job_fn = group_for_warm_start(configs), grow_and_log
+    else:
+        jobs, job_fn = [[config] for config in configs], fit_group
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    # Created here once, workers racing to create it would fail
+    mlflow.set_tracking_uri(tracking_uri)
+    experiment_id = mlflow.set_experiment(experiment_name).experiment_id
+    init_args = (data_path, tracking_uri, experiment_id, log_model)
+
+    start = time.perf_counter()
+    results = []
+    if sequential or workers == 1:
+        init_worker(*init_args)
+        for job in jobs:
+            results.extend(job_fn(job))
+            print(f"Finished {', '.join(c['run_name'] for c in job)}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=init_args) as executor:
+            futures = {executor.submit(job_fn, job): job for job in jobs}
+            for future in as_completed(futures):
+                results.extend(future.result())
+                print(f"Finished {', '.join(c['run_name'] for c in futures[future])}")
+    wall_time = time.perf_counter() - start
+
+    trees_fitted = sum(max(c.get("n_estimators", 100) for c in job) if warm_start
+                       else sum(c.get("n_estimators", 100) for c in job) for job in jobs)
+    return {
+        "results": results,
+        "warm_start": warm_start,
+        "trees_fitted": trees_fitted,
+        "trees_independent": sum(c.get("n_estimators", 100) for c in configs),
+        "workers": 1 if sequential else workers,
+        "wall_time": wall_time,
+        "job_time_sum": sum(result["total_time"] for result in results),
+    }
+
+
+def print_summary(summary: dict):
+    """Print one line per run and the sweep timings."""
+    print(f"\n{'Run name':<40} {'r2':>8} {'rmse':>10} {'fit (s)':>9}")
+    for result in sorted(summary["results"], key=lambda r: -r["metrics"]["r2"]):
+        print(f"{result['run_name']:<40} {result['metrics']['r2']:>8.4f} "
+              f"{result['metrics']['rmse']:>10.3f} {result['fit_time']:>9.2f}")
+    print(f"\nWorkers: {summary['workers']}")
+    print(f"Trees fitted: {summary['trees_fitted']} (independent fits: {summary['trees_independent']})")
+    print(f"Sweep wall time: {summary['wall_time']:.2f}s")
+    print(f"Sum of job times (contended, not a sequential baseline): {summary['job_time_sum']:.2f}s")
+    if summary.get("sequential_time"):
+        print(f"Sequential baseline (measured): {summary['sequential_time']:.2f}s")
+        print(f"Speedup: {summary['speedup']:.2f}x")
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a RandomForest parameter sweep in parallel')
+    parser.add_argument('--tracking_uri', type=str, default="http://127.0.0.1:8080", help='MLflow tracking URI')
+    parser.add_argument('--experiment_name', type=str, default="Apple_Models", help='MLflow experiment name')
+    parser.add_argument('--data_path', type=str, default="data/fake_data.csv", help='Path to the data file')
+    parser.add_argument('--grid', type=str, help='JSON file with a list of configurations or a dict of lists (optional)')
+    parser.add_argument('--n_estimators', type=parse_int_list, help='Comma separated values, e.g. "50,100,300" (optional)')
+    parser.add_argument('--max_depth', type=parse_int_list, help='Comma separated values, e.g. "5,10,20" (optional)')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (default: all cores)')
+    parser.add_argument('--sequential', action='store_true', help='Run the configurations one after another')
+    parser.add_argument('--baseline', action='store_true',
+                        help='First run the sweep sequentially to measure the speedup (logs the runs twice)')
+    parser.add_argument('--warm_start', action='store_true',
+                        help='Grow one forest per group of configurations differing only by n_estimators')
+    parser.add_argument('--verify_warm_start', action='store_true',
+                        help='Check warm-started forests against independent fits, then exit')
+    parser.add_argument('--no_log_model', action='store_true', help='Do not log the fitted models')
+    parser.add_argument('--output', type=str, help='Write the sweep summary as JSON to this file (optional)')
+    args = parser.parse_args()
+
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    elif args.n_estimators or args.max_depth:
+        grid = {
+            "n_estimators": args.n_estimators or [100],
+            "max_depth": args.max_depth or [None],
+        }
+    else:
+        grid = DEFAULT_GRID
+
+    configs = expand_grid(grid)
+
+    if args.verify_warm_start:
+        report = verify_warm_start(configs, args.data_path)
+        for line in report:
+            status = "OK" if line["match"] else "MISMATCH"
+            print(f"{line['run_name']:<40} max |diff| = {line['max_abs_diff']:.3g} {status}")
+        sys.exit(0 if all(line["match"] for line in report) else 1)
+
+    sequential_time = None
+    if args.baseline and not args.sequential:
+        print(f"Running {len(configs)} configurations sequentially (baseline)")
+        sequential_time = run_sweep(
+            configs, args.data_path, args.tracking_uri, args.experiment_name,
+            log_model=not args.no_log_model, sequential=True, warm_start=args.warm_start
+        )["wall_time"]
+
+    print(f"Running {len(configs)} configurations")
+    summary = run_sweep(
+        configs, args.data_path, args.tracking_uri, args.experiment_name,
+        workers=args.workers, log_model=not args.no_log_model, sequential=args.sequential,
+        warm_start=args.warm_start
+    )
+    if sequential_time is not None:
+        summary["sequential_time"] = sequential_time
+        summary["speedup"] = sequential_time / summary["wall_time"] if summary["wall_time"] > 0 else 0.0
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,555 @@
+import argparse
+import math
+import time
+from typing import Callable, Dict, List, Optional
+
+import mlflow
+import numpy as np
+from joblib import Parallel, delayed
+from mlflow import MlflowClient
+from mlflow.entities import Metric, Param
+from scipy.stats import norm, randint
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold, ParameterSampler, train_test_split
+
+from data_cache import load_dataset
+from sweep import compute_metrics
+
+# Same search space as 04_autolog_solution.py
+PARAM_DISTRIBUTIONS = {
+    'n_estimators': randint(50, 200),
+    'max_depth': randint(5, 20),
+    'min_samples_split': randint(2, 10),
+    'min_samples_leaf': randint(1, 4),
+}
+
+
+def make_forest(params: dict, resource_name: Optional[str] = None, resource: Optional[int] = None,
+                random_state: int = 42, n_jobs: int = 1) -> RandomForestRegressor:
+    """RandomForestRegressor for a candidate, with n_estimators overridden when it is the resource."""
+    params = dict(params)
+    if resource_name == "n_estimators":
+        params["n_estimators"] = int(resource)
+    return RandomForestRegressor(random_state=random_state, n_jobs=n_jobs, **params)
+
+
+def fit_fold(params: dict, X: np.ndarray, y: np.ndarray, train_idx: np.ndarray, test_idx: np.ndarray,
+             resource_name: Optional[str] = None, resource: Optional[int] = None,
+             random_state: int = 42):
+    """
+    Fit a candidate on one CV fold and score it (r2).
+
+    With resource_name="n_samples" the candidate only sees a fixed random
+    subset of `resource` training rows of the fold.
+
+    Returns:
+        tuple: (r2 score, fit + score time in seconds)
+    """
+    start = time.perf_counter()
+    if resource_name == "n_samples":
+        rng = np.random.RandomState(random_state)
+        train_idx = rng.permutation(train_idx)[:int(resource)]
+    model = make_forest(params, resource_name, resource, random_state)
+    model.fit(X[train_idx], y[train_idx])
+    score = r2_score(y[test_idx], model.predict(X[test_idx]))
+    return score, time.perf_counter() - start
+
+
+def halving_schedule(n_candidates: int, min_resource: int, max_resource: int, factor: int = 3) -> List[tuple]:
+    """
+    Rungs of a successive halving search.
+
+    Each rung keeps the best 1/factor of the candidates and gives them factor
+    times more resource; the last rung always runs at max_resource.
+
+    Returns:
+        list: (number of candidates, resource) per rung
+    """
+    rungs = []
+    n, r = n_candidates, min_resource
+    while True:
+        if n <= 1:
+            r = max_resource
+        r = min(r, max_resource)
+        rungs.append((n, int(r)))
+        if r >= max_resource:
+            break
+        n = max(1, math.ceil(n / factor))
+        r = r * factor
+    return rungs
+
+
+def log_child_run(client: MlflowClient, experiment_id: str, parent_run_id: str, run_name: str,
+                  params: dict, metrics: Dict[str, float], tags: Optional[dict] = None,
+                  metric_history: Optional[Dict[str, List[float]]] = None) -> str:
+    """
+    Create a finished child run with one log_batch call, returns its run ID.
+
+    metric_history values are logged with their position as step.
+    """
+    run_tags = {"mlflow.parentRunId": parent_run_id, "mlflow.runName": run_name}
+    run_tags.update(tags or {})
+    run = client.create_run(experiment_id, run_name=run_name, tags=run_tags)
+    timestamp = int(time.time() * 1000)
+    run_metrics = [Metric(k, float(v), timestamp, 0) for k, v in metrics.items()]
+    for key, values in (metric_history or {}).items():
+        run_metrics.extend(Metric(key, float(v), timestamp, step) for step, v in enumerate(values))
+    client.log_batch(
+        run.info.run_id,
+        metrics=run_metrics,
+        params=[Param(k, str(v)) for k, v in params.items()],
+    )
+    client.set_terminated(run.info.run_id)
+    return run.info.run_id
+
+
+def successive_halving(X, y, candidates: List[dict], resource_name: str = "n_estimators",
+                       min_resource: int = 10, max_resource: int = 200, factor: int = 3,
+                       cv: int = 5, n_jobs: int = -1, random_state: int = 42,
+                       on_rung: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Successive halving over a list of candidates.
+
+    Every rung evaluates all (candidate, fold) fits in parallel over n_jobs
+    cores, keeps the best 1/factor candidates by mean r2 and promotes them to
+    factor times more resource (trees or training rows).
+
+    Args:
+        X, y: Training data
+        candidates: Parameter dicts to evaluate
+        resource_name: "n_estimators" or "n_samples"
+        on_rung: Optional callback receiving the summary of every finished rung
+    Returns:
+        dict: best candidate, best score, rung summaries and timings
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    folds = list(KFold(n_splits=cv).split(X))
+    start = time.perf_counter()
+
+    rungs = halving_schedule(len(candidates), min_resource, max_resource, factor)
+    survivors = list(range(len(candidates)))
+    best_score, best_index, time_to_best = -np.inf, None, 0.0
+    rung_summaries = []
+    fit_seconds = 0.0
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for rung_index, (n_keep, resource) in enumerate(rungs):
+            survivors = survivors[:n_keep]
+            rung_start = time.perf_counter()
+            outputs = parallel(
+                delayed(fit_fold)(candidates[c], X, y, train_idx, test_idx,
+                                  resource_name, resource, random_state)
+                for c in survivors for train_idx, test_idx in folds
+            )
+            scores = np.array([score for score, _ in outputs]).reshape(len(survivors), cv)
+            fit_seconds += sum(seconds for _, seconds in outputs)
+            mean_scores = scores.mean(axis=1)
+
+            order = np.argsort(-mean_scores, kind="stable")
+            elapsed = time.perf_counter() - start
+            if mean_scores[order[0]] > best_score:
+                best_score = float(mean_scores[order[0]])
+                best_index = survivors[order[0]]
+                time_to_best = elapsed
+
+            summary = {
+                "rung": rung_index,
+                "resource": resource,
+                "candidates": [
+                    {
+                        "index": survivors[i],
+                        "params": candidates[survivors[i]],
+                        "mean_test_score": float(mean_scores[i]),
+                        "std_test_score": float(scores[i].std()),
+                        "rank": int(np.where(order == i)[0][0]) + 1,
+                    }
+                    for i in range(len(survivors))
+                ],
+                "best_score": float(mean_scores[order[0]]),
+                "duration": time.perf_counter() - rung_start,
+                "elapsed": elapsed,
+            }
+            rung_summaries.append(summary)
+            if on_rung:
+                on_rung(summary)
+
+            survivors = [survivors[i] for i in order]
+
+    # The winner is the best candidate of the last (full budget) rung;
+    # time_to_best is when best_score_any_rung was first reached
+    winner = survivors[0]
+    return {
+        "best_index": winner,
+        "best_params": candidates[winner],
+        "best_score": rung_summaries[-1]["best_score"],
+        "best_score_any_rung": best_score,
+        "best_score_any_rung_index": best_index,
+        "time_to_best": time_to_best,
+        "total_time": time.perf_counter() - start,
+        "fit_seconds": fit_seconds,
+        "rungs": rung_summaries,
+    }
+
+
+def run_halving(args, client: MlflowClient, experiment_id: str, X_train, X_val, y_train, y_val):
+    """Successive halving search logged as parent run > rung runs > candidate runs."""
+    distributions = dict(PARAM_DISTRIBUTIONS)
+    if args.resource == "n_estimators":
+        distributions.pop("n_estimators")
+    if args.resource == "n_samples":
+        # A fold trains on (cv - 1) / cv of the rows
+        args.max_resource = min(args.max_resource, len(X_train) * (args.cv - 1) // args.cv)
+    candidates = list(ParameterSampler(distributions, n_iter=args.n_candidates, random_state=42))
+
+    with mlflow.start_run(run_name="successive_halving") as parent:
+        mlflow.log_params({
+            "method": "successive_halving",
+            "n_candidates": args.n_candidates,
+            "resource": args.resource,
+            "min_resource": args.min_resource,
+            "max_resource": args.max_resource,
+            "factor": args.factor,
+            "cv": args.cv,
+        })
+
+        def log_rung(summary):
+            rung_run_id = log_child_run(
+                client, experiment_id, parent.info.run_id, f"rung_{summary['rung']}",
+                params={"rung": summary["rung"], "resource": summary["resource"],
+                        "n_candidates": len(summary["candidates"])},
+                metrics={"best_score": summary["best_score"], "duration": summary["duration"],
+                         "elapsed": summary["elapsed"]},
+            )
+            for candidate in summary["candidates"]:
+                log_child_run(
+                    client, experiment_id, rung_run_id,
+                    f"rung_{summary['rung']}_candidate_{candidate['index']}",
+                    params=dict(candidate["params"], **{args.resource: summary["resource"]}),
+                    metrics={"mean_test_score": candidate["mean_test_score"],
+                             "std_test_score": candidate["std_test_score"],
+                             "rank_test_score": candidate["rank"]},
+                )
+            print(f"Rung {summary['rung']}: {len(summary['candidates'])} candidates at "
+                  f"{args.resource}={summary['resource']}, best r2 {summary['best_score']:.4f} "
+                  f"({summary['duration']:.1f}s)")
+
+        result = successive_halving(
+            X_train, y_train, candidates, resource_name=args.resource,
+            min_resource=args.min_resource, max_resource=args.max_resource,
+            factor=args.factor, cv=args.cv, n_jobs=args.n_jobs, on_rung=log_rung,
+        )
+
+        # Refit the winner with the full budget and evaluate on the validation set
+        best_params = dict(result["best_params"])
+        if args.resource == "n_estimators":
+            best_params["n_estimators"] = args.max_resource
+        model = make_forest(best_params, n_jobs=args.n_jobs)
+        model.fit(X_train, y_train)
+        metrics = compute_metrics(y_val, model.predict(X_val))
+
+        mlflow.log_params({f"best_{k}": v for k, v in best_params.items()})
+        mlflow.log_metrics({
+            "best_cv_score": result["best_score"],
+            "time_to_best": result["time_to_best"],
+            "best_score_any_rung": result["best_score_any_rung"],
+            "total_search_time": result["total_time"],
+            "total_fit_seconds": result["fit_seconds"],
+            **{f"val_{k}": v for k, v in metrics.items()},
+        })
+        mlflow.sklearn.log_model(sk_model=model, input_example=X_val.head(5), artifact_path="rf_apples")
+
+    print(f"\nBest parameters: {best_params}")
+    print(f"Best CV score: {result['best_score']:.4f}, validation r2: {metrics['r2']:.4f}")
+    print(f"Time to best score ({result['best_score_any_rung']:.4f}, any rung): {result['time_to_best']:.1f}s, "
+          f"total search time: {result['total_time']:.1f}s")
+    return result
+
+
+def search_space_bounds(distributions: dict) -> Dict[str, tuple]:
+    """Inclusive integer bounds of the randint distributions of a search space."""
+    return {name: tuple(int(v) for v in dist.support()) for name, dist in distributions.items()}
+
+
+def sample_uniform(bounds: Dict[str, tuple], n: int, rng: np.random.RandomState) -> np.ndarray:
+    """n random points of the search space, one column per parameter (sorted names)."""
+    return np.column_stack([rng.randint(low, high + 1, size=n) for low, high in
+                            (bounds[name] for name in sorted(bounds))])
+
+
+def expected_improvement(mu: np.ndarray, sigma: np.ndarray, best: float, xi: float = 0.001) -> np.ndarray:
+    """Expected improvement over best of a Gaussian prediction (maximization)."""
+    improvement = mu - best - xi
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = improvement / sigma
+        ei = improvement * norm.cdf(z) + sigma * norm.pdf(z)
+    return np.where(sigma > 0, ei, np.maximum(improvement, 0.0))
+
+
+def propose_batch(observed_X: List[tuple], observed_y: List[float], bounds: Dict[str, tuple],
+                  batch_size: int, rng: np.random.RandomState, n_pool: int = 2000,
+                  seen: Optional[List[tuple]] = None) -> List[dict]:
+    """
+    Propose the next batch of candidates with a random forest surrogate.
+
+    The surrogate is fitted on the observed (params, score) pairs; its mean
+    and the spread of its trees give the expected improvement of a random
+    pool of points. Points are picked one at a time and added back with their
+    predicted score ("believer" strategy), so a batch does not collapse on a
+    single region and several workers can evaluate it at once.
+
+    Points already observed or in seen (e.g. pruned trials) are never
+    proposed again; the batch is shorter, possibly empty, when the pool has
+    no other point left.
+    """
+    names = sorted(bounds)
+    pool = sample_uniform(bounds, n_pool, rng)
+    seen = set(observed_X) | set(seen or [])
+    X_obs, y_obs = list(observed_X), list(observed_y)
+    batch = []
+
+    for _ in range(batch_size):
+        surrogate = ExtraTreesRegressor(n_estimators=100, min_samples_leaf=2,
+                                        random_state=rng.randint(2**31 - 1))
+        surrogate.fit(np.array(X_obs), np.array(y_obs))
+        per_tree = np.stack([tree.predict(pool) for tree in surrogate.estimators_])
+        mu, sigma = per_tree.mean(axis=0), per_tree.std(axis=0)
+        ei = expected_improvement(mu, sigma, best=max(y_obs))
+
+        unseen = [i for i in np.argsort(-ei, kind="stable") if tuple(int(v) for v in pool[i]) not in seen]
+        if not unseen:
+            break
+        index = unseen[0]
+        point = tuple(int(v) for v in pool[index])
+        seen.add(point)
+        X_obs.append(point)
+        y_obs.append(float(mu[index]))
+        batch.append(dict(zip(names, point)))
+    return batch
+
+
+def prune_thresholds(history: List[dict], cv: int, min_trials: int, warmup_folds: int) -> List[Optional[float]]:
+    """
+    Median pruning rule: after fold k a trial stops when its running mean
+    score is below the median running mean of the completed trials at fold k.
+
+    Returns:
+        list: Threshold per fold, None where pruning is disabled
+    """
+    completed = [trial["scores"] for trial in history if trial["pruned_at"] is None]
+    if len(completed) < min_trials:
+        return [None] * cv
+    running = np.array([np.cumsum(scores) / np.arange(1, cv + 1) for scores in completed])
+    medians = np.median(running, axis=0)
+    return [None if k < warmup_folds or k == cv - 1 else float(medians[k]) for k in range(cv)]
+
+
+def run_trial(params: dict, X: np.ndarray, y: np.ndarray, folds: list,
+              thresholds: List[Optional[float]], random_state: int = 42) -> dict:
+    """
+    Evaluate a candidate fold by fold, stopping early when it falls behind.
+
+    Returns:
+        dict: fold scores, fold index where the trial was pruned (or None)
+              and fit seconds
+    """
+    scores, seconds = [], 0.0
+    for k, (train_idx, test_idx) in enumerate(folds):
+        score, fold_seconds = fit_fold(params, X, y, train_idx, test_idx, random_state=random_state)
+        scores.append(score)
+        seconds += fold_seconds
+        if thresholds[k] is not None and np.mean(scores) < thresholds[k]:
+            return {"scores": scores, "pruned_at": k, "seconds": seconds}
+    return {"scores": scores, "pruned_at": None, "seconds": seconds}
+
+
+def bayesian_search(X, y, bounds: Dict[str, tuple], n_trials: int = 30, batch_size: int = 4,
+                    n_initial: int = 8, cv: int = 5, warmup_folds: int = 1, random_state: int = 42,
+                    on_trial: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Sequential model-based optimization with median pruning.
+
+    The first n_initial trials are drawn at random, then every batch is
+    proposed by the surrogate (see propose_batch), fitted on the completed
+    trials only: the partial mean of a pruned trial is not its score. The
+    trials of a batch run in parallel, each with the pruning thresholds known
+    when it started. The search stops early when no unseen point is left.
+
+    Returns:
+        dict: trials, best trial, time to the best score and compute used
+    """
+    if n_initial < 2:
+        raise Exception(f"n_initial must be at least 2 for the surrogate to have trials to fit, got {n_initial}")
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    folds = list(KFold(n_splits=cv).split(X))
+    rng = np.random.RandomState(random_state)
+    names = sorted(bounds)
+    start = time.perf_counter()
+
+    history = []
+    best = None
+    time_to_best = 0.0
+    with Parallel(n_jobs=batch_size) as parallel:
+        while len(history) < n_trials:
+            n_batch = min(batch_size, n_trials - len(history))
+            completed = [trial for trial in history if trial["pruned_at"] is None]
+            if len(completed) < n_initial:
+                batch = [dict(zip(names, (int(v) for v in point)))
+                         for point in sample_uniform(bounds, n_batch, rng)]
+            else:
+                batch = propose_batch(
+                    [tuple(trial["params"][name] for name in names) for trial in completed],
+                    [trial["value"] for trial in completed],
+                    bounds, n_batch, rng,
+                    seen=[tuple(trial["params"][name] for name in names) for trial in history],
+                )
+                if not batch:
+                    break
+
+            thresholds = prune_thresholds(history, cv, min_trials=n_initial, warmup_folds=warmup_folds)
+            outputs = parallel(delayed(run_trial)(params, X, y, folds, thresholds, random_state)
+                               for params in batch)
+
+            for params, output in zip(batch, outputs):
+                trial = dict(output, number=len(history), params=params,
+                             value=float(np.mean(output["scores"])),
+                             elapsed=time.perf_counter() - start)
+                history.append(trial)
+                if trial["pruned_at"] is None and (best is None or trial["value"] > best["value"]):
+                    best = trial
+                    time_to_best = trial["elapsed"]
+                if on_trial:
+                    on_trial(trial)
+
+    return {
+        "trials": history,
+        "best_trial": best,
+        "time_to_best": time_to_best,
+        "total_time": time.perf_counter() - start,
+        "fit_seconds": sum(trial["seconds"] for trial in history),
+        "folds_evaluated": sum(len(trial["scores"]) for trial in history),
+        "n_pruned": sum(trial["pruned_at"] is not None for trial in history),
+    }
+
+
+def random_search_baseline(X, y, n_trials: int, cv: int = 5, n_jobs: int = -1) -> dict:
+    """Unpruned random draws from PARAM_DISTRIBUTIONS, for comparison."""
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    folds = list(KFold(n_splits=cv).split(X))
+    candidates = list(ParameterSampler(PARAM_DISTRIBUTIONS, n_iter=n_trials, random_state=42))
+    outputs = Parallel(n_jobs=n_jobs)(
+        delayed(fit_fold)(params, X, y, train_idx, test_idx)
+        for params in candidates for train_idx, test_idx in folds
+    )
+    scores = np.array([score for score, _ in outputs]).reshape(n_trials, cv).mean(axis=1)
+    return {"best_score": float(scores.max()), "fit_seconds": sum(seconds for _, seconds in outputs)}
+
+
+def run_bayes(args, client: MlflowClient, experiment_id: str, X_train, X_val, y_train, y_val):
+    """Bayesian optimization logged as a parent run with one child run per trial."""
+    bounds = search_space_bounds(PARAM_DISTRIBUTIONS)
+
+    with mlflow.start_run(run_name="bayesian_optimization") as parent:
+        mlflow.log_params({
+            "method": "bayesian_optimization",
+            "n_trials": args.n_trials,
+            "batch_size": args.batch_size,
+            "n_initial": args.n_initial,
+            "warmup_folds": args.warmup_folds,
+            "cv": args.cv,
+        })
+
+        def log_trial(trial):
+            pruned = trial["pruned_at"] is not None
+            metrics = {"mean_test_score": trial["value"], "elapsed": trial["elapsed"],
+                       "fit_seconds": trial["seconds"]}
+            if pruned:
+                metrics["pruned_at_fold"] = trial["pruned_at"]
+            log_child_run(
+                client, experiment_id, parent.info.run_id, f"trial_{trial['number']}",
+                params=trial["params"], metrics=metrics,
+                tags={"pruned": str(pruned).lower()},
+                metric_history={"fold_score": trial["scores"]},
+            )
+            status = f"pruned at fold {trial['pruned_at']}" if pruned else "complete"
+            print(f"Trial {trial['number']}: r2 {trial['value']:.4f} ({status}) {trial['params']}")
+
+        result = bayesian_search(
+            X_train, y_train, bounds, n_trials=args.n_trials, batch_size=args.batch_size,
+            n_initial=args.n_initial, cv=args.cv, warmup_folds=args.warmup_folds, on_trial=log_trial,
+        )
+
+        best_params = result["best_trial"]["params"]
+        model = make_forest(best_params, n_jobs=-1)
+        model.fit(X_train, y_train)
+        metrics = compute_metrics(y_val, model.predict(X_val))
+
+        parent_metrics = {
+            "best_cv_score": result["best_trial"]["value"],
+            "time_to_best": result["time_to_best"],
+            "total_search_time": result["total_time"],
+            "total_fit_seconds": result["fit_seconds"],
+            "folds_evaluated": result["folds_evaluated"],
+            "n_pruned": result["n_pruned"],
+            **{f"val_{k}": v for k, v in metrics.items()},
+        }
+        if args.compare_random:
+            baseline = random_search_baseline(X_train, y_train, args.n_trials, cv=args.cv)
+            parent_metrics["random_best_cv_score"] = baseline["best_score"]
+            parent_metrics["random_fit_seconds"] = baseline["fit_seconds"]
+            print(f"\nRandom search ({args.n_trials} draws): best r2 {baseline['best_score']:.4f}, "
+                  f"{baseline['fit_seconds']:.1f} fit seconds")
+
+        mlflow.log_params({f"best_{k}": v for k, v in best_params.items()})
+        mlflow.log_metrics(parent_metrics)
+        mlflow.sklearn.log_model(sk_model=model, input_example=X_val.head(5), artifact_path="rf_apples")
+
+    print(f"\nBest parameters: {best_params}")
+    print(f"Best CV score: {result['best_trial']['value']:.4f}, validation r2: {metrics['r2']:.4f}")
+    print(f"Pruned trials: {result['n_pruned']}/{args.n_trials}, folds evaluated: "
+          f"{result['folds_evaluated']}/{args.n_trials * args.cv}, {result['fit_seconds']:.1f} fit seconds")
+    print(f"Time to best score: {result['time_to_best']:.1f}s, total search time: {result['total_time']:.1f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune the RandomForest demand model')
+    parser.add_argument('--tracking_uri', type=str, default="http://127.0.0.1:8080", help='MLflow tracking URI')
+    parser.add_argument('--experiment_name', type=str, default="Tuning_Random_Forest", help='MLflow experiment name')
+    parser.add_argument('--data_path', type=str, default="data/fake_data.csv", help='Path to the data file')
+    parser.add_argument('--method', type=str, default="halving", choices=["halving", "bayes"], help='Search method')
+    parser.add_argument('--n_candidates', type=int, default=81, help='Number of sampled candidates')
+    parser.add_argument('--resource', type=str, default="n_estimators", choices=["n_estimators", "n_samples"],
+                        help='Budget given to the candidates at each rung')
+    parser.add_argument('--min_resource', type=int, default=10, help='Resource of the first rung')
+    parser.add_argument('--max_resource', type=int, default=200, help='Resource of the last rung')
+    parser.add_argument('--factor', type=int, default=3, help='Keep 1/factor candidates per rung')
+    parser.add_argument('--cv', type=int, default=5, help='Number of CV folds')
+    parser.add_argument('--n_jobs', type=int, default=-1, help='Parallel jobs (default: all cores)')
+    parser.add_argument('--n_trials', type=int, default=30, help='Trials of the bayes method')
+    parser.add_argument('--batch_size', type=int, default=4, help='Trials proposed and run in parallel (bayes)')
+    parser.add_argument('--n_initial', type=int, default=8, help='Random trials before the surrogate is used (bayes)')
+    parser.add_argument('--warmup_folds', type=int, default=1, help='Folds evaluated before a trial can be pruned (bayes)')
+    parser.add_argument('--compare_random', action='store_true', help='Also run an unpruned random search of n_trials (bayes)')
+    args = parser.parse_args()
+    if args.n_initial < 2:
+        parser.error("--n_initial must be at least 2 (random trials the surrogate is fitted on)")
+
+    mlflow.set_tracking_uri(args.tracking_uri)
+    experiment = mlflow.set_experiment(args.experiment_name)
+    client = MlflowClient()
+
+    X, y = load_dataset(args.data_path)
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    if args.method == "bayes":
+        run_bayes(args, client, experiment.experiment_id, X_train, X_val, y_train, y_val)
+    else:
+        run_halving(args, client, experiment.experiment_id, X_train, X_val, y_train, y_val)
+
+
+if __name__ == "__main__":
+    main()